@@ -0,0 +1,54 @@
+import sys
+import glob
+import time
+import logging
+import argparse
+
+from sim import Sim
+
+# Messages sent and time of the last message (when routing has converged)
+# with and without batched delivery, for every scenario of a folder.
+#
+# Try: python3 -m benchmarks.batching testing_suite adversarial_cases
+
+
+class Undrawn_Sim(Sim):
+    # what we measure is the routing, not the pictures
+
+    def draw_topology(self):
+        pass
+
+    def draw_path(self, source, destination):
+        pass
+
+    def draw_tree(self, source):
+        pass
+
+
+def run(algorithm, event_file, batch):
+    start = time.perf_counter()
+    s = Undrawn_Sim(algorithm, event_file, 'NO_STOP', batch=batch)
+    return s.message_count, s.last_message_time, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-message and batched delivery.')
+    parser.add_argument('folders', nargs='*', default=['testing_suite'])
+    parser.add_argument('--algorithms', nargs='+', default=['DISTANCE_VECTOR', 'LINK_STATE'])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    print("%-16s %-44s %20s %20s %16s" % ("algorithm", "scenario", "messages", "last message at", "wall time (s)"))
+    print("%-16s %-44s %20s %20s %16s" % ("", "", "single / batch", "single / batch", "single / batch"))
+    for algorithm in args.algorithms:
+        for folder in args.folders:
+            for event_file in sorted(glob.glob(folder + '/*.event')):
+                single = run(algorithm, event_file, False)
+                batched = run(algorithm, event_file, True)
+                print("%-16s %-44s %9d / %-8d %9s / %-8s %7.2f / %-6.2f" % (
+                    algorithm, event_file, single[0], batched[0], single[1], batched[1], single[2], batched[2]))
+                sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
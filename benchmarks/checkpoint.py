@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+import json
+import logging
+import argparse
+import tempfile
+
+from simulator.config import ROUTE_ALGORITHM, EVENT_QUEUE
+from simulator.topology import Topology
+from sim import Sim
+from benchmarks.routing_state import routing_state
+
+# A run resumed from a checkpoint against the same run uninterrupted: the
+# reports after the checkpoint, the counters and the routing state of every
+# node (the next hop of every pair, the DV or the link states) must be the
+# same.  Also the size of the checkpoints and the time to save and load them
+# (the time to save is that of the final state).
+#
+# Try: python3 -m benchmarks.checkpoint test1.event --at 100 500
+#      python3 -m benchmarks.checkpoint big.event --at 1500 --algorithms LINK_STATE --queue TUPLE_HEAP
+
+
+def outcome(s, report):
+    with open(report) as f:
+        lines = f.readlines()
+    return lines, (s.event_count, s.message_count, s.message_bytes, s.last_message_time), routing_state(s)
+
+
+def run(options, *args, **kwargs):
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        start = time.perf_counter()
+        s = Sim(*args, headless=True, **dict(options, **kwargs))
+        return s, time.perf_counter() - start
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and time checkpoints.')
+    parser.add_argument('event')
+    parser.add_argument('--at', type=int, nargs='+', required=True, help='the times to take checkpoints at')
+    parser.add_argument('--algorithms', nargs='+', choices=ROUTE_ALGORITHM, default=['DISTANCE_VECTOR', 'LINK_STATE'])
+    parser.add_argument('--queue', choices=EVENT_QUEUE, default='BUCKET')
+    parser.add_argument('--strict', action='store_true')
+    parser.add_argument('--no-batch', dest='batch', action='store_false')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    options = dict(queue=args.queue, strict=args.strict, batch=args.batch)
+    print("%-16s %6s %10s %9s %9s %9s %11s  %s" % ("algorithm", "at", "size (kB)", "save (s)", "load (s)", "run (s)", "resumed (s)", "same"))
+    failed = 0
+    with tempfile.TemporaryDirectory() as directory:
+        report = os.path.join(directory, 'report.jsonl')
+        checkpoint = os.path.join(directory, 'checkpoint')
+        for algorithm in args.algorithms:
+            s, run_time = run(options, algorithm, args.event, report=report)
+            expected = outcome(s, report)
+            for at in args.at:
+                taken, _ = run(options, algorithm, args.event, report=report, checkpoint=checkpoint, checkpoint_at=at)
+                same = outcome(taken, report) == expected
+                resumed, resumed_time = run(options, algorithm, None, report=report, resume=checkpoint, step='NO_STOP')
+                lines, counters, tables = outcome(resumed, report)
+                same = same and (lines, counters, tables) == ([line for line in expected[0] if json.loads(line)['time'] > at],) + expected[1:]
+
+                start = time.perf_counter()
+                Topology(algorithm, 'NO_STOP', headless=True, **options).restore_checkpoint(checkpoint)
+                load_time = time.perf_counter() - start
+                size = os.path.getsize(checkpoint)
+                start = time.perf_counter()
+                taken.save_checkpoint(checkpoint, taken.get_time())
+                save_time = time.perf_counter() - start
+
+                failed += not same
+                print("%-16s %6d %10.1f %9.3f %9.3f %9.2f %11.2f  %s" % (algorithm, at, size / 1024, save_time, load_time, run_time, resumed_time,
+                                                                      "yes" if same else "NO"))
+                sys.stdout.flush()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+import os
+import sys
+import glob
+import time
+import logging
+import argparse
+import tempfile
+import threading
+import subprocess
+
+from sim import Sim
+
+# Runs every scenario of a folder three ways: one interpreter per scenario (what
+# run.sh did), all of them back-to-back in this process, and all of them at
+# once on threads of this process.  The reports and message counts must be
+# the same every way: the simulations share nothing.
+#
+# Try: python3 -m benchmarks.contexts testing_suite --algorithm DISTANCE_VECTOR
+
+
+def run(algorithm, event_file, report):
+    s = Sim(algorithm, event_file, 'NO_STOP', headless=True, report=report)
+    with open(report) as f:
+        return s.message_count, s.event_count, f.read()
+
+
+def run_interpreters(algorithm, event_files, folder):
+    outcomes = []
+    for i, event_file in enumerate(event_files):
+        report = os.path.join(folder, "interpreter-%d.jsonl" % i)
+        subprocess.run([sys.executable, 'sim.py', algorithm, event_file, '--headless', '--report', report],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        with open(report) as f:
+            outcomes.append(f.read())
+    return outcomes
+
+
+def run_back_to_back(algorithm, event_files, folder):
+    return [run(algorithm, event_file, os.path.join(folder, "serial-%d.jsonl" % i)) for i, event_file in enumerate(event_files)]
+
+
+def run_threads(algorithm, event_files, folder):
+    outcomes = [None] * len(event_files)
+
+    def target(i, event_file):
+        outcomes[i] = run(algorithm, event_file, os.path.join(folder, "thread-%d.jsonl" % i))
+
+    threads = [threading.Thread(target=target, args=(i, event_file)) for i, event_file in enumerate(event_files)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run many simulations in one process.')
+    parser.add_argument('folder', nargs='?', default='testing_suite')
+    parser.add_argument('--algorithm', default='DISTANCE_VECTOR')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    event_files = sorted(glob.glob(args.folder + '/*.event'))
+    with tempfile.TemporaryDirectory() as folder:
+        start = time.perf_counter()
+        interpreters = run_interpreters(args.algorithm, event_files, folder)
+        interpreter_time = time.perf_counter() - start
+
+        stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+        try:
+            start = time.perf_counter()
+            serial = run_back_to_back(args.algorithm, event_files, folder)
+            serial_time = time.perf_counter() - start
+            start = time.perf_counter()
+            threaded = run_threads(args.algorithm, event_files, folder)
+            thread_time = time.perf_counter() - start
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+    print("%-44s %12s %12s %10s" % ("scenario", "messages", "events", "same"))
+    for event_file, report, one, other in zip(event_files, interpreters, serial, threaded):
+        same = one == other and one[2] == report
+        print("%-44s %12d %12d %10s" % (event_file, one[0], one[1], "yes" if same else "NO"))
+    print("\none interpreter each: %.2f s, back-to-back: %.2f s, threads: %.2f s" % (interpreter_time, serial_time, thread_time))
+
+
+if __name__ == '__main__':
+    main()
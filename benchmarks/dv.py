@@ -0,0 +1,129 @@
+import sys
+import time
+import random
+import argparse
+
+from incremental_dv import Distance_Vector_Table
+
+# Incremental distance vector updates against rebuilding the vector from every
+# neighbor vector, under random churn: neighbors advertising a few changed
+# entries (as a whole vector or as a delta), link costs changing, neighbors
+# appearing and going away.
+#
+# It doubles as a differential test: after every change the table is
+# compared with a table rebuilt from scratch from the same neighbor vectors,
+# and the changes it reports with the difference from the previous vector.
+# The run stops with an error at the first difference.
+#
+# Try: python3 -m benchmarks.dv --destinations 1000 10000 --neighbors 8
+
+MAX_COST = 10
+SELF = 0
+
+
+def random_entry(n, rng):
+    # a route of a few hops. now and then it goes through us, so the table
+    # must skip it
+    path = tuple(rng.randrange(n) for _ in range(rng.randint(1, 4)))
+    return (rng.randint(1, MAX_COST * len(path)), path)
+
+
+def random_vector(neighbor, n, rng):
+    vector = {neighbor: (0, ())}
+    for dest in rng.sample(range(n), n // 2):
+        if dest != neighbor:
+            vector[dest] = random_entry(n, rng)
+    return vector
+
+
+def churn(n, neighbors, changes, entries_per_change, check_every, rng):
+    table = Distance_Vector_Table(SELF)
+    next_neighbor = n
+    for _ in range(neighbors):
+        table.set_neighbor(next_neighbor, rng.randint(1, MAX_COST), random_vector(next_neighbor, n, rng))
+        next_neighbor += 1
+
+    table.take_changes()
+    previous = dict(table.entries)
+    incremental_time, full_time = 0.0, 0.0
+    for i in range(changes):
+        neighbor = rng.choice(list(table.links))
+        kind = rng.choice(['advertise'] * 4 + ['delta'] * 4 + ['cost', 'bring-up'])
+        start = time.perf_counter()
+        if kind == 'delta':
+            entries, removed = {}, []
+            for dest in rng.sample(range(n), entries_per_change):
+                if dest == neighbor:
+                    continue
+                if dest in table.vectors[neighbor] and rng.random() < 0.2:
+                    removed.append(dest)
+                else:
+                    entries[dest] = random_entry(n, rng)
+            start = time.perf_counter()
+            table.update_neighbor_vector(neighbor, entries, removed)
+        elif kind == 'advertise':
+            vector = dict(table.vectors[neighbor])
+            for dest in rng.sample(range(n), entries_per_change):
+                if dest == neighbor:
+                    continue
+                if dest in vector and rng.random() < 0.2:
+                    del vector[dest]
+                else:
+                    vector[dest] = random_entry(n, rng)
+            start = time.perf_counter()
+            table.set_neighbor_vector(neighbor, vector)
+        elif kind == 'cost':
+            table.set_link_cost(neighbor, rng.randint(1, MAX_COST))
+        else:
+            # one neighbor goes away, another one comes up
+            table.remove_neighbor(neighbor)
+            vector = random_vector(next_neighbor, n, rng)
+            start = time.perf_counter()
+            table.set_neighbor(next_neighbor, rng.randint(1, MAX_COST), vector)
+            next_neighbor += 1
+        incremental_time += time.perf_counter() - start
+
+        reference = Distance_Vector_Table(SELF)
+        reference.links, reference.vectors = table.links, table.vectors
+        start = time.perf_counter()
+        reference.rebuild()
+        full_time += time.perf_counter() - start
+
+        if check_every and (i + 1) % check_every == 0:
+            changes = table.take_changes()
+            expected = {d: table.entries.get(d) for d in table.entries.keys() | previous.keys()
+                        if table.entries.get(d) != previous.get(d)}
+            previous = dict(table.entries)
+            if changes != expected:
+                sys.exit("%d destinations, change %d (%s %s): reported changes %s instead of %s" % (
+                    n, i + 1, kind, neighbor, changes, expected))
+            if table.entries != reference.entries:
+                wrong = [d for d in table.entries.keys() | reference.entries.keys()
+                         if table.entries.get(d) != reference.entries.get(d)]
+                sys.exit("%d destinations, change %d (%s %s): entries differ for %d destinations, e.g. %s: %s instead of %s" % (
+                    n, i + 1, kind, neighbor, len(wrong), wrong[0], table.entries.get(wrong[0]), reference.entries.get(wrong[0])))
+    return incremental_time, full_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare incremental and full distance vector computation.')
+    parser.add_argument('--destinations', type=int, nargs='+', default=[1000, 10000], help='numbers of destinations')
+    parser.add_argument('--neighbors', type=int, default=8)
+    parser.add_argument('--changes', type=int, default=1000, help='changes per table')
+    parser.add_argument('--entries', type=int, default=4, help='changed entries per advertisement')
+    parser.add_argument('--check-every', type=int, default=1,
+                        help='compare with the full computation every this many changes, 0 never')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print("%12s %10s %22s %22s %10s" % ("destinations", "changes", "incremental (us/chg)", "full (us/chg)", "speedup"))
+    for n in args.destinations:
+        rng = random.Random(args.seed)
+        incremental_time, full_time = churn(n, args.neighbors, args.changes, args.entries, args.check_every, rng)
+        print("%12d %10d %22.1f %22.1f %9.1fx" % (n, args.changes, incremental_time / args.changes * 1e6,
+                                                   full_time / args.changes * 1e6, full_time / incremental_time))
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import sys
+import glob
+import logging
+import argparse
+
+from distance_vector_node import Distance_Vector_Node
+from benchmarks.batching import Undrawn_Sim
+
+# Messages, message bytes, time of the last message and the time spent in the
+# nodes, with whole-DV and delta DV advertisements, for every scenario of a
+# folder.
+#
+# Try: python3 -m benchmarks.dv_delta testing_suite adversarial_cases
+
+
+def run(event_file, delta):
+    Distance_Vector_Node.DELTA_ADVERTISEMENTS = delta
+    s = Undrawn_Sim('DISTANCE_VECTOR', event_file, 'NO_STOP')
+    return s.message_count, s.message_bytes, s.last_message_time, s.processing_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare whole-DV and delta DV advertisements.')
+    parser.add_argument('folders', nargs='*', default=['testing_suite'])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    print("%-44s %20s %24s %20s %18s" % ("scenario", "messages", "message bytes", "last message at", "processing (s)"))
+    print("%-44s %20s %24s %20s %18s" % ("", "full / delta", "full / delta", "full / delta", "full / delta"))
+    for folder in args.folders:
+        for event_file in sorted(glob.glob(folder + '/*.event')):
+            full = run(event_file, False)
+            delta = run(event_file, True)
+            print("%-44s %9d / %-8d %11d / %-10d %9s / %-8s %8.2f / %-7.2f" % (
+                event_file, full[0], delta[0], full[1], delta[1], full[2], delta[2], full[3], delta[3]))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import sys
+import time
+import random
+import argparse
+
+from simulator.config import *
+from simulator.event import Event
+from simulator.event_queue import EVENT_QUEUE_BACKEND
+
+# Microbenchmark of the Event_Queue backends.
+#
+# Every backend gets the same events: integer time stamps drawn from a range
+# a hundred times smaller than the number of events (so, like a link-state
+# flood, many events share a tick), with one in ten being a SEND_LINK.  Two
+# workloads are timed:
+#   fill/drain - post every event, then pop them all
+#   hold       - keep the queue at its full size and repeatedly pop the
+#                earliest event and post a new one a little later, which is
+#                what dispatch_event does in steady state
+#
+# Try: python3 -m benchmarks.event_queue --sizes 100000 1000000 10000000
+
+
+def make_events(n, rng):
+    ticks = max(1, n // 100)
+    events = []
+    for _ in range(n):
+        event_type = EVENT_TYPE.SEND_LINK if rng.random() < 0.1 else EVENT_TYPE.ROUTING_MESSAGE_ARRIVAL
+        events.append(Event(rng.randrange(ticks), event_type, 0, 0))
+    return events
+
+
+def fill_drain(backend, events):
+    q = backend()
+    start = time.perf_counter()
+    for e in events:
+        q.push(e)
+    while len(q):
+        q.pop()
+    return time.perf_counter() - start
+
+
+def hold(backend, events, operations, rng):
+    q = backend()
+    for e in events:
+        q.push(e)
+    latencies = [rng.randint(1, 10) for _ in range(operations)]
+    start = time.perf_counter()
+    for latency in latencies:
+        e = q.pop()
+        e.time_stamp += latency
+        q.push(e)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the Event_Queue backends.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**5, 10**6],
+                        help='numbers of queued events')
+    parser.add_argument('--backends', nargs='+', choices=EVENT_QUEUE, default=EVENT_QUEUE)
+    parser.add_argument('--hold', type=int, default=10**5, help='pop/post pairs in the hold workload')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print("%10s %12s %16s %16s" % ("events", "backend", "fill/drain (s)", "hold (us/op)"))
+    for n in args.sizes:
+        for name in args.backends:
+            rng = random.Random(args.seed)
+            events = make_events(n, rng)
+            drain = fill_drain(EVENT_QUEUE_BACKEND[name], events)
+            held = hold(EVENT_QUEUE_BACKEND[name], events, args.hold, rng)
+            print("%10d %12s %16.3f %16.3f" % (n, name, drain, held / args.hold * 1e6))
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
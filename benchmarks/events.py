@@ -0,0 +1,174 @@
+import gc
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import tracemalloc
+
+from simulator.config import *
+from simulator.event import Event, DISPATCH_TABLE
+import generate_simulation
+
+# Per-event allocation and dispatch cost of the slotted Event with its
+# dispatch table, against the Event it replaced (an instance __dict__, a sim
+# reference in every event and an if/elif chain over string event types).
+#
+# A scenario is simulated once to record the exact sequence of events it
+# dispatches.  That sequence is then replayed through both representations
+# against a simulator whose handlers do nothing, so only the cost of the
+# events themselves is measured.
+#
+# Try: python3 -m benchmarks.events test2.event --generate 100 300
+
+
+class Legacy_Event:
+
+    def __init__(self, time_stamp, event_type, sim, arg1 = -1, arg2 = -1, arg3 = -1):
+        self.time_stamp = time_stamp
+        self.event_type = event_type
+        self.sim = sim
+
+        self.arg1 = arg1
+        self.arg2 = arg2
+        self.arg3 = arg3
+
+    def dispatch(self):
+        if self.event_type == "ADD_NODE":
+            self.sim.add_node(self.arg1)
+        elif self.event_type == "ADD_LINK":
+            self.sim.add_link(self.arg1, self.arg2, self.arg3)
+        elif self.event_type == "CHANGE_LINK":
+            self.sim.change_link(self.arg1, self.arg2, self. arg3)
+        elif self.event_type == "DELETE_LINK":
+            self.sim.delete_link(self.arg1, self.arg2)
+        elif self.event_type == "DELETE_NODE":
+            self.sim.delete_node(self.arg1)
+        elif self.event_type == "PRINT":
+            self.sim.print_comment(self.arg1)
+        elif self.event_type == "DUMP_NODE":
+            self.sim.dump_node(self.arg1)
+        elif self.event_type == "DRAW_TOPOLOGY":
+            self.sim.draw_topology()
+        elif self.event_type == "ROUTING_MESSAGE_ARRIVAL":
+            self.sim.routing_message_arrival(self.arg1, self.arg2)
+        elif self.event_type == "DUMP_SIM":
+            self.sim.dump_sim()
+        elif self.event_type == "DRAW_PATH":
+            self.sim.draw_path(self.arg1, self.arg2)
+        elif self.event_type == "DRAW_TREE":
+            self.sim.draw_tree(self.arg1)
+        elif self.event_type == "SEND_LINK":
+            self.sim.send_link(self.arg1, self.arg2, self.arg3)
+
+
+class Null_Sim:
+
+    def nothing(self, *args):
+        pass
+
+    routing_message_arrival = send_link = nothing
+    add_node = add_link = delete_node = delete_link = change_link = nothing
+    print_comment = draw_topology = draw_path = draw_tree = dump_node = dump_sim = deliver_batch = nothing
+
+
+def record(algorithm, event_file):
+    # returns the (time_stamp, event_type, arg1, arg2, arg3) of every event
+    # the scenario dispatches. drawing is skipped, it is not what we measure
+    from sim import Sim
+    trace = []
+    table = list(DISPATCH_TABLE)
+    for code in range(len(DISPATCH_TABLE)):
+        def recorder(sim, e, handler=table[code]):
+            trace.append((e.time_stamp, e.event_type, e.arg1, e.arg2, e.arg3))
+            if e.event_type not in (EVENT_TYPE.DRAW_TOPOLOGY, EVENT_TYPE.DRAW_PATH, EVENT_TYPE.DRAW_TREE):
+                handler(sim, e)
+        DISPATCH_TABLE[code] = recorder
+    try:
+        Sim(algorithm, event_file, 'NO_STOP')
+    finally:
+        DISPATCH_TABLE[:] = table
+    return trace
+
+
+def measure_legacy(trace, sim):
+    trace = [(t, EVENT_NAME[code], a1, a2, a3) for (t, code, a1, a2, a3) in trace]
+    start = time.perf_counter()
+    events = [Legacy_Event(t, name, sim, a1, a2, a3) for (t, name, a1, a2, a3) in trace]
+    allocated = time.perf_counter()
+    for e in events:
+        e.dispatch()
+    dispatched = time.perf_counter()
+    return allocated - start, dispatched - allocated
+
+
+def measure_slotted(trace, sim):
+    start = time.perf_counter()
+    events = [Event(t, code, a1, a2, a3) for (t, code, a1, a2, a3) in trace]
+    allocated = time.perf_counter()
+    table = DISPATCH_TABLE
+    for e in events:
+        table[e.event_type](sim, e)
+    dispatched = time.perf_counter()
+    return allocated - start, dispatched - allocated
+
+
+def bytes_per_event(make, trace):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    events = [make(t, code, a1, a2, a3) for (t, code, a1, a2, a3) in trace]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # the list itself holds one pointer per event
+    return (after - before) / len(events) - 8
+
+
+def best_of(repeat, measure, trace, sim):
+    gc.collect()
+    gc.disable()
+    try:
+        runs = [measure(trace, sim) for _ in range(repeat)]
+    finally:
+        gc.enable()
+    return min(r[0] for r in runs), min(r[1] for r in runs)
+
+
+def report(name, trace, repeat):
+    sim = Null_Sim()
+    legacy_bytes = bytes_per_event(lambda t, code, a1, a2, a3: Legacy_Event(t, EVENT_NAME[code], sim, a1, a2, a3), trace)
+    slotted_bytes = bytes_per_event(Event, trace)
+    legacy_alloc, legacy_dispatch = best_of(repeat, measure_legacy, trace, sim)
+    slotted_alloc, slotted_dispatch = best_of(repeat, measure_slotted, trace, sim)
+    n = len(trace)
+    arrivals = sum(1 for e in trace if e[1] == EVENT_TYPE.ROUTING_MESSAGE_ARRIVAL)
+    print("%s: %d events, %.1f%% ROUTING_MESSAGE_ARRIVAL" % (name, n, 100.0 * arrivals / n))
+    print("    %-8s %14s %16s %16s" % ("", "bytes/event", "alloc (ns/ev)", "dispatch (ns/ev)"))
+    print("    %-8s %14.1f %16.1f %16.1f" % ("before", legacy_bytes, legacy_alloc / n * 1e9, legacy_dispatch / n * 1e9))
+    print("    %-8s %14.1f %16.1f %16.1f" % ("after", slotted_bytes, slotted_alloc / n * 1e9, slotted_dispatch / n * 1e9))
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the legacy and slotted Event representations.')
+    parser.add_argument('events', nargs='*', default=['test2.event'], help='.event files to record')
+    parser.add_argument('--generate', type=int, nargs='*', default=[],
+                        help='also record generated scenarios with these numbers of nodes')
+    parser.add_argument('--algorithm', choices=ROUTE_ALGORITHM, default='LINK_STATE')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help='report the best of this many replays')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    for event_file in args.events:
+        report(event_file, record(args.algorithm, event_file), args.repeat)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for n in args.generate:
+            prefix = os.path.join(directory, 'gen_%d' % n)
+            generate_simulation.generate_simulation(n=n, degree=3, time=1000, filename=prefix, seed=args.seed)
+            report('generated, %d nodes' % n, record(args.algorithm, prefix + '.event'), args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import networkx as nx
+
+from simulator.command_file import Command_File
+from simulator.config import EVENT_TYPE
+import generate_simulation
+
+# Time to generate scenarios of growing size, and a check of every file: it
+# is in time order (so the simulator streams it), the same seed gives the same
+# file, no link is added twice, and the topology is connected in the end.
+#
+# Try: python3 -m benchmarks.generator --sizes 1000 10000 100000
+#  or: python3 -m benchmarks.generator --sizes 1000 --topology waxman --churn crash
+
+
+def check(event_file):
+    g = nx.Graph()
+    for e in Command_File(event_file):
+        if e.event_type == EVENT_TYPE.ADD_NODE:
+            g.add_node(e.arg1)
+        elif e.event_type == EVENT_TYPE.ADD_LINK:
+            if g.has_edge(e.arg1, e.arg2):
+                return "link %d %d added twice" % (e.arg1, e.arg2)
+            g.add_edge(e.arg1, e.arg2)
+        elif e.event_type == EVENT_TYPE.DELETE_LINK:
+            g.remove_edge(e.arg1, e.arg2)
+        elif e.event_type == EVENT_TYPE.DELETE_NODE:
+            g.remove_node(e.arg1)
+        elif e.event_type == EVENT_TYPE.CHANGE_LINK and not g.has_edge(e.arg1, e.arg2):
+            return "link %d %d changed but not there" % (e.arg1, e.arg2)
+    if not nx.is_connected(g):
+        return "not connected"
+    return "ok"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the scenario generator.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--degree', type=int, default=3)
+    parser.add_argument('--time', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=340)
+    parser.add_argument('--topology', choices=sorted(generate_simulation.TOPOLOGIES), default='offsets')
+    parser.add_argument('--churn', choices=['classic'] + sorted(generate_simulation.CHURN_PROFILES), default='classic')
+    parser.add_argument('--check-up-to', type=int, default=100000, help='check the files of up to this many nodes')
+    args = parser.parse_args()
+
+    print("%10s %12s %12s %10s %10s" % ("nodes", "commands", "time (s)", "sorted", "check"))
+    with tempfile.TemporaryDirectory() as directory:
+        for n in args.sizes:
+            prefix = os.path.join(directory, 'gen_%d' % n)
+            stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+            try:
+                start = time.perf_counter()
+                generate_simulation.generate_scenario(args.topology, args.churn, n, args.degree, args.time, prefix, seed=args.seed, trees=100)
+                elapsed = time.perf_counter() - start
+                generate_simulation.generate_scenario(args.topology, args.churn, n, args.degree, args.time, prefix + '_again', seed=args.seed, trees=100)
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+
+            with open(prefix + '.event', 'rb') as f, open(prefix + '_again.event', 'rb') as g:
+                same = f.read() == g.read()
+            os.remove(prefix + '_again.event')
+            with open(prefix + '.event', 'rb') as f:
+                commands = sum(1 for _ in f)
+            outcome = check(prefix + '.event') if n <= args.check_up_to else "-"
+            if not same:
+                outcome = "seed gives another file"
+            print("%10d %12d %12.2f %10s %10s" % (n, commands, elapsed, Command_File(prefix + '.event').is_sorted(), outcome))
+            os.remove(prefix + '.event')
+            sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import sys
+import time
+import random
+import argparse
+
+import networkx as nx
+
+from simulator.ground_truth import Ground_Truth, dijkstra
+
+# Correct shortest paths from every node of one topology, as a DRAW_TREE of
+# every node at the same time needs them: two networkx calls per source (paths
+# and lengths, what Topology used to do) against Ground_Truth.
+#
+# Try: python3 -m benchmarks.ground_truth --sizes 200 1000 2000
+
+MAX_LATENCY = 10
+
+
+def random_topology(n, degree, rng):
+    g = nx.Graph()
+    g.add_nodes_from(range(n))
+    for u in range(n):
+        g.add_edge(u, (u + 1) % n, latency=rng.randint(1, MAX_LATENCY))
+    while g.number_of_edges() < n * degree // 2:
+        u, v = rng.randrange(n), rng.randrange(n)
+        if u != v:
+            g.add_edge(u, v, latency=rng.randint(1, MAX_LATENCY))
+    return g
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the correct paths from every node of a topology.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[200, 1000])
+    parser.add_argument('--degree', type=int, default=4, help='average node degree')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print("scipy: %s" % ("yes" if dijkstra is not None else "no"))
+    print("%8s %16s %16s %10s" % ("nodes", "networkx (s)", "cached (s)", "speedup"))
+    for n in args.sizes:
+        g = random_topology(n, args.degree, random.Random(args.seed))
+
+        start = time.perf_counter()
+        for source in g.nodes:
+            nx.algorithms.shortest_path(g, source=source, weight='latency')
+            nx.algorithms.shortest_path_length(g, source=source, weight='latency')
+        networkx_time = time.perf_counter() - start
+
+        ground_truth = Ground_Truth(g)
+        start = time.perf_counter()
+        for source in g.nodes:
+            ground_truth.tree(source, 0)
+        cached_time = time.perf_counter() - start
+        ground_truth.close_pool()
+
+        print("%8d %16.2f %16.2f %9.1fx" % (n, networkx_time, cached_time, networkx_time / cached_time))
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import sys
+import time
+import math
+import random
+import argparse
+
+import networkx as nx
+
+from simulator.layout import Layout_Cache, LAYOUT_ITERATIONS
+
+# Layout after a node comes or goes, on a random topology: a spring layout of
+# the whole graph from scratch (what a picture used to cost) against the
+# layout cache, which relaxes only the nodes around the change.  Also shows
+# how far the other nodes move from one picture to the next, on average.
+#
+# Try: python3 -m benchmarks.layout --sizes 100 400 --changes 10
+
+MAX_LATENCY = 10
+
+
+def mean_move(before, after):
+    common = [node for node in before if node in after]
+    return sum(math.dist(before[node], after[node]) for node in common) / max(1, len(common))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare full and incremental layouts.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 400])
+    parser.add_argument('--degree', type=int, default=4, help='average node degree')
+    parser.add_argument('--changes', type=int, default=10, help='nodes added or deleted')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print("%8s %20s %20s %24s" % ("nodes", "full (s/layout)", "cache (s/layout)", "mean move full / cache"))
+    for n in args.sizes:
+        rng = random.Random(args.seed)
+        g = nx.gnm_random_graph(n, n * args.degree // 2, seed=args.seed)
+        for u, v in g.edges:
+            g[u][v]['latency'] = rng.randint(1, MAX_LATENCY)
+        cache = Layout_Cache(cache_path=None)
+        previous_full = nx.spring_layout(g, iterations=LAYOUT_ITERATIONS)
+        previous_cached = dict(cache.layout(g))
+
+        full_time, cache_time, full_move, cache_move = 0.0, 0.0, 0.0, 0.0
+        next_node = n
+        for _ in range(args.changes):
+            if rng.random() < 0.5:
+                for neighbor in rng.sample(list(g.nodes), 2):
+                    g.add_edge(next_node, neighbor, latency=rng.randint(1, MAX_LATENCY))
+                cache.node_added(next_node)
+                next_node += 1
+            else:
+                node = rng.choice(list(g.nodes))
+                cache.node_deleted(node, list(g[node]))
+                g.remove_node(node)
+
+            start = time.perf_counter()
+            full = nx.spring_layout(g, iterations=LAYOUT_ITERATIONS)
+            full_time += time.perf_counter() - start
+            start = time.perf_counter()
+            cached = dict(cache.layout(g))
+            cache_time += time.perf_counter() - start
+
+            full_move += mean_move(previous_full, full)
+            cache_move += mean_move(previous_cached, cached)
+            previous_full, previous_cached = full, cached
+
+        print("%8d %20.3f %20.3f %11.3f / %-10.3f" % (n, full_time / args.changes, cache_time / args.changes,
+                                                      full_move / args.changes, cache_move / args.changes))
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
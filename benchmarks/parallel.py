@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+
+from simulator.config import ROUTE_ALGORITHM
+from simulator.parallel import Parallel_Sim
+from sim import Sim
+from benchmarks.routing_state import routing_state
+import generate_simulation
+
+# Speedup of the parallel engine (sim.py --workers N) over one process, on
+# generated scenarios, and a check that it runs the same simulation: the
+# reports, the counters and the routing state of every node (the next hop of
+# every pair, the DV or the link states, as the workers send the nodes back)
+# must be those of the sequential engine with --queue KEYED.  The BUCKET
+# column tells whether the default queue, which orders the events of one tick
+# otherwise, gives the same reports too.
+#
+# The speedup can not be more than the number of cores of the machine.
+#
+# Try: python3 -m benchmarks.parallel --nodes 1000 --workers 1 2 4 8
+#      python3 -m benchmarks.parallel --topology ba --churn poisson --nodes 2000 5000 --algorithms LINK_STATE
+SEED = 340
+TREES = 20
+
+
+def outcome(s, report):
+    with open(report) as f:
+        lines = f.read()
+    return lines, (s.event_count, s.message_count, s.message_bytes, s.last_message_time), routing_state(s)
+
+
+def run(report, cls, *args, **kwargs):
+    stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+    try:
+        start = time.perf_counter()
+        s = cls(*args, headless=True, report=report, **kwargs)
+        return outcome(s, report), time.perf_counter() - start
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time and check the parallel engine.')
+    parser.add_argument('--topology', choices=sorted(generate_simulation.TOPOLOGIES), default='grid')
+    parser.add_argument('--churn', choices=['classic'] + sorted(generate_simulation.CHURN_PROFILES), default='none')
+    parser.add_argument('--nodes', type=int, nargs='+', default=[400])
+    parser.add_argument('--degree', type=int, default=3)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--algorithms', nargs='+', choices=ROUTE_ALGORITHM, default=['DISTANCE_VECTOR', 'LINK_STATE'])
+    parser.add_argument('--strict', action='store_true')
+    parser.add_argument('--no-batch', dest='batch', action='store_false')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    options = dict(strict=args.strict, batch=args.batch)
+    print("%d cpus" % os.cpu_count())
+    print("%-16s %-24s %7s %9s %9s %8s  %s" % ("algorithm", "scenario", "workers", "wall (s)", "speedup", "BUCKET", "same"))
+    failed = 0
+    with tempfile.TemporaryDirectory() as directory:
+        report = os.path.join(directory, 'report.jsonl')
+        for n in args.nodes:
+            prefix = os.path.join(directory, '%s-%s-%d' % (args.topology, args.churn, n))
+            stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+            try:
+                generate_simulation.generate_scenario(args.topology, args.churn, n, args.degree, 1000, prefix, seed=SEED, trees=TREES)
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            event_file = prefix + '.event'
+            scenario = os.path.basename(prefix)
+
+            for algorithm in args.algorithms:
+                expected, sequential_time = run(report, Sim, algorithm, event_file, 'NO_STOP', queue='KEYED', **options)
+                bucket, _ = run(report, Sim, algorithm, event_file, 'NO_STOP', **options)
+                same_reports = "same" if bucket[0] == expected[0] else "differs"
+                print("%-16s %-24s %7s %9.2f %9s %8s" % (algorithm, scenario, "-", sequential_time, "1.00", same_reports))
+                for workers in args.workers:
+                    result, wall_time = run(report, Parallel_Sim, algorithm, event_file, workers, **options)
+                    same = result == expected
+                    failed += not same
+                    print("%-16s %-24s %7d %9.2f %9.2f %8s  %s" % (algorithm, scenario, workers, wall_time, sequential_time / wall_time,
+                                                                  "", "yes" if same else "NO"))
+                    sys.stdout.flush()
+            os.remove(event_file)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
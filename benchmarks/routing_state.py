@@ -0,0 +1,14 @@
+# The routing state of the nodes of a simulation, in a form the states of two
+# runs can be compared in: the next hop of every pair of nodes, and the
+# distance vector or the link states of every node, in order.  The bundled
+# nodes do not fill in get_routing_table(), so it tells nothing.
+def routing_state(s):
+    next_hops = {(a, b): s.nodes[a].get_next_hop(b) for a in s.nodes for b in s.nodes if a != b}
+    tables = {}
+    for node in sorted(s.nodes):
+        n = s.nodes[node]
+        if hasattr(n, 'distance_vector'):
+            tables[node] = sorted(n.distance_vector.items())
+        elif hasattr(n, 'link_states'):
+            tables[node] = sorted((tuple(sorted(link)), state) for link, state in n.link_states.items())
+    return next_hops, tables
@@ -0,0 +1,127 @@
+import sys
+import time
+import random
+import argparse
+
+from incremental_spf import Shortest_Path_Tree
+
+# Incremental shortest path tree repair against recomputing the tree, under
+# random link churn (latencies rising and falling, links appearing and being
+# removed) on random connected graphs.
+#
+# It doubles as a differential test: after every change the repaired tree is
+# compared with a tree computed from scratch on the same graph (distances must
+# be equal, and the repaired tree must be a consistent shortest path tree),
+# and the run stops with an error at the first difference.
+#
+# Try: python3 -m benchmarks.spf --sizes 1000 10000 --changes 2000
+
+MAX_LATENCY = 10
+
+
+def random_graph(n, degree, rng):
+    # a ring, so the graph starts connected, plus random chords
+    links = {}
+    for u in range(n):
+        links[frozenset((u, (u + 1) % n))] = rng.randint(1, MAX_LATENCY)
+    while len(links) < n * degree // 2:
+        u, v = rng.randrange(n), rng.randrange(n)
+        if u != v:
+            links.setdefault(frozenset((u, v)), rng.randint(1, MAX_LATENCY))
+    return links
+
+
+def check(tree, reference):
+    if tree.dist != reference.dist:
+        wrong = [v for v in set(tree.dist) | set(reference.dist) if tree.dist.get(v) != reference.dist.get(v)]
+        return "distances differ for %d nodes, e.g. node %s: %s instead of %s" % (
+            len(wrong), wrong[0], tree.dist.get(wrong[0]), reference.dist.get(wrong[0]))
+    for node, distance in tree.dist.items():
+        if node == tree.root:
+            continue
+        parent = tree.parent[node]
+        if tree.dist[parent] + tree.adj[node][parent] != distance:
+            return "node %s is not at its parent's distance plus the link latency" % node
+        if tree.first_hop[node] != (node if parent == tree.root else tree.first_hop[parent]):
+            return "node %s has the wrong first hop" % node
+    return None
+
+
+def churn(n, degree, changes, check_every, rng):
+    links = random_graph(n, degree, rng)
+    tree, reference = Shortest_Path_Tree(0), Shortest_Path_Tree(0)
+    for link, latency in links.items():
+        u, v = link
+        tree.set_link(u, v, latency, repair=False)
+        reference.set_link(u, v, latency, repair=False)
+    tree.rebuild()
+
+    # indexed list of the links, so one can be picked at random in O(1)
+    link_list = list(links)
+    incremental_time, full_time = 0.0, 0.0
+    for i in range(changes):
+        kind = rng.choice(['rise', 'fall', 'appear', 'remove'])
+        if kind == 'appear' or len(link_list) < n:
+            u, v = rng.sample(range(n), 2)
+            link = frozenset((u, v))
+            latency = rng.randint(1, MAX_LATENCY)
+            if link not in links:
+                link_list.append(link)
+        else:
+            index = rng.randrange(len(link_list))
+            link = link_list[index]
+            u, v = link
+            if kind == 'remove':
+                link_list[index] = link_list[-1]
+                link_list.pop()
+                latency = None
+            elif kind == 'rise':
+                latency = links[link] + rng.randint(1, MAX_LATENCY)
+            else:
+                latency = rng.randint(1, max(1, links[link] - 1))
+
+        start = time.perf_counter()
+        if latency is None:
+            del links[link]
+            tree.remove_link(u, v)
+        else:
+            links[link] = latency
+            tree.set_link(u, v, latency)
+        incremental_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        if latency is None:
+            reference.remove_link(u, v, repair=False)
+        else:
+            reference.set_link(u, v, latency, repair=False)
+        reference.rebuild()
+        full_time += time.perf_counter() - start
+
+        if check_every and (i + 1) % check_every == 0:
+            error = check(tree, reference)
+            if error:
+                sys.exit("%d nodes, change %d (%s %s-%s): %s" % (n, i + 1, kind, u, v, error))
+    return incremental_time, full_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare incremental and full shortest path tree computation.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000], help='numbers of nodes')
+    parser.add_argument('--degree', type=int, default=4, help='average node degree')
+    parser.add_argument('--changes', type=int, default=1000, help='link changes per graph')
+    parser.add_argument('--check-every', type=int, default=1,
+                        help='compare with the full computation every this many changes, 0 never')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print("%8s %10s %22s %22s %10s" % ("nodes", "changes", "incremental (us/chg)", "full (us/chg)", "speedup"))
+    for n in args.sizes:
+        rng = random.Random(args.seed)
+        incremental_time, full_time = churn(n, args.degree, args.changes, args.check_every, rng)
+        print("%8d %10d %22.1f %22.1f %9.1fx" % (n, args.changes, incremental_time / args.changes * 1e6,
+                                                 full_time / args.changes * 1e6, full_time / incremental_time))
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import resource
+import tempfile
+import multiprocessing
+
+from simulator.config import ROUTE_ALGORITHM_NODE
+from sim import Sim
+import generate_simulation
+
+# Speed of every algorithm over a matrix of generated scenarios (topology
+# family and churn profile, times size), compared against a committed
+# baseline.
+#
+# Every run happens in a process of its own, headless, and records:
+#   - events_per_sec, messages_per_sec: events dispatched and routing messages
+#     delivered per second of simulation, the checks of DRAW_* events aside
+#   - peak_rss_mb: peak resident memory of the process (the interpreter and
+#     the libraries included). The process is a fresh interpreter: a forked
+#     one would start from the high-water mark of the suite itself
+#   - quiescence: the simulated time the last routing message arrived
+#   - verification_time: seconds spent checking the routes of DRAW_* events
+#   - events and messages, which only change when the routing does
+#
+# A run is a regression when a metric is worse than the baseline by more than
+# --threshold (a fraction); times under MIN_TIME are too short to compare.
+# The exit status is 1 if there is any.  Speeds depend on the machine: record
+# a baseline on the machine you compare on.
+#
+# Try: python3 -m benchmarks.suite --quick
+#      python3 -m benchmarks.suite --update-baseline
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# (topology family, churn profile, nodes, in the quick matrix) of the
+# scenarios.  Routing cost grows fast with size (LINK_STATE floods every link
+# change to every node, node deletions send DISTANCE_VECTOR exploring paths),
+# so the full matrix stays at a few hundred nodes and takes minutes
+SCENARIOS = [
+    ('offsets', 'classic', 30, True),
+    ('offsets', 'classic', 100, False),
+    ('ba', 'poisson', 30, True),
+    ('ba', 'poisson', 300, False),
+    ('fattree', 'flapping', 30, True),
+    ('fattree', 'flapping', 100, False),
+    ('torus', 'crash', 30, True),
+    ('torus', 'crash', 100, False),
+    ('waxman', 'correlated', 30, True),
+    ('waxman', 'correlated', 100, False),
+    ('grid', 'storm', 100, True),
+    ('grid', 'storm', 300, False),
+]
+SEED = 340
+# DRAW_TREEs per scenario: checking every tree of a big one would be all we
+# measure
+TREES = 20
+
+# the timed metrics, and the time they are measured over. below MIN_TIME
+# seconds it is too noisy for them to be compared
+TIMED = {
+    'events_per_sec': 'wall_time',
+    'messages_per_sec': 'wall_time',
+    'verification_time': 'verification_time',
+}
+MIN_TIME = 0.25
+
+# the metrics, and whether more is better
+METRICS = {
+    'events_per_sec': True,
+    'messages_per_sec': True,
+    'peak_rss_mb': False,
+    'quiescence': False,
+    'verification_time': False,
+    'events': False,
+    'messages': False,
+}
+
+
+class Timed_Sim(Sim):
+    # times the route checks of DRAW_* events, headless
+
+    verification_time = 0.0
+
+    def draw_path(self, source, destination):
+        start = time.perf_counter()
+        super().draw_path(source, destination)
+        self.verification_time += time.perf_counter() - start
+
+    def draw_tree(self, source):
+        start = time.perf_counter()
+        super().draw_tree(source)
+        self.verification_time += time.perf_counter() - start
+
+
+def measure(algorithm, event_file, conn):
+    sys.stdout = open(os.devnull, 'w')
+    logging.basicConfig(level=logging.ERROR)
+    start = time.perf_counter()
+    s = Timed_Sim(algorithm, event_file, 'NO_STOP', headless=True)
+    wall_time = time.perf_counter() - start
+    simulation_time = max(wall_time - s.verification_time, 1e-9)
+    conn.send(dict(
+        events_per_sec=round(s.event_count / simulation_time),
+        messages_per_sec=round(s.message_count / simulation_time),
+        peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        quiescence=s.last_message_time or 0,
+        verification_time=round(s.verification_time, 3),
+        events=s.event_count,
+        messages=s.message_count,
+        wall_time=round(wall_time, 3),
+    ))
+    conn.close()
+
+
+def run(algorithm, event_file):
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=measure, args=(algorithm, event_file, sender))
+    process.start()
+    sender.close()
+    result = receiver.recv()
+    process.join()
+    return result
+
+
+# Of several runs, the best speeds and the least memory and verification time
+def best(results):
+    return {metric: (max if METRICS.get(metric) else min)(result[metric] for result in results) for metric in results[0]}
+
+
+def compare(result, baseline, threshold):
+    regressions = []
+    for metric, more_is_better in METRICS.items():
+        if metric not in baseline or not baseline[metric]:
+            continue
+        if metric in TIMED and min(result[TIMED[metric]], baseline[TIMED[metric]]) < MIN_TIME:
+            continue
+        change = result[metric] / baseline[metric] - 1
+        if (change < -threshold) if more_is_better else (change > threshold):
+            regressions.append("%s %+.0f%%" % (metric, 100 * change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every algorithm over generated scenarios.')
+    parser.add_argument('--quick', action='store_true', help='a smaller matrix, under a minute')
+    parser.add_argument('--algorithms', nargs='+', choices=sorted(ROUTE_ALGORITHM_NODE), default=sorted(ROUTE_ALGORITHM_NODE))
+    parser.add_argument('--repeat', type=int, default=1, help='keep the best of this many runs')
+    parser.add_argument('--threshold', type=float, default=0.25, help='the change that is a regression, as a fraction')
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--update-baseline', action='store_true', help='write the results into the baseline')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    scenarios = [(topology, churn, n) for topology, churn, n, quick in SCENARIOS if quick or not args.quick]
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except IOError:
+        baseline = {}
+
+    results = {}
+    failed = 0
+    print("%-36s %10s %12s %12s %9s %11s %10s  %s" % ("scenario", "wall (s)", "events/s", "messages/s", "rss (MB)", "quiescence", "verify (s)", "vs baseline"))
+    with tempfile.TemporaryDirectory() as directory:
+        for topology, churn, n in scenarios:
+            prefix = os.path.join(directory, '%s-%s-%d' % (topology, churn, n))
+            stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+            try:
+                generate_simulation.generate_scenario(topology, churn, n, 3, 1000, prefix, seed=SEED, trees=TREES)
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+
+            for algorithm in args.algorithms:
+                name = "%s/%s-%s-%d" % (algorithm, topology, churn, n)
+                result = best([run(algorithm, prefix + '.event') for _ in range(args.repeat)])
+                results[name] = result
+                if name in baseline:
+                    regressions = compare(result, baseline[name], args.threshold)
+                    verdict = "REGRESSION: " + ", ".join(regressions) if regressions else "ok"
+                    failed += bool(regressions)
+                else:
+                    verdict = "no baseline"
+                print("%-36s %10.2f %12d %12d %9.1f %11d %10.3f  %s" % (name, result['wall_time'], result['events_per_sec'], result['messages_per_sec'],
+                      result['peak_rss_mb'], result['quiescence'], result['verification_time'], verdict))
+                sys.stdout.flush()
+            os.remove(prefix + '.event')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+            f.write("\n")
+        print("baseline written to %s" % args.baseline)
+    if failed:
+        print("\n%d out of %d runs regressed by more than %.0f%%" % (failed, len(results), 100 * args.threshold))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+from simulator.command_file import Command_File
+from simulator.trace import Trace_File, compile_command_file
+import generate_simulation
+
+# Cost of loading a scenario from its text .event file against replaying it
+# from a compiled trace.  Both loaders feed the simulator the same Event
+# stream, which is checked here event by event before anything is timed.
+#
+# Try: python3 -m benchmarks.trace test2.event --generate 1000 10000
+
+
+def replay(loader, file, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for e in loader(file):
+            pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def report(name, event_file, trace_file, repeat):
+    start = time.perf_counter()
+    count = compile_command_file(event_file, trace_file)
+    compiled = time.perf_counter() - start
+
+    text = [str(e) for e in Command_File(event_file)]
+    binary = [str(e) for e in Trace_File(trace_file)]
+    if text != binary:
+        sys.exit("%s: the compiled trace does not replay the same events" % name)
+
+    text_time = replay(Command_File, event_file, repeat)
+    trace_time = replay(Trace_File, trace_file, repeat)
+    print("%s: %d commands, compiled in %.3f s" % (name, count, compiled))
+    print("    %-6s %12s %14s %14s" % ("", "bytes", "load (s)", "us/command"))
+    print("    %-6s %12d %14.4f %14.3f" % ("text", os.path.getsize(event_file), text_time, text_time / count * 1e6))
+    print("    %-6s %12d %14.4f %14.3f" % ("trace", os.path.getsize(trace_file), trace_time, trace_time / count * 1e6))
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare loading text event files and compiled traces.')
+    parser.add_argument('events', nargs='*', default=['test2.event'], help='.event files to compile')
+    parser.add_argument('--generate', type=int, nargs='*', default=[],
+                        help='also compile generated scenarios with these numbers of nodes')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help='report the best of this many loads')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        trace_file = os.path.join(directory, 'scenario.trace')
+        for event_file in args.events:
+            report(event_file, event_file, trace_file, args.repeat)
+        for n in args.generate:
+            prefix = os.path.join(directory, 'gen_%d' % n)
+            generate_simulation.generate_simulation(n=n, degree=3, time=1000, filename=prefix, seed=args.seed)
+            report('generated, %d nodes' % n, prefix + '.event', trace_file, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
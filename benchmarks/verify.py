@@ -0,0 +1,109 @@
+import sys
+import time
+import random
+import argparse
+
+import networkx as nx
+
+from simulator.next_hop_forest import Next_Hop_Forest, NO_PATH, NO_LINK
+
+# Checking the routes from every node to every node, as a DRAW_TREE of every
+# node does: following each route hop by hop (what Topology used to do)
+# against resolving the next hop forest of each destination.  Counts the
+# get_next_hop calls and the time of both.
+#
+# The next hops are the shortest path ones, with a share of them broken
+# (none, -1, a node that is not a neighbor, a hop back that makes a loop).
+# It doubles as a differential test: both must find the same route, length
+# and failure for every pair.
+#
+# Try: python3 -m benchmarks.verify --sizes 100 300 --broken 0.05
+
+MAX_LATENCY = 10
+
+
+class Table_Node:
+    # a node that answers from a next hop table and counts the questions
+
+    calls = 0
+
+    def __init__(self, next_hops):
+        self.next_hops = next_hops
+
+    def get_next_hop(self, destination):
+        Table_Node.calls += 1
+        return self.next_hops.get(destination)
+
+
+def random_nodes(g, broken, rng):
+    n = g.number_of_nodes()
+    next_hops = {u: {} for u in g.nodes}
+    for d in g.nodes:
+        parents, _ = nx.dijkstra_predecessor_and_distance(g, d, weight='latency')
+        for u, preds in parents.items():
+            if preds:
+                next_hops[u][d] = preds[0]
+    for u in g.nodes:
+        for d in g.nodes:
+            if u != d and rng.random() < broken:
+                next_hops[u][d] = rng.choice([None, -1, rng.randrange(n)] + list(g[u]))
+    return {u: Table_Node(next_hops[u]) for u in g.nodes}
+
+
+def hop_by_hop(g, nodes, source, destination):
+    # the route check Topology used to do
+    path = [source]
+    length = 0
+    while destination not in path:
+        next = nodes[path[-1]].get_next_hop(destination)
+        if next == None:
+            return path, NO_PATH, None
+        elif next == -1 or next not in g.nodes or next in path:
+            path.append(next)
+            return path, NO_PATH, None
+        elif (path[-1], next) not in g.edges:
+            path.append(next)
+            return path, NO_LINK, None
+        length += g[path[-1]][next]['latency']
+        path.append(next)
+    return path, None, length
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare hop by hop route checks with next hop forests.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 300])
+    parser.add_argument('--degree', type=int, default=4, help='average node degree')
+    parser.add_argument('--broken', type=float, default=0.05, help='share of broken next hops')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print("%8s %24s %24s" % ("nodes", "get_next_hop calls", "time (s)"))
+    print("%8s %24s %24s" % ("", "hop by hop / forest", "hop by hop / forest"))
+    for n in args.sizes:
+        rng = random.Random(args.seed)
+        g = nx.gnm_random_graph(n, n * args.degree // 2, seed=args.seed)
+        for u, v in g.edges:
+            g[u][v]['latency'] = rng.randint(1, MAX_LATENCY)
+        nodes = random_nodes(g, args.broken, rng)
+
+        Table_Node.calls = 0
+        start = time.perf_counter()
+        expected = {(s, d): hop_by_hop(g, nodes, s, d) for s in g.nodes for d in g.nodes if s != d}
+        old_time, old_calls = time.perf_counter() - start, Table_Node.calls
+
+        Table_Node.calls = 0
+        start = time.perf_counter()
+        forests = {d: Next_Hop_Forest(d, g, nodes) for d in g.nodes}
+        lengths = {(s, d): forests[d].length(s) for s in g.nodes for d in g.nodes if s != d}
+        new_time, new_calls = time.perf_counter() - start, Table_Node.calls
+
+        for (s, d), (path, failure, length) in expected.items():
+            if lengths[(s, d)] != length or forests[d].walk(s) != (path, failure):
+                sys.exit("route from %d to %d: %s, length %s instead of %s, length %s" % (
+                    s, d, forests[d].walk(s), lengths[(s, d)], (path, failure), length))
+        print("%8d %11d / %-11d %10.2f / %-10.2f" % (n, old_calls, new_calls, old_time, new_time))
+        sys.stdout.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,112 +1,175 @@
 from simulator.node import Node
-import json
+from simulator.message import Frozen_Dict
+from incremental_dv import Distance_Vector_Table
+from collections import namedtuple
+
+# the routing messages. every DV a node advertises gets the next seq_num:
+#   - DV_Message: the sender's whole DV, as of seq_num. the DV is a Frozen_Dict
+#     delivered by reference
+#   - DV_Delta: the entries that changed since seq_num - 1, and the
+#     destinations that are no longer reachable
+#   - DV_Request: asks the neighbor for a DV_Message, after a DV_Delta was lost
+DV_Message = namedtuple('DV_Message', ['sender_id', 'seq_num', 'dv'])
+DV_Delta = namedtuple('DV_Delta', ['sender_id', 'seq_num', 'entries', 'removed'])
+DV_Request = namedtuple('DV_Request', ['sender_id'])
 
 class Distance_Vector_Node(Node):
+    # advertise the changed entries only. a neighbor gets the whole DV when
+    # the link to it comes up, and when it misses a delta. False advertises the
+    # whole DV every time
+    DELTA_ADVERTISEMENTS = True
+
     def __init__(self, id):
         super().__init__(id)
 
         # the latest time our DV was updated
         self.latest_dv_update = -1
+        # sequence number of the latest DV we sent. several DVs can be sent in
+        # the same second, so the time alone cannot tell which one is newer
+        self.dv_seq_num = -1
+        # our DV and the latest DVs of our neighbors, with the link cost to each
+        # neighbor. it updates our DV incrementally as they change
+        self.table = Distance_Vector_Table(id)
         # maps from destination node id to (time_cost, path_to_dest) where
         # path_to_dest represents the series of next_hops required to get to the
         # destination. thus, it never includes self.id, and is empty when this
-        # node is advertising itself in its DV.
-        self.distance_vector = {}
-
-        # maps from a neighbor id to a tuple (timestamp, DV) where DV is the
-        # latest DV we've received from them
-        self.latest_neighbor_dvs = {}
+        # node is advertising itself in its DV. it is self.table.entries, kept
+        # up to date by the table
+        self.distance_vector = self.table.entries
+        # the latest DV_Message we built. it holds a Frozen_Dict snapshot of
+        # our DV, which is reused until the DV changes
+        self.full_message = None
 
-        # maps from a neighbor id to their link cost
-        self.direct_links = {}
-
-        self.recalculate_dv()
+        # maps from a neighbor id to the seq_num of the latest DV we've
+        # received from them, None until we get their whole DV
+        self.latest_neighbor_seq_nums = {}
+        # the neighbors we sent a DV_Request to, and got no DV_Message from yet
+        self.requested = set()
+        # maps a neighbor id to the highest seq_num of the deltas from it we
+        # dropped while waiting for its whole DV. a DV_Message older than that
+        # (a delta can overtake it when the link gets faster) is not enough
+        self.dropped_seq_nums = {}
 
     # Return a string
     def __str__(self):
-        return f"I am node {str(self.id)}\nLink neighbors: {self.direct_links}\nMy Distance Vector: {self.distance_vector}"
-
-    # Returns whether the DV was changed
-    def recalculate_dv(self):
-        # print("recalculating dv")
-        # start by adding myself to new_dv
-        new_dv = {self.id: (0, [])}
-        # loop through neighbor's dv's to look for best paths to all dsts
-        for neighbor, (_, neighbor_dv) in self.latest_neighbor_dvs.items():
-            for dest, (time_cost, path) in neighbor_dv.items():
-                # print(f"possible path to {dest} with through neighbor {neighbor} and path {path} with cost {time_cost}")
-                cost = self.direct_links[neighbor] + time_cost
-                if (dest not in new_dv or cost < new_dv[dest][0]) and self.id not in path:
-                    new_dv[dest] = (cost, [neighbor] + path)
-        changed = self.distance_vector != new_dv
-        self.distance_vector = new_dv
+        return f"I am node {str(self.id)}\nLink neighbors: {self.table.links}\nMy Distance Vector: {self.distance_vector}"
+
+    # Advertises the entries of our DV that changed since the last
+    # advertisement, if any. Returns whether it did
+    def advertise_changes(self):
+        changes = self.table.take_changes()
         self.latest_dv_update = self.get_time()
-        return changed
+        if not changes:
+            return False
+        self.dv_seq_num += 1
+        if self.DELTA_ADVERTISEMENTS:
+            entries = Frozen_Dict((dest, entry) for dest, entry in changes.items() if entry is not None)
+            removed = tuple(dest for dest, entry in changes.items() if entry is None)
+            self.send_to_neighbors(DV_Delta(self.id, self.dv_seq_num, entries, removed))
+        else:
+            self.send_to_neighbors(self.serialize_routing_message())
+        return True
 
     def link_has_been_updated(self, neighbor, latency):
         # print(f"\ntime: {self.get_time()}, node: {self.id}, link has been updated: nei={neighbor} cost={latency}")
         # latency = -1 if delete a link
+        came_up = False
         if latency == -1 and neighbor in self.neighbors:
             # print(f"deleting neighbor {neighbor}")
-            del self.direct_links[neighbor]
-            del self.latest_neighbor_dvs[neighbor]
+            self.table.remove_neighbor(neighbor)
+            del self.latest_neighbor_seq_nums[neighbor]
+            self.requested.discard(neighbor)
+            self.dropped_seq_nums.pop(neighbor, None)
             self.neighbors.remove(neighbor)
         elif latency != -1 and neighbor not in self.neighbors:
             # print(f"adding neighbor {neighbor}"")
-            self.direct_links[neighbor] = latency
-            self.latest_neighbor_dvs[neighbor] = (-1, {neighbor: (latency, [neighbor])})
             # instead of depending on the neighbor to advertise their existence
             # to us we know that we already have a path to them so just assume
             # that we can use it
+            self.table.set_neighbor(neighbor, latency, {neighbor: (0, ())})
+            self.latest_neighbor_seq_nums[neighbor] = None
             self.neighbors.append(neighbor)
+            came_up = True
         elif latency != -1 and neighbor in self.neighbors:
-            self.direct_links[neighbor]=latency
+            self.table.set_link_cost(neighbor, latency)
 
         # if DV changed, notify neighbors
-        if self.recalculate_dv():
-            # print("dv changed, notifying neighbors")
-            # print(self)
-            self.send_to_neighbors(self.serialize_routing_message())
+        advertised = self.advertise_changes()
+        # a new neighbor needs our whole DV, unless it was just advertised
+        if came_up and (self.DELTA_ADVERTISEMENTS or not advertised):
+            self.send_to_neighbor(neighbor, self.serialize_routing_message())
 
     # Fill in this function
     def process_incoming_routing_message(self, m):
         # print(f"\ntime: {self.get_time()}, node: {self.id}, processing incoming routing message:", m)
-        sender_id, new_timestamp, new_dv = self.deserialize_routing_message(m)
-        if sender_id not in self.neighbors:
+        # if DV changed, notify neighbors
+        self.accept_routing_message(m)
+        self.advertise_changes()
+
+    # all the DVs that arrived in one second, so the DV is recalculated and
+    # advertised at most once per second
+    def process_incoming_routing_messages(self, ms):
+        for m in ms:
+            self.accept_routing_message(m)
+        self.advertise_changes()
+
+    # applies m to the neighbor DV we have if it is newer, answers DV_Requests
+    def accept_routing_message(self, m):
+        if m.sender_id not in self.neighbors:
             # our neighbor died after sending this message but before we received the message
             # print("received message from dead neighbor, discarding")
             return
+        sender_id = m.sender_id
+        current_seq_num = self.latest_neighbor_seq_nums[sender_id]
+
+        if type(m) is DV_Request:
+            self.send_to_neighbor(sender_id, self.serialize_routing_message())
+        elif type(m) is DV_Delta:
+            if current_seq_num is None:
+                # the DV_Message sent when our link came up is on its way
+                self.drop_delta(m)
+                return
+            elif m.seq_num <= current_seq_num:
+                # print("received old message, discarding")
+                return
+            elif m.seq_num > current_seq_num + 1:
+                # we missed a delta. deltas are useless until we get the whole DV
+                self.drop_delta(m)
+                if sender_id not in self.requested:
+                    self.requested.add(sender_id)
+                    self.send_to_neighbor(sender_id, DV_Request(self.id))
+                return
+            self.latest_neighbor_seq_nums[sender_id] = m.seq_num
+            self.table.update_neighbor_vector(sender_id, m.entries, m.removed)
         else:
-            current_timestamp, _ = self.latest_neighbor_dvs[sender_id]
-            if new_timestamp <= current_timestamp:
+            sender_id, new_seq_num, new_dv = self.deserialize_routing_message(m)
+            if current_seq_num is not None and new_seq_num <= current_seq_num:
                 # print("received old message, discarding")
                 return
+            self.latest_neighbor_seq_nums[sender_id] = new_seq_num
+            self.requested.discard(sender_id)
+            self.table.set_neighbor_vector(sender_id, new_dv)
+            if self.dropped_seq_nums.pop(sender_id, -1) > new_seq_num:
+                # a delta we dropped is newer than this DV
+                self.requested.add(sender_id)
+                self.send_to_neighbor(sender_id, DV_Request(self.id))
 
-        self.latest_neighbor_dvs[sender_id] = (new_timestamp, new_dv)
-
-        # if DV changed, notify neighbors
-        if self.recalculate_dv():
-            # print("dv changed, notifying neighbors")
-            # print(self)
-            self.send_to_neighbors(self.serialize_routing_message())
+    def drop_delta(self, m):
+        if m.seq_num > self.dropped_seq_nums.get(m.sender_id, -1):
+            self.dropped_seq_nums[m.sender_id] = m.seq_num
 
     # Return a neighbor, -1 if no path to destination
     def get_next_hop(self, destination):
         # print("getting next hop")
-        no_path_entry = (None, [-1])
+        no_path_entry = (None, (-1,))
         return self.distance_vector.get(destination, no_path_entry)[1][0]
 
-    # returns tuple (sender_id, timestamp, dv)
+    # returns tuple (sender_id, seq_num, dv)
     def deserialize_routing_message(self, msg):
-        msg = json.loads(msg)
-        jsonified_dv = msg['dv']
-        unjsonified_dv = {int(dst): (cost, path) for dst, [cost, path] in jsonified_dv.items()}
-        return msg['sender_id'], msg['timestamp'], unjsonified_dv
+        return msg.sender_id, msg.seq_num, msg.dv
 
+    # our whole DV as of the latest seq_num we advertised
     def serialize_routing_message(self):
-        msg_obj = {
-            'sender_id': self.id,
-            'timestamp': self.get_time(),
-            'dv': self.distance_vector
-        }
-        return json.dumps(msg_obj)
+        if self.full_message is None or self.full_message.seq_num != self.dv_seq_num:
+            self.full_message = DV_Message(self.id, self.dv_seq_num, Frozen_Dict(self.distance_vector))
+        return self.full_message
@@ -1,243 +1,675 @@
 import argparse
 import datetime
+import heapq
+import itertools
 import math
 import random
 
+import networkx as nx
+
 
 MAX_LATENCY = 10
 
+# chances, in percent, of a node being deleted (before it gets its links and
+# after each of them), of a link being deleted (before each new link and after
+# each link change) and of a node being added (at each link change)
+DELETE_NODE_PERCENT = 5
+DELETE_LINK_PERCENT = 10
+ADD_NODE_PERCENT = 20
 
-def random_weight():
-    return random.randint(1, MAX_LATENCY)
-
-
-def del_node(links, removed, file, link_time, node, time):
-    change = random.randint(0, 100)
-    if change <= 5:
-        for t in range(link_time + 1, time):
-            # link change events are a poisson process.
-            # we want the time between events to be roughly 10 * MAX_LATENCY
-            if 0 == random.randint(0, 10 * MAX_LATENCY):
-                if len(links) > 0:
-                    removed.append(node)
-                    file.write("{} DELETE_NODE {}\n".format(link_time + 1, node))
-                    temp = []
-                    for l in links:
-                        if not (l[0] == node or l[1] == node):
-                            temp.append(l)
-                    links.clear()
-                    links.extend(temp)
-                    return -1, t + 1
-                break
-    return 1, link_time
-
-
-def del_link(links, file, link_time, time):
-    change = random.randint(0, 100)
-    if change <= 10:
-        for t in range(link_time + 1, time):
-            # link change events are a poisson process.
-            # we want the time between events to be roughly 10 * MAX_LATENCY
-            if 0 == random.randint(0, 10 * MAX_LATENCY):
-                if len(links) > 0:
-                    link_rem = random.choice(links)
-                    links.remove(link_rem)
-                    file.write("%d DELETE_LINK %d %d\n" % (link_time + 1, link_rem[0], link_rem[1]))
-                    return t + 1
-                break
-    return link_time
+# link change events are a poisson process.
+# we want the time between events to be roughly 10 * MAX_LATENCY
+CHANGE_MEAN = 10 * MAX_LATENCY + 1
 
+# tries to find a new neighbor for a node whose link changed
+ADD_LINK_TRIES = 20
 
-# It appears CHANGE_NODE is not used anymore
-def change_node(n, node, file, links):
-    change = random.randint(0, 100)
-    if change <= 10:
-        if node >= n:
-            new_i = node + 1
-        else:
-            new_i = n
-        file.write("0 CHANGE_NODE {} {}\n".format(node, new_i))
-        for l in links:
-            new_l = l
-            if l[0] == node:
-                new_l = (new_i, l[1], l[2])
-            elif l[1] == node:
-                new_l = (l[0], new_i, l[2])
-
-            links.remove(l)
-            links.append(new_l)
-        return new_i
-    return node
-
-
-def add_node(removed, link_time, file, nxt):
-    change = random.randint(0, 100)
-    if change <= 20:
-        # They won't be testing reusing a node
-
-        # if change <= 10 and len(removed) > 0:
-        #     node = random.choice(removed)
-        #     removed.remove(node)
-        # else:
-        node = nxt
-        nxt += 1
-        file.write("{} ADD_NODE {}\n".format(link_time, node))
-    return nxt
-
-
-def add_link(n, src, removed, links, link_time, file):
-    neighbor = None
-    timeout = 20
-    count = 0
-    while True:
-        while neighbor is None:
-            offset = int(math.floor(math.log(n,2)))
-            val = random.randint(max(0, src - offset), min(n - 1, src + offset))
-            if val not in removed:
-                neighbor = val
-        if src in removed:
-            stop = 0
-        link = (src, neighbor, random_weight())
-        already_exists = any([(l[0] == src and l[1] == neighbor) or (l[0] == neighbor and l[1] == src) for l in links])
-        if already_exists or src == neighbor:
-            count += 1
-            if count >= timeout:
-                return link_time
+
+# random() is several times cheaper than randint(), and the generator makes a
+# few draws per link
+def random_weight(rng):
+    return 1 + int(rng.random() * MAX_LATENCY)
+
+
+# the chance of randint(0, 100) <= chance
+def percent(rng, chance):
+    return rng.random() * 101 < chance + 1
+
+
+class Indexed_Set:
+    # A set of ints kept in a list, with the position of every key in it, so a
+    # random key is picked and a key removed in O(1).
+
+    def __init__(self):
+        self.keys = []
+        self.positions = {}
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.positions
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def add_key(self, key):
+        self.positions[key] = len(self.keys)
+        self.keys.append(key)
+
+    def remove_key(self, key):
+        position = self.positions.pop(key)
+        last = self.keys.pop()
+        if last != key:
+            self.keys[position] = last
+            self.positions[last] = position
+
+    # A random key, None if there is none
+    def choice(self, rng):
+        if not self.keys:
+            return None
+        return self.keys[int(rng.random() * len(self.keys))]
+
+
+class Link_Set(Indexed_Set):
+    # The links of the scenario, each one an int key packing both ends.  The
+    # links of a deleted node (in removed) are not looked for: they are
+    # dropped when they come up.
+
+    def __init__(self, removed):
+        super().__init__()
+        self.removed = removed
+
+    @staticmethod
+    def key(node1, node2):
+        if node1 > node2:
+            node1, node2 = node2, node1
+        return (node1 << 32) | node2
+
+    def __contains__(self, link):
+        return self.key(*link) in self.positions
+
+    def add(self, node1, node2):
+        self.add_key(self.key(node1, node2))
+
+    def remove(self, node1, node2):
+        self.remove_key(self.key(node1, node2))
+
+    # A random link, None if there is none
+    def choice(self, rng):
+        while self.keys:
+            key = self.keys[int(rng.random() * len(self.keys))]
+            node1, node2 = key >> 32, key & 0xffffffff
+            if node1 not in self.removed and node2 not in self.removed:
+                return node1, node2
+            self.remove_key(key)
+        return None
+
+    def __iter__(self):
+        for key in self.keys:
+            node1, node2 = key >> 32, key & 0xffffffff
+            if node1 not in self.removed and node2 not in self.removed:
+                yield node1, node2
+
+
+# the format of a command with 0 to 3 arguments
+COMMAND_FORMATS = ["%d %s\n", "%d %s %d\n", "%d %s %d %d\n", "%d %s %d %d %d\n"]
+
+
+class Event_Writer:
+    # Writes the commands as they are generated, so nothing but the topology
+    # is kept in memory.  They must come in time order, so the simulator reads
+    # the file as it goes, without sorting it.
+
+    def __init__(self, file):
+        self.file = file
+        self.time = 0
+
+    def write(self, time, command, *args):
+        if time < self.time:
+            raise ValueError("%s at %d is written after time %d" % (command, time, self.time))
+        self.time = time
+        self.file.write(COMMAND_FORMATS[len(args)] % ((time, command) + args))
+
+
+class Build_Clock:
+    # The time of the commands that build the topology.  They are spread over
+    # the first half of the simulation, per_tick commands a second (one a
+    # second for small scenarios, so links are created at different times)
+
+    def __init__(self, per_tick):
+        self.per_tick = per_tick
+        self.time = 1
+        self.count = 0
+
+    def tick(self):
+        time = self.time
+        self.count += 1
+        if self.count == self.per_tick:
+            self.time += 1
+            self.count = 0
+        return time
+
+
+# the offsets of the candidate neighbors of a node: links are not truly random,
+# they favor nodes with nearby indexes
+def neighbor_offsets(n):
+    return [int((1 << j) * 1.5) for j in range(int(math.floor(math.log(n, 2))))]
+
+
+# A random candidate neighbor of node (node +- an offset) that is not tried yet
+# and can be linked to it, None if there is none left
+def pick_neighbor(rng, n, offsets, removed, links, node, tried):
+    count = 2 * len(offsets)
+    while len(tried) < count:
+        k = int(rng.random() * count)
+        if k in tried:
             continue
-        links.extend([link])
-        file.write("%d ADD_LINK %d %d %d\n" % ((link_time,) + link))
-        link_time += 1
-        break
-    return link_time
-
-
-def bfs(links, islands, nodes):
-    while len(nodes) > 0:
-        curr = next(iter(nodes))
-        queue = [curr]
-        island = set([])
-        while len(queue) > 0:
-            curr = queue.pop(0)
-            island.add(curr)
-            if curr in nodes:
-                nodes.remove(curr)
-                for i in links:
-                    if curr == i[0]:
-                        queue.append(i[1])
-                    elif curr == i[1]:
-                        queue.append(i[0])
-        islands.add(tuple(island))
-    return islands
-
-
-
-
-def generate_simulation(n, degree, time, filename):
+        tried.add(k)
+        neighbor = node + offsets[k >> 1] if k & 1 else node - offsets[k >> 1]
+        if 0 <= neighbor < n and neighbor not in removed and (node, neighbor) not in links:
+            return neighbor
+    return None
+
+
+# Returns the first node of every connected component, in node order
+def components(nodes, links, size):
+    parent = list(range(size))
+
+    def find(node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for node1, node2 in links:
+        root1, root2 = find(node1), find(node2)
+        if root1 != root2:
+            parent[max(root1, root2)] = min(root1, root2)
+    firsts, seen = [], set()
+    for node in nodes:
+        root = find(node)
+        if root not in seen:
+            seen.add(root)
+            firsts.append(node)
+    return firsts
+
+
+# CODE TO ENSURE GRAPH IS CONNECTED: links the islands one after the other
+def connect_islands(rng, out, nodes, links, size, time):
+    firsts = components(nodes, links, size)
+    for first, second in zip(firsts, firsts[1:]):
+        out.write(time, "ADD_LINK", first, second, random_weight(rng))
+
+
+# print routing results: the trees of all nodes, or of trees random nodes
+def draw_trees(rng, out, nodes, time, trees):
+    if trees is not None and trees < len(nodes):
+        nodes = sorted(rng.sample(nodes, trees))
+    for i in nodes:
+        out.write(10 * time, "DRAW_TREE", i)
+
+
+# A delay drawn from a poisson process of mean mean: the number of seconds to
+# the next event when each second has a 1 / mean chance of one
+def poisson_delay(rng, mean):
+    return 1 + int(math.log(1.0 - rng.random()) / math.log(1.0 - 1.0 / mean))
+
+
+# The classic scenario: nodes linked to nodes at index offsets, with node and
+# link deletions while the links are built, then poisson link changes
+def generate_simulation(n, degree, time, filename, seed=None, trees=None):
+    rng = random.Random(seed)
     n *= 1.5
     n = int(n)
-    nxt = n + 1
     time *= 2
     if degree > math.log(n,2)-1:
         raise Exception("Degree must be smaller than log(n) where n is the number of nodes.")
 
-    links = []
-    removed = []
+    offsets = neighbor_offsets(n)
+    removed = set()
+    links = Link_Set(removed)
+    nxt = n
 
     print("writing %s.event" % filename)
-    link_time = 1
     with open("%s.event" % filename, "w") as file:
+        out = Event_Writer(file)
         # create nodes
         for i in range(n):
-            file.write("0 ADD_NODE %d\n" % i)
-        # create random edges for each node
-        for i in range(n):
-            # don't make links truly random, favor nodes with nearby indexes
-
-            res, link_time = del_node(links, removed, file, link_time, i, time)
-            if res == -1:
-                continue
-
-            possible_neighbors = []
-            for j in range(int(math.floor(math.log(n,2)))):
-                offset = 1<<j
-                offset *= 1.5
-                offset = int(offset)
-                for neighbor in [i+offset, i-offset]:
-                    if neighbor >= 0 and neighbor < n and neighbor not in removed:
-                        already_exists = any([(l[0] == i and l[1] == neighbor) or (l[0] == neighbor and l[1] == i) for l in links])
-                        if not already_exists:
-                            possible_neighbors.append(neighbor)
-            # choose random links
-            for j in range(min(degree, len(possible_neighbors))):
-                if link_time > time // 2:
-                    break
-
-                neighbor = random.choice(possible_neighbors)
-                possible_neighbors.remove(neighbor)
+            out.write(0, "ADD_NODE", i)
 
-                # i = change_node(n, i, file, links)
+        # create random edges for each node, with a few deletions on the way
+        clock = Build_Clock(max(1, -(-n * (degree + 1) // (time // 2))))
 
-                link_time = del_link(links, file, link_time, time)
+        def delete_node(node, t):
+            removed.add(node)
+            out.write(t, "DELETE_NODE", node)
 
-                if i in removed or neighbor in removed:
-                    stop = 0
+        def delete_link(t):
+            link = links.choice(rng)
+            if link is not None:
+                links.remove(*link)
+                out.write(t, "DELETE_LINK", *link)
 
-                link = (i, neighbor, random_weight())
-                links.extend([link])
-                file.write("%d ADD_LINK %d %d %d\n" % ((link_time,) + link))
-                link_time += 1
-                # above, we actually create links at different times just in case they are duplicated
-
-                res, link_time = del_node(links, removed, file, link_time, i, time)
-                if res == -1:
+        for i in range(n):
+            if clock.time > time // 2:
+                break
+            if percent(rng, DELETE_NODE_PERCENT):
+                delete_node(i, clock.tick())
+                continue
+            tried = set()
+            for j in range(degree):
+                neighbor = pick_neighbor(rng, n, offsets, removed, links, i, tried)
+                if neighbor is None:
+                    break
+                if percent(rng, DELETE_LINK_PERCENT):
+                    delete_link(clock.tick())
+                links.add(i, neighbor)
+                out.write(clock.tick(), "ADD_LINK", i, neighbor, random_weight(rng))
+                if percent(rng, DELETE_NODE_PERCENT):
+                    delete_node(i, clock.tick())
                     break
 
-            if link_time > time // 2:
+        # change links
+        t = clock.time
+        while True:
+            # the time to the next change, drawn at once instead of one draw a second
+            t += poisson_delay(rng, CHANGE_MEAN)
+            if t >= time:
+                break
+            link = links.choice(rng)
+            if link is None:
                 break
+            node = link[0]
+            out.write(t, "CHANGE_LINK", link[0], link[1], random_weight(rng))
+            if percent(rng, ADD_NODE_PERCENT):
+                # new nodes are only linked to the rest below
+                out.write(t, "ADD_NODE", nxt)
+                nxt += 1
+            window = int(math.floor(math.log(n, 2)))
+            for _ in range(ADD_LINK_TRIES):
+                neighbor = rng.randint(max(0, node - window), min(n - 1, node + window))
+                if neighbor != node and neighbor not in removed and (node, neighbor) not in links:
+                    links.add(node, neighbor)
+                    out.write(t, "ADD_LINK", node, neighbor, random_weight(rng))
+                    break
+            if t + 1 < time and percent(rng, DELETE_LINK_PERCENT):
+                delete_link(t + 1)
+            if t + 1 < time and percent(rng, DELETE_NODE_PERCENT):
+                delete_node(node, t + 1)
+
+        nodes = [node for node in range(nxt) if node not in removed]
+        connect_islands(rng, out, nodes, links, nxt, time)
+        draw_trees(rng, out, nodes, time, trees)
+
+
+# Topology families. Each one returns the nodes and the links (node1, node2,
+# latency) of the starting topology of a scenario.
+
+# Waxman: nodes at random in the unit square, linked with a chance that falls
+# with their distance, alpha the scale of the fall
+WAXMAN_ALPHA = 0.15
+# pairs of points drawn to scale the chances to the wanted degree
+WAXMAN_SAMPLES = 10000
+
+
+def offsets_topology(rng, n, degree, **options):
+    # the classic topology, without its deletions
+    offsets = neighbor_offsets(n)
+    links = Link_Set(())
+    latencies = []
+    for i in range(n):
+        tried = set()
+        for j in range(degree):
+            neighbor = pick_neighbor(rng, n, offsets, (), links, i, tried)
+            if neighbor is None:
+                break
+            links.add(i, neighbor)
+            latencies.append((i, neighbor, random_weight(rng)))
+    return list(range(n)), latencies
+
+
+def waxman_topology(rng, n, degree, **options):
+    # every pair of nodes is tried, so it is O(n^2): some 10^4 nodes at most.
+    # beta is set so that a node gets 2 * degree links on average, and the
+    # latency of a link grows with its length
+    span = math.sqrt(2)
+    mean = sum(math.exp(-math.dist((rng.random(), rng.random()), (rng.random(), rng.random())) / (WAXMAN_ALPHA * span))
+               for _ in range(WAXMAN_SAMPLES)) / WAXMAN_SAMPLES
+    beta = min(1.0, 2 * degree / ((n - 1) * mean))
+    g = nx.waxman_graph(n, beta=beta, alpha=WAXMAN_ALPHA, L=span, seed=rng)
+    positions = nx.get_node_attributes(g, 'pos')
+    links = [(node1, node2, 1 + int(math.dist(positions[node1], positions[node2]) / span * (MAX_LATENCY - 1)))
+             for node1, node2 in g.edges]
+    return list(g.nodes), links
+
+
+def ba_topology(rng, n, degree, **options):
+    # Barabasi-Albert: scale-free, every new node links to degree nodes,
+    # chosen in proportion to their degrees
+    g = nx.barabasi_albert_graph(n, degree, seed=rng)
+    return list(g.nodes), [(node1, node2, random_weight(rng)) for node1, node2 in g.edges]
+
+
+def fattree_topology(rng, n, degree, k=None, **options):
+    # k-ary fat tree (a 3 tier Clos) of switches: (k/2)^2 core switches, and k
+    # pods of k/2 aggregation and k/2 edge switches.  Every edge switch is
+    # linked to every aggregation switch of its pod, aggregation switch i of
+    # every pod to core switches i*k/2 to (i+1)*k/2-1.  All latencies are 1.
+    # Without k, the smallest k with at least n switches
+    if k is None:
+        k = 4
+        while 5 * k * k // 4 < n:
+            k += 2
+    if k < 2 or k % 2:
+        raise Exception("The k of a fat tree must be even.")
+    half = k // 2
+    cores = half * half
+    nodes = list(range(cores + k * k))
+    links = []
+    for pod in range(k):
+        aggregations = [cores + pod * k + i for i in range(half)]
+        edges = [cores + pod * k + half + i for i in range(half)]
+        for i, aggregation in enumerate(aggregations):
+            for core in range(i * half, (i + 1) * half):
+                links.append((aggregation, core, 1))
+            for edge in edges:
+                links.append((edge, aggregation, 1))
+    return nodes, links
+
+
+def grid_topology(rng, n, degree, periodic=False, **options):
+    # the smallest square-ish grid of at least n nodes
+    rows = max(3, math.ceil(math.sqrt(n)))
+    columns = max(3, math.ceil(n / rows))
+    g = nx.grid_2d_graph(rows, columns, periodic=periodic)
+    return ([row * columns + column for row, column in g.nodes],
+            [(row1 * columns + column1, row2 * columns + column2, random_weight(rng)) for (row1, column1), (row2, column2) in g.edges])
+
+
+def torus_topology(rng, n, degree, **options):
+    return grid_topology(rng, n, degree, periodic=True)
+
+
+def edges_topology(rng, n, degree, edges=None, **options):
+    # an edge list file: one "node1 node2 [latency]" a line, # for comments.
+    # Nodes keep their ids if they are all small enough ints, and are
+    # numbered in order of appearance otherwise.  A missing latency is random
+    if edges is None:
+        raise Exception("The edges topology needs an edge list file.")
+    pairs = []
+    with open(edges) as f:
+        for line in f:
+            items = line.split('#', 1)[0].split()
+            if len(items) >= 2:
+                pairs.append((items[0], items[1], int(items[2]) if len(items) > 2 else None))
+    names = list(dict.fromkeys(name for node1, node2, _ in pairs for name in (node1, node2)))
+    if all(name.isdigit() for name in names) and max(map(int, names), default=0) < max(1 << 20, 4 * len(names)):
+        ids = {name: int(name) for name in names}
+    else:
+        ids = {name: i for i, name in enumerate(names)}
+    links, seen = [], Link_Set(())
+    for node1, node2, latency in pairs:
+        node1, node2 = ids[node1], ids[node2]
+        if node1 != node2 and (node1, node2) not in seen:
+            seen.add(node1, node2)
+            links.append((node1, node2, random_weight(rng) if latency is None else latency))
+    return sorted(ids.values()), links
+
+
+TOPOLOGIES = {
+    "offsets": offsets_topology,
+    "waxman": waxman_topology,
+    "ba": ba_topology,
+    "fattree": fattree_topology,
+    "grid": grid_topology,
+    "torus": torus_topology,
+    "edges": edges_topology,
+}
+
+
+class Scenario:
+    # The state of a scenario while its commands are written: the live nodes
+    # and the links with their latencies.  Churn is made of actions, each one
+    # run at its time by run() and writing commands at that time: a link that
+    # fails, and the action that brings it back later.  So the commands come
+    # out in time order.  The commands are only written when they are legal
+    # (no link to a dead node, no link twice).
+
+    def __init__(self, out, rng):
+        self.out = out
+        self.rng = rng
+        self.nodes = Indexed_Set()
+        # the links of a dead node are removed with it
+        self.links = Link_Set(())
+        # maps a node to {neighbor: latency}
+        self.neighbors = {}
+        self.actions = []
+        self.order = itertools.count()
+
+    def schedule(self, time, action, *args):
+        heapq.heappush(self.actions, (time, next(self.order), action, args))
+
+    # Runs the actions scheduled before end, and those they schedule
+    def run(self, end):
+        while self.actions and self.actions[0][0] < end:
+            time, _, action, args = heapq.heappop(self.actions)
+            action(time, *args)
+
+    def add_node(self, time, node):
+        if node in self.nodes:
+            return False
+        self.nodes.add_key(node)
+        self.neighbors[node] = {}
+        self.out.write(time, "ADD_NODE", node)
+        return True
+
+    def add_link(self, time, node1, node2, latency):
+        if node1 not in self.nodes or node2 not in self.nodes or node1 == node2 or (node1, node2) in self.links:
+            return False
+        self.links.add(node1, node2)
+        self.neighbors[node1][node2] = self.neighbors[node2][node1] = latency
+        self.out.write(time, "ADD_LINK", node1, node2, latency)
+        return True
+
+    def change_link(self, time, node1, node2, latency):
+        if (node1, node2) not in self.links:
+            return False
+        self.neighbors[node1][node2] = self.neighbors[node2][node1] = latency
+        self.out.write(time, "CHANGE_LINK", node1, node2, latency)
+        return True
+
+    # Returns the latency of the link, None if there is no such link
+    def delete_link(self, time, node1, node2):
+        if (node1, node2) not in self.links:
+            return None
+        self.links.remove(node1, node2)
+        del self.neighbors[node2][node1]
+        latency = self.neighbors[node1].pop(node2)
+        self.out.write(time, "DELETE_LINK", node1, node2)
+        return latency
+
+    # Returns the links of the node, {neighbor: latency}, None if it is dead
+    def delete_node(self, time, node):
+        if node not in self.nodes:
+            return None
+        self.nodes.remove_key(node)
+        links = self.neighbors.pop(node)
+        for neighbor in links:
+            self.links.remove(node, neighbor)
+            del self.neighbors[neighbor][node]
+        self.out.write(time, "DELETE_NODE", node)
+        return links
+
+    def random_link(self):
+        return self.links.choice(self.rng)
+
+
+# Churn profiles. Each one schedules the churn of a scenario from start on;
+# the scenario runs it until end.
+
+# the time a failed link or node takes to come back
+REPAIR_TIME = (5 * MAX_LATENCY, 20 * MAX_LATENCY)
+# correlated failures: a poisson process of failures, each one taking down
+# every link of a node and of up to CORRELATED_NODES - 1 of its neighbors (a
+# site, or links sharing a conduit) at once
+FAILURE_MEAN = 20 * MAX_LATENCY
+CORRELATED_NODES = 3
+# flapping links: FLAPPING_PERCENT of the links (at least one) go down and
+# up again and again, staying each way for FLAP_TIME
+FLAPPING_PERCENT = 1
+FLAP_TIME = (1, 3 * MAX_LATENCY)
+# node crashes: a poisson process of crashes, each node comes back with its
+# links after REPAIR_TIME
+CRASH_MEAN = 10 * MAX_LATENCY
+# change storms: a poisson process of storms, each one STORM_CHANGES link
+# changes within STORM_TIME seconds. STORM_DOWN_PERCENT of the changes take
+# the link down for the rest of the storm
+STORM_MEAN = 50 * MAX_LATENCY
+STORM_CHANGES = 20
+STORM_TIME = 5
+STORM_DOWN_PERCENT = 30
+
+
+def no_churn(scenario, rng, start, end):
+    pass
+
+
+def poisson_churn(scenario, rng, start, end):
+    # the classic churn: latency changes as a poisson process, and now and
+    # then a link goes away
+    def change(t):
+        link = scenario.random_link()
+        if link is not None:
+            scenario.change_link(t, link[0], link[1], random_weight(rng))
+            if percent(rng, DELETE_LINK_PERCENT):
+                scenario.schedule(t + 1, delete_random_link)
+        scenario.schedule(t + poisson_delay(rng, CHANGE_MEAN), change)
+
+    def delete_random_link(t):
+        link = scenario.random_link()
+        if link is not None:
+            scenario.delete_link(t, *link)
+
+    scenario.schedule(start + poisson_delay(rng, CHANGE_MEAN), change)
+
+
+def correlated_churn(scenario, rng, start, end):
+    def fail(t):
+        center = scenario.nodes.choice(rng)
+        if center is not None:
+            neighbors = list(scenario.neighbors[center])
+            group = [center] + rng.sample(neighbors, min(CORRELATED_NODES - 1, len(neighbors)))
+            repair = t + rng.randint(*REPAIR_TIME)
+            for node in group:
+                for neighbor in list(scenario.neighbors[node]):
+                    latency = scenario.delete_link(t, node, neighbor)
+                    scenario.schedule(repair, scenario.add_link, node, neighbor, latency)
+        scenario.schedule(t + poisson_delay(rng, FAILURE_MEAN), fail)
+
+    scenario.schedule(start + poisson_delay(rng, FAILURE_MEAN), fail)
+
+
+def flapping_churn(scenario, rng, start, end):
+    def down(t, node1, node2):
+        latency = scenario.delete_link(t, node1, node2)
+        if latency is not None:
+            scenario.schedule(t + rng.randint(*FLAP_TIME), up, node1, node2, latency)
+
+    def up(t, node1, node2, latency):
+        if scenario.add_link(t, node1, node2, latency):
+            scenario.schedule(t + rng.randint(*FLAP_TIME), down, node1, node2)
+
+    count = min(len(scenario.links), max(1, len(scenario.links) * FLAPPING_PERCENT // 100))
+    for key in sorted(rng.sample(scenario.links.keys, count)):
+        scenario.schedule(start + rng.randint(*FLAP_TIME), down, key >> 32, key & 0xffffffff)
+
+
+def crash_churn(scenario, rng, start, end):
+    # maps a crashed node to the links it gets back when it recovers. a link
+    # to a node that is down too waits for that node
+    crashed = {}
+
+    def crash(t):
+        node = scenario.nodes.choice(rng)
+        if node is not None:
+            crashed[node] = scenario.delete_node(t, node)
+            scenario.schedule(t + rng.randint(*REPAIR_TIME), recover, node)
+        scenario.schedule(t + poisson_delay(rng, CRASH_MEAN), crash)
+
+    def recover(t, node):
+        scenario.add_node(t, node)
+        for neighbor, latency in crashed.pop(node).items():
+            if neighbor in crashed:
+                crashed[neighbor][node] = latency
+            else:
+                scenario.add_link(t, node, neighbor, latency)
+
+    scenario.schedule(start + poisson_delay(rng, CRASH_MEAN), crash)
+
+
+def storm_churn(scenario, rng, start, end):
+    def storm(t):
+        for _ in range(STORM_CHANGES):
+            scenario.schedule(t + int(rng.random() * STORM_TIME), change, t + STORM_TIME)
+        scenario.schedule(t + poisson_delay(rng, STORM_MEAN), storm)
+
+    def change(t, storm_end):
+        link = scenario.random_link()
+        if link is None:
+            return
+        if percent(rng, STORM_DOWN_PERCENT):
+            latency = scenario.delete_link(t, *link)
+            scenario.schedule(storm_end, scenario.add_link, link[0], link[1], latency)
+        else:
+            scenario.change_link(t, link[0], link[1], random_weight(rng))
+
+    scenario.schedule(start + poisson_delay(rng, STORM_MEAN), storm)
+
+
+CHURN_PROFILES = {
+    "poisson": poisson_churn,
+    "correlated": correlated_churn,
+    "flapping": flapping_churn,
+    "crash": crash_churn,
+    "storm": storm_churn,
+    "none": no_churn,
+}
+
+
+# A scenario of a topology family with a churn profile. The topology is built
+# in the first half of the time, as in the classic scenario, the churn runs
+# in the second half.  churn "classic" is the classic scenario, which only
+# goes with the offsets topology; it is the default churn of offsets, poisson
+# the default of the other families
+def generate_scenario(topology, churn, n, degree, time, filename, seed=None, trees=None, k=None, edges=None):
+    if churn is None:
+        churn = "classic" if topology == "offsets" else "poisson"
+    if churn == "classic":
+        if topology != "offsets":
+            raise Exception("The classic churn only goes with the offsets topology.")
+        return generate_simulation(n, degree, time, filename, seed, trees)
+
+    rng = random.Random(seed)
+    time *= 2
+    nodes, links = TOPOLOGIES[topology](rng, n, degree, k=k, edges=edges)
 
-        # change links
-        # file.write("%d DRAW_TOPOLOGY\n" % link_time);
-        for t in range(link_time+1, time):
-            # link change events are a poisson process.
-            # we want the time between events to be roughly 10 * MAX_LATENCY
-            if 0 == random.randint(0, 10 * MAX_LATENCY):
-                link_to_change = random.choice(links)
-                links.remove(link_to_change)
-                val = random_weight()
-                file.write("%d CHANGE_LINK %d %d %d\n" %
-                           (t, link_to_change[0], link_to_change[1], val))
-                link = (link_to_change[0], link_to_change[1], val)
-                links.extend([link])
-
-                nxt = add_node(removed, t, file, nxt)
-                add_link(n, link_to_change[0], removed, links, t, file)
-                # change_node(n, link_to_change[1], file, links)
-                del_link(links, file, t, time)
-                del_node(links, removed, file, t, link_to_change[0], time)
-
-            link_time = t + 1
-
-        # CODE TO ENSURE GRAPH IS CONNECTED
-        nodes = set([x for x in range(nxt) if x not in removed])
-        islands = set([])
-        islands = bfs(links, islands, nodes)
-        first = None
-        for ind in islands:
-            if first is None:
-                first = ind[0]
-                continue
-            second = ind[0]
-            link = (first, second, random_weight())
-            file.write("%d ADD_LINK %d %d %d\n" % ((link_time,) + link))
-            # link_time += 20
-            first = second
-        # CODE TO ENSURE GRAPH IS CONNECTED
+    print("writing %s.event" % filename)
+    with open("%s.event" % filename, "w") as file:
+        out = Event_Writer(file)
+        scenario = Scenario(out, rng)
+        for node in nodes:
+            scenario.add_node(0, node)
+        clock = Build_Clock(max(1, -(-len(links) // (time // 2))))
+        for node1, node2, latency in links:
+            scenario.add_link(clock.tick(), node1, node2, latency)
 
-        # file.write("%d DRAW_TOPOLOGY\n" % (link_time + 1000))
+        CHURN_PROFILES[churn](scenario, rng, clock.time, time)
+        scenario.run(time)
 
-        # print routing results
-        for i in set([x for x in range(nxt) if x not in removed]):
-            file.write("%d DRAW_TREE %d\n" % (10*time, i))
+        nodes = sorted(scenario.nodes)
+        connect_islands(rng, out, nodes, scenario.links, max(nodes, default=0) + 1, time)
+        draw_trees(rng, out, nodes, time, trees)
 
 
 if __name__ == "__main__":
@@ -252,6 +684,21 @@ if __name__ == "__main__":
                         default=1000, help='time, in seconds, to run the simulation')
     parser.add_argument('--out', dest='filename', action='store',
                         default=current_time, help='output filename prefix')
+    parser.add_argument('--seed', dest='seed', type=int, action='store',
+                        default=None, help='random seed, the same seed gives the same file')
+    parser.add_argument('--trees', dest='trees', type=int, action='store',
+                        default=None, help='draw the trees of this many random nodes instead of all')
+    parser.add_argument('--topology', dest='topology', choices=sorted(TOPOLOGIES), action='store',
+                        default='offsets', help='topology family')
+    parser.add_argument('--churn', dest='churn', choices=['classic'] + sorted(CHURN_PROFILES), action='store',
+                        default=None, help='churn profile (classic only with the offsets topology, '
+                                           'the default there; poisson by default for the other topologies)')
+    parser.add_argument('--k', dest='k', type=int, action='store',
+                        default=None, help='k of the fattree topology (from --nodes by default)')
+    parser.add_argument('--edges', dest='edges', action='store',
+                        default=None, help='edge list file of the edges topology')
     args = parser.parse_args()
-    generate_simulation(n=int(args.n), degree=int(args.degree), time=int(args.time),
-                        filename=args.filename)
+    if args.churn == 'classic' and args.topology != 'offsets':
+        parser.error('the classic churn only goes with the offsets topology')
+    generate_scenario(args.topology, args.churn, n=int(args.n), degree=int(args.degree), time=int(args.time),
+                      filename=args.filename, seed=args.seed, trees=args.trees, k=args.k, edges=args.edges)
@@ -22,7 +22,7 @@ class Generic_Node(Node):
         self.logging.debug('link update, neighbor %d, latency %d, time %d' % (neighbor, latency, self.get_time()))
 
     def process_incoming_routing_message(self, m):
-        self.logging.debug("receive a message at Time %d. " % self.get_time() + m)
+        self.logging.debug("receive a message at Time %d. %s" % (self.get_time(), str(m)))
 
     # Return a neighbor, -1 if no path to destination
     def get_next_hop(self, destination):
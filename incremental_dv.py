@@ -0,0 +1,193 @@
+# The distance vector of a node, kept up to date one neighbor change at a
+# time instead of being rebuilt from every neighbor vector:
+#
+#   - a neighbor vector changes: only the destinations whose entries differ
+#     are re-evaluated
+#   - a link cost changes, a neighbor appears or goes away: only the
+#     destinations in that neighbor's vector are re-evaluated
+#
+# For every destination it keeps the best and the second best candidate
+# (cost, neighbor).  Re-evaluating a destination is O(1), except when its
+# best or second best candidate gets worse, which rescans the neighbors for
+# that destination only.
+#
+# Every update returns the set of destinations whose entry may have changed,
+# so the node can skip or trim its advertisement.  take_changes() returns the
+# entries that really changed since it was last called, for a delta
+# advertisement.
+#
+# The vectors handed to the table are never changed, since they may be the
+# neighbors' own.  update_neighbor_vector copies one before patching it.
+class Distance_Vector_Table:
+
+    def __init__(self, id):
+        self.id = id
+        # maps a neighbor id to the cost of the link to it
+        self.links = {}
+        # maps a neighbor id to its latest vector: destination ->
+        # (time_cost, path_to_dest)
+        self.vectors = {}
+        # our own vector, in the same format. the paths start with the next hop
+        self.entries = {id: (0, ())}
+        # maps a destination to its best and second best (cost, neighbor)
+        self.best = {}
+        self.second = {}
+        # the neighbors whose vectors are our own copies, patched in place
+        self.private = set()
+        # maps a destination whose entry changed since the last take_changes()
+        # to its entry back then (None if there was none)
+        self.old_entries = {}
+
+    def __str__(self):
+        return str(self.entries)
+
+    def set_neighbor(self, neighbor, cost, vector):
+        # adds a neighbor, or replaces the link cost and the vector of one
+        self.links[neighbor] = cost
+        old_vector = self.vectors.get(neighbor, {})
+        self.vectors[neighbor] = vector
+        self.private.discard(neighbor)
+        return self.reevaluate(neighbor, old_vector.keys() | vector.keys())
+
+    def remove_neighbor(self, neighbor):
+        if neighbor not in self.links:
+            return set()
+        del self.links[neighbor]
+        vector = self.vectors.pop(neighbor)
+        self.private.discard(neighbor)
+        return self.reevaluate(neighbor, vector.keys())
+
+    def set_link_cost(self, neighbor, cost):
+        if self.links[neighbor] == cost:
+            return set()
+        self.links[neighbor] = cost
+        return self.reevaluate(neighbor, self.vectors[neighbor].keys())
+
+    def set_neighbor_vector(self, neighbor, vector):
+        old_vector = self.vectors[neighbor]
+        self.vectors[neighbor] = vector
+        self.private.discard(neighbor)
+        if vector is old_vector:
+            return set()
+        changed = [dest for dest, entry in vector.items() if old_vector.get(dest) != entry]
+        changed.extend(old_vector.keys() - vector.keys())
+        return self.reevaluate(neighbor, changed)
+
+    # Applies the changed entries of a neighbor vector and the destinations it
+    # no longer reaches
+    def update_neighbor_vector(self, neighbor, entries, removed=()):
+        vector = self.vectors[neighbor]
+        if neighbor not in self.private:
+            vector = self.vectors[neighbor] = dict(vector)
+            self.private.add(neighbor)
+        vector.update(entries)
+        for dest in removed:
+            vector.pop(dest, None)
+        return self.reevaluate(neighbor, list(entries) + list(removed))
+
+    # The candidate route to dest through neighbor has changed for each dest of
+    # dests. Returns the destinations whose entry changed
+    def reevaluate(self, neighbor, dests):
+        changed = set()
+        for dest in dests:
+            if dest == self.id:
+                continue
+            candidate = self.candidate(neighbor, dest)
+            best, second = self.best.get(dest), self.second.get(dest)
+            if best is not None and best[1] == neighbor:
+                if candidate is not None and (second is None or candidate < second):
+                    best = candidate
+                else:
+                    best, second = self.rescan(dest)
+            elif second is not None and second[1] == neighbor:
+                if candidate is not None and candidate < best:
+                    best, second = candidate, best
+                elif candidate is not None and candidate <= second:
+                    second = candidate
+                else:
+                    best, second = self.rescan(dest)
+            elif candidate is not None:
+                if best is None or candidate < best:
+                    best, second = candidate, best
+                elif second is None or candidate < second:
+                    second = candidate
+            else:
+                continue
+
+            self.set_best(dest, best, second)
+            if self.set_entry(dest, best):
+                changed.add(dest)
+        return changed
+
+    # returns (cost, neighbor) of the route to dest through neighbor, or None
+    # if neighbor has no route to dest that avoids us
+    def candidate(self, neighbor, dest):
+        if neighbor not in self.links:
+            return None
+        entry = self.vectors[neighbor].get(dest)
+        if entry is None or self.id in entry[1]:
+            return None
+        return (self.links[neighbor] + entry[0], neighbor)
+
+    # returns the best and second best candidates for dest over all neighbors
+    def rescan(self, dest):
+        best, second = None, None
+        for neighbor in self.links:
+            candidate = self.candidate(neighbor, dest)
+            if candidate is None:
+                continue
+            if best is None or candidate < best:
+                best, second = candidate, best
+            elif second is None or candidate < second:
+                second = candidate
+        return best, second
+
+    def set_best(self, dest, best, second):
+        if best is None:
+            self.best.pop(dest, None)
+        else:
+            self.best[dest] = best
+        if second is None:
+            self.second.pop(dest, None)
+        else:
+            self.second[dest] = second
+
+    # returns whether the entry of dest changed
+    def set_entry(self, dest, best):
+        old_entry = self.entries.get(dest)
+        if best is None:
+            if old_entry is None:
+                return False
+            del self.entries[dest]
+        else:
+            cost, neighbor = best
+            entry = (cost, (neighbor,) + self.vectors[neighbor][dest][1])
+            if entry == old_entry:
+                return False
+            self.entries[dest] = entry
+        self.old_entries.setdefault(dest, old_entry)
+        return True
+
+    # Returns the entries changed since the last call, as a dict from
+    # destination to its new entry, or to None if it is no longer reachable
+    def take_changes(self):
+        entries = self.entries
+        changes = {dest: entries.get(dest) for dest, old_entry in self.old_entries.items() if entries.get(dest) != old_entry}
+        self.old_entries = {}
+        return changes
+
+    # Recomputes the whole vector from scratch, returns the destinations whose
+    # entry changed
+    def rebuild(self):
+        dests = set(self.entries)
+        for vector in self.vectors.values():
+            dests.update(vector)
+        dests.discard(self.id)
+        self.best, self.second = {}, {}
+        changed = set()
+        for dest in dests:
+            best, second = self.rescan(dest)
+            self.set_best(dest, best, second)
+            if self.set_entry(dest, best):
+                changed.add(dest)
+        return changed
@@ -0,0 +1,133 @@
+import heapq
+import itertools
+
+
+# A shortest path tree over an undirected graph with non-negative link
+# latencies, kept up to date one link change at a time (in the manner of
+# Ramalingam and Reps' dynamic shortest paths):
+#
+#   - a link appears or its latency falls: only the nodes it brings closer
+#     are touched.  They are found by a Dijkstra that starts at the far end of
+#     the link and stops wherever distances do not improve
+#   - a link of the tree is removed or its latency rises: only the subtree
+#     hanging below it can get farther.  Its nodes are detached, reattached to
+#     their best neighbor outside the subtree, and a Dijkstra restricted to
+#     the subtree settles them
+#   - a link outside the tree is removed or rises: nothing changes
+class Shortest_Path_Tree:
+
+    def __init__(self, root):
+        self.root = root
+        # adj[u][v] is the latency of link (u, v)
+        self.adj = {root: {}}
+        # for every node reachable from root: its distance, its parent in the
+        # tree and the neighbor of root through which the tree reaches it
+        self.dist = {root: 0}
+        self.parent = {root: None}
+        self.first_hop = {}
+        self.children = {root: set()}
+        self.tie_breaker = itertools.count()
+
+    def __str__(self):
+        return "dist: %s\nfirst_hop: %s" % (str(self.dist), str(self.first_hop))
+
+    # Sets the latency of link (u, v), adding the link if needed.  repair=False
+    # only changes the graph and leaves the tree for a later rebuild()
+    def set_link(self, u, v, latency, repair=True):
+        old_latency = self.adj.get(u, {}).get(v)
+        self.adj.setdefault(u, {})[v] = latency
+        self.adj.setdefault(v, {})[u] = latency
+        if not repair or old_latency == latency:
+            return
+        if old_latency is None or latency < old_latency:
+            self.link_fell(u, v, latency)
+        else:
+            self.link_rose(u, v)
+
+    def remove_link(self, u, v, repair=True):
+        if v not in self.adj.get(u, {}):
+            return
+        del self.adj[u][v]
+        del self.adj[v][u]
+        if repair:
+            self.link_rose(u, v)
+
+    # Recomputes the whole tree from scratch
+    def rebuild(self):
+        self.dist = {self.root: 0}
+        self.parent = {self.root: None}
+        self.first_hop = {}
+        self.children = {self.root: set()}
+        self.settle([(0, next(self.tie_breaker), self.root)])
+
+    def link_fell(self, u, v, latency):
+        infinity = float('inf')
+        du, dv = self.dist.get(u, infinity), self.dist.get(v, infinity)
+        if du + latency < dv:
+            near, far = u, v
+        elif dv + latency < du:
+            near, far = v, u
+        else:
+            return
+        distance = self.dist[near] + latency
+        self.attach(far, near, distance)
+        self.settle([(distance, next(self.tie_breaker), far)])
+
+    def link_rose(self, u, v):
+        if self.parent.get(v) == u:
+            top = v
+        elif self.parent.get(u) == v:
+            top = u
+        else:
+            return
+
+        # detach the subtree below the link
+        subtree = [top]
+        for node in subtree:
+            subtree.extend(self.children.get(node, ()))
+        self.children[self.parent[top]].discard(top)
+        for node in subtree:
+            del self.dist[node]
+            del self.parent[node]
+            self.first_hop.pop(node, None)
+            self.children[node] = set()
+
+        # reattach each of its nodes to the best neighbor outside it
+        heap = []
+        for node in subtree:
+            best, best_parent = None, None
+            for neighbor, latency in self.adj[node].items():
+                if neighbor in self.dist and (best is None or self.dist[neighbor] + latency < best):
+                    best, best_parent = self.dist[neighbor] + latency, neighbor
+            if best is not None:
+                self.attach(node, best_parent, best)
+                heap.append((best, next(self.tie_breaker), node))
+        heapq.heapify(heap)
+        self.settle(heap)
+
+    # Makes parent the parent of node at the given distance
+    def attach(self, node, parent, distance):
+        old_parent = self.parent.get(node)
+        if old_parent is not None:
+            self.children[old_parent].discard(node)
+        self.dist[node] = distance
+        self.parent[node] = parent
+        self.children.setdefault(parent, set()).add(node)
+
+    # Dijkstra from the (distance, tie breaker, node) entries of heap, whose
+    # nodes are already attached.  Only nodes whose distance improves are
+    # visited.
+    def settle(self, heap):
+        infinity = float('inf')
+        while heap:
+            distance, _, node = heapq.heappop(heap)
+            if distance > self.dist.get(node, infinity):
+                continue
+            parent = self.parent[node]
+            if parent is not None:
+                self.first_hop[node] = node if parent == self.root else self.first_hop[parent]
+            for neighbor, latency in self.adj[node].items():
+                new_distance = distance + latency
+                if new_distance < self.dist.get(neighbor, infinity):
+                    self.attach(neighbor, node, new_distance)
+                    heapq.heappush(heap, (new_distance, next(self.tie_breaker), neighbor))
@@ -1,18 +1,30 @@
 from simulator.node import Node
-import logging
-import json
+from incremental_spf import Shortest_Path_Tree
+from collections import namedtuple
+
+# a link state: the sender, the link (src, dst) and its sequence number and
+# latency. a routing message is a tuple of LSAs
+LSA = namedtuple('LSA', ['sender_id', 'src', 'dst', 'seq_num', 'latency'])
 
 #TODO: test deleting nodes
 class Link_State_Node(Node):
+    # whether the shortest path tree is repaired incrementally when at most
+    # INCREMENTAL_SPF_MAX_CHANGES links changed since it was last used
+    INCREMENTAL_SPF = True
+    INCREMENTAL_SPF_MAX_CHANGES = 16
+
     def __init__(self, id):
         super().__init__(id)
         self.logging.debug("new node %d" % self.id)
         self.link_states = {} # dictionary from unordered pairs of link ids (frozensets) to (seq_num, latency) pairs
-        self.adj_list = {} # dictionary from a node id to sets of neighbor ids
-        self.routing_table = {}
+        self.spt = Shortest_Path_Tree(self.id) # the network and my shortest path tree over it
+        self.routing_table = {} # dictionary from a destination id to the neighbor id of the next hop
+        # links whose state changed since routing_table was computed (a dict
+        # used as an ordered set)
+        self.changed_links = {}
 
     def __str__(self):
-        return f"I am node: {str(self.id)}\nLink neighbors: {self.neighbors}\nLink state dict: {str(self.link_states)}\nadj_list: {str(self.adj_list)}"
+        return f"I am node: {str(self.id)}\nLink neighbors: {self.neighbors}\nLink state dict: {str(self.link_states)}\nadj_list: {str(self.spt.adj)}"
 
     # updates the link in my own routing table only, returns a (old_seq_num, (seq_num,
     # latency)) tuple. seq_num of None means that the update is directly observed
@@ -22,80 +34,35 @@ class Link_State_Node(Node):
         if seq_num is None or seq_num > old_seq_num:
             # maintain link states
             self.link_states[link] = old_seq_num + 1, latency
+            self.changed_links[link] = None
 
-            # maintain adjacency list of network
+        return old_seq_num, self.link_states[link]
+
+    # Brings the shortest path tree up to date with the links changed since
+    # the last lookup: link by link if there are few of them, otherwise by
+    # recomputing it
+    def update_routing_table(self):
+        repair = self.INCREMENTAL_SPF and len(self.changed_links) <= self.INCREMENTAL_SPF_MAX_CHANGES
+        for link in self.changed_links:
             src, dst = link
+            latency = self.link_states[link][1]
             if latency == -1:
-                self.adj_list.setdefault(src, set()).discard(dst)
-                self.adj_list.setdefault(dst, set()).discard(src)
+                self.spt.remove_link(src, dst, repair)
             else:
-                self.adj_list.setdefault(src, set()).add(dst)
-                self.adj_list.setdefault(dst, set()).add(src)
-
-        return old_seq_num, self.link_states[link]
-
-    def run_dijkstra(self):
-        # First, let's define a function to find the node with the smallest distance
-        # that has not been visited yet
-        def min_distance(distances, visited):
-            # Initialize minimum distance for next node
-            min_val = float('inf')
-            min_node = -1
-            # Loop through all nodes to find minimum distance
-            for node, distance in distances.items():
-                if distance < min_val and node not in visited:
-                    min_val = distance
-                    min_node = node
-            return min_node
-
-        # Initialize distance and visited "arrays"
-        infinity = float('inf')
-        distances = {v:infinity for v in self.adj_list.keys()}
-        visited = set()
-        # Set distance at starting node to 0
-        distances[self.id] = 0
-
-        # Loop through all nodes to find shortest path to each node
-        for i in range(len(self.adj_list)):
-            # Find minimum distance node that has not been visited yet
-            current_node = min_distance(distances, visited)
-            # can't reach any other node, return early
-            if current_node==-1:
-                return
-            
-            # Add current_node to list of visited nodes
-            visited.add(current_node)
-            # Loop through all unvisited neighboring nodes of current_node
-            for neighbor in self.adj_list[current_node]:
-                if neighbor not in visited:
-                    # Calculate the distance from start_node to neighbor,
-                    # passing through current_node
-                    latency = self.link_states[frozenset([neighbor, current_node])][1]
-                    new_distance = distances[current_node] + latency
-                    # Update the distance if it is less than previous recorded value
-                    if new_distance < distances[neighbor]:
-                        distances[neighbor] = new_distance
-                        if current_node == self.id:
-                            self.routing_table[neighbor] = neighbor
-                        else:
-                            self.routing_table[neighbor] = self.routing_table[current_node]
+                self.spt.set_link(src, dst, latency, repair)
+        if not repair:
+            self.spt.rebuild()
+        self.changed_links = {}
+        self.routing_table = self.spt.first_hop
 
     def serialize_routing_message(self, link):
         # routing message: link source, link destination, sequence number, latency
         seq_num, latency = self.link_states[link]
         src, dst = link
-        msg_obj = {
-            "sender_id": self.id,
-            "src": src,
-            "dst": dst,
-            "seq_num": seq_num,
-            "latency": latency
-        }
-        return json.dumps(msg_obj)
+        return LSA(self.id, src, dst, seq_num, latency)
 
     def deserialize_routing_message(self, msg):
-        msg = json.loads(msg)
-        return msg["sender_id"], frozenset([msg["src"], msg["dst"]]), msg["seq_num"], msg["latency"]
+        return msg.sender_id, frozenset([msg.src, msg.dst]), msg.seq_num, msg.latency
 
     def link_has_been_updated(self, neighbor, latency):
         self.logging.debug('link update, neighbor %d, latency %d, time %d' % (neighbor, latency, self.get_time()))
@@ -112,26 +79,42 @@ class Link_State_Node(Node):
             # for new neighbors, send information about every *other* link in link_states dict
             for link in self.link_states:
                 if link != my_link:
-                    self.send_to_neighbor(neighbor, self.serialize_routing_message(link))
+                    self.send_to_neighbor(neighbor, (self.serialize_routing_message(link),))
         
         # propagate received link info to all neighbors
-        self.send_to_neighbors(self.serialize_routing_message(my_link))
+        self.send_to_neighbors((self.serialize_routing_message(my_link),))
 
     def process_incoming_routing_message(self, m):
-        self.logging.debug("receive a message at Time %d. " % self.get_time() + m)
-
-        sender_id, msg_link, seq_num, latency = self.deserialize_routing_message(m)
-        old_seq_num, _ = self.update_link(msg_link, latency, seq_num)
-
-        if seq_num > old_seq_num:
-            # message is new
+        self.process_incoming_routing_messages([m])
+
+    # all the messages that arrived in one second: every link that is new to
+    # us is flooded once, all of them in one message, and each sender of old
+    # link states gets one message with our newer ones
+    def process_incoming_routing_messages(self, ms):
+        new_links = {}
+        old_links = {}
+        for m in ms:
+            self.logging.debug("receive a message at Time %d. %s" % (self.get_time(), str(m)))
+            for lsa in m:
+                sender_id, msg_link, seq_num, latency = self.deserialize_routing_message(lsa)
+                old_seq_num, _ = self.update_link(msg_link, latency, seq_num)
+
+                if seq_num > old_seq_num:
+                    # message is new
+                    new_links[msg_link] = None
+                elif seq_num < old_seq_num:
+                    # message is old
+                    old_links.setdefault(sender_id, {})[msg_link] = None
+
+        if new_links:
             # propagate to all neighbors
-            self.send_to_neighbors(self.serialize_routing_message(msg_link))
-        elif seq_num < old_seq_num:
-            # message is old, send new link info to sender
-            self.send_to_neighbor(sender_id, self.serialize_routing_message(msg_link))
+            self.send_to_neighbors(tuple(self.serialize_routing_message(link) for link in new_links))
+        for sender_id, links in old_links.items():
+            # send new link info to sender
+            self.send_to_neighbor(sender_id, tuple(self.serialize_routing_message(link) for link in links))
 
     # Return a neighbor, -1 if no path to destination
     def get_next_hop(self, destination):
-        self.run_dijkstra()
+        if self.changed_links:
+            self.update_routing_table()
         return self.routing_table.get(destination, -1)
@@ -1,5 +1,5 @@
 #!/bin/bash
-# runs all test cases in a given folder 
+# runs all test cases in a given folder, in parallel (see simulator/runner.py)
 
 # Check if at least two arguments are provided
 if [ "$#" -lt 2 ]; then
@@ -7,9 +7,4 @@ if [ "$#" -lt 2 ]; then
     exit 1
 fi
 
-extension="event"
-
-find "$2" -type f -name "*.$extension" | while read -r file; do
-	echo "Running tests on $file"
-	python3 sim.py $1 $file
-done
\ No newline at end of file
+python3 -m simulator.runner "$1" "$2" "${@:3}"
@@ -1,61 +1,171 @@
 import sys
 import logging
+import argparse
 
 from simulator.config import *
-from simulator.topology import Topology, Get_Time
-from simulator.event_queue import Event_Queue
+from simulator.topology import Topology
+from simulator.event import DISPATCH_TABLE
+from simulator.trace import compile_command_file
+from simulator.message import estimate_size
+from simulator.render import IMAGE_FORMATS
+from simulator.profiler import Profiler
+from simulator.convergence import Convergence
+from simulator.guards import Guards, Limits, Simulation_Aborted
+from simulator.parallel import Parallel_Sim
 
 
 class Sim(Topology):
 
-    def __init__(self, algorithm, event_file, step='NORMAL'):
-        super().__init__(algorithm, step)
-        self.load_command_file(event_file)
+    CHECKPOINT_ATTRIBUTES = Topology.CHECKPOINT_ATTRIBUTES + ('event_count',)
+
+    def __init__(self, algorithm, event_file, step='NORMAL', queue=DEFAULT_EVENT_QUEUE, strict=False, size_estimator=estimate_size, batch=True, headless=False, report=None, image_format='png', render_workers=None, profile=None, convergence=None, check_convergence=False, limits=None,
+                 checkpoint=None, checkpoint_at=None, resume=None):
+        super().__init__(algorithm, step, queue, strict, size_estimator, batch, headless, report, image_format, render_workers)
+        self.event_count = 0
+        # resume is a checkpoint to start from (simulator/checkpoint.py), with
+        # event_file as its new tail, if any. checkpoint is the file a
+        # checkpoint is written to once every event up to time checkpoint_at
+        # has run
+        if resume:
+            resumed_at = self.restore_checkpoint(resume, event_file)
+            self.logging.info("Resumed from %s, taken at time %d" % (resume, resumed_at))
+        else:
+            self.load_command_file(event_file)
+        # profile is the prefix of the files the profile is written to, see
+        # simulator/profiler.py. None runs without one
+        self.profiler = Profiler(self) if profile else None
+        # convergence is the file the convergence of every topology command is
+        # written to, see simulator/convergence.py
+        self.convergence = Convergence(self, check_convergence) if convergence else None
+        # limits stop a run that runs away, see simulator/guards.py. aborted
+        # is the snapshot of an aborted run
+        self.guards = Guards(self, limits) if limits and any(limit is not None for limit in limits) else None
+        self.aborted = None
         self.dump_sim()
-        self.dispatch_event(self.step)
+        try:
+            if checkpoint:
+                self.queue.Set_Horizon(checkpoint_at)
+                self.dispatch_event(self.step)
+                self.queue.Set_Horizon(None)
+                self.save_checkpoint(checkpoint, checkpoint_at)
+                self.logging.info("Checkpoint written to %s at time %d" % (checkpoint, checkpoint_at))
+            self.dispatch_event(self.step)
+        except Simulation_Aborted as aborted:
+            self.abort(aborted)
         self.logging.info("Total messages sent: %d" % self.message_count)
+        if self.last_message_time is not None:
+            self.logging.info("Last message arrived at time %d" % self.last_message_time)
+        if self.size_estimator:
+            self.logging.info("Total message bytes: %d" % self.message_bytes)
+        self.logging.info("Routing processing time: %.3f s" % self.processing_time)
+        if self.profiler:
+            self.profiler.log_summary(self.logging)
+            self.profiler.write(profile)
+            self.logging.info("Profile written to %s.json, %s.csv and %s.collapsed" % (profile, profile, profile))
+        if self.convergence:
+            self.convergence.log_summary(self.logging)
+            self.convergence.write(convergence)
+        self.close_report()
+        self.close_renderer()
 
     def __str__(self):
         ans = "==== Print Topology ====\n"
         ans += super().__str__()
         ans += "==== Print Event ====\n"
-        ans += Event_Queue.Str()
+        ans += self.queue.Str()
         return ans
 
     def dump_sim(self):
-        self.logging.info("DUMP_SIM at Time %d\n" % Get_Time() + str(self))
+        self.logging.info("DUMP_SIM at Time %d\n" % self.get_time() + str(self))
 
     def dispatch_event(self, step='NORMAL'):
-        e = Event_Queue.Get_Earliest()
+        if self.profiler:
+            self.profiler.dispatch_event(step)
+            return
+        e = self.queue.Get_Earliest()
         while e:
-            e.dispatch()
+            self.event_count += 1
+            DISPATCH_TABLE[e.event_type](self, e)
             if step == 'SINGLE_STEP':
                 self.logging.info(str(e))
                 self.wait()
-            e = Event_Queue.Get_Earliest()
+            e = self.queue.Get_Earliest()
+
+    def abort(self, aborted):
+        self.aborted = self.guards.snapshot(aborted)
+        self.logging.error("Aborted at time %d: %s, %d events queued" % (self.get_time(), aborted, self.aborted['queued']))
+        self.logging.error("Hottest nodes (messages sent): " + ", ".join("%s (%d)" % (n['node'], n['sent']) for n in self.aborted['hottest_nodes']))
+        self.logging.error("Hottest links (messages sent): " + ", ".join("%s->%s (%d)" % (l['node'], l['neighbor'], l['sent']) for l in self.aborted['hottest_links']))
+        self.write_report("ABORTED", correct=False, **self.aborted)
 
     def print_comment(self, comment):
-        self.logging.info('Time: %d, Comment: %s' % (Get_Time(), comment))
+        self.logging.info('Time: %d, Comment: %s' % (self.get_time(), comment))
 
 
-def main():
-    if len(sys.argv) < 3 or len(sys.argv) > 4 or sys.argv[1] not in ROUTE_ALGORITHM:
+class Usage_Parser(argparse.ArgumentParser):
+
+    def error(self, message):
         sys.stderr.write(USAGE_STR)
         sys.exit(-1)
 
-    step = 'NO_STOP'
-    if len(sys.argv) == 4:
-        if sys.argv[3] not in STEP_COMMAND:
-            sys.stderr.write(USAGE_STR)
-            sys.exit(-1)
-        else:
-            step = sys.argv[3]
 
-    s = Sim(sys.argv[1], sys.argv[2], step)
+def compile_main():
+    if len(sys.argv) != 4:
+        sys.stderr.write(USAGE_STR)
+        sys.exit(-1)
+    count = compile_command_file(sys.argv[2], sys.argv[3])
+    print("compiled %d commands from %s into %s" % (count, sys.argv[2], sys.argv[3]))
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == 'compile':
+        compile_main()
+        return
+
+    parser = Usage_Parser(add_help=False)
+    parser.add_argument('algorithm', choices=ROUTE_ALGORITHM)
+    parser.add_argument('event', nargs='?')
+    parser.add_argument('step', nargs='?', choices=STEP_COMMAND, default='NO_STOP')
+    parser.add_argument('--queue', choices=EVENT_QUEUE, default=DEFAULT_EVENT_QUEUE)
+    parser.add_argument('--strict', action='store_true')
+    parser.add_argument('--no-batch', dest='batch', action='store_false')
+    parser.add_argument('--headless', action='store_true')
+    parser.add_argument('--report')
+    parser.add_argument('--format', dest='image_format', choices=IMAGE_FORMATS, default='png')
+    parser.add_argument('--render-workers', type=int)
+    parser.add_argument('--profile')
+    parser.add_argument('--convergence')
+    parser.add_argument('--check-convergence', action='store_true')
+    parser.add_argument('--max-time', type=int)
+    parser.add_argument('--max-messages', type=int)
+    parser.add_argument('--max-messages-per-tick', type=int)
+    parser.add_argument('--max-wall-time', type=float)
+    parser.add_argument('--checkpoint')
+    parser.add_argument('--checkpoint-at', type=int)
+    parser.add_argument('--resume')
+    parser.add_argument('--workers', type=int)
+    args = parser.parse_args()
+    if (args.event is None and args.resume is None) or ((args.checkpoint is None) != (args.checkpoint_at is None)):
+        parser.error("missing argument")
+
+    limits = Limits(args.max_time, args.max_messages, args.max_messages_per_tick, args.max_wall_time)
+    if args.workers:
+        if args.event is None or args.step == 'SINGLE_STEP' or args.profile or args.convergence or args.checkpoint or args.resume or any(limit is not None for limit in limits):
+            parser.error("not with --workers")
+        Parallel_Sim(args.algorithm, args.event, args.workers, args.step, args.strict, batch=args.batch, headless=args.headless,
+                     report=args.report, image_format=args.image_format, render_workers=args.render_workers)
+        return
+
+    s = Sim(args.algorithm, args.event, args.step, args.queue, args.strict, batch=args.batch, headless=args.headless,
+            report=args.report, image_format=args.image_format, render_workers=args.render_workers, profile=args.profile,
+            convergence=args.convergence, check_convergence=args.check_convergence,
+            limits=limits,
+            checkpoint=args.checkpoint, checkpoint_at=args.checkpoint_at, resume=args.resume)
 
 
 if __name__ == '__main__':
     # Try: python sim.py GENERIC demo.event
+    # Or compile an event file once and replay it: python sim.py compile demo.event demo.trace
     # Change logging level from DEBUG to INFO or WARNING, if DEBUG information bothers you
     logging.basicConfig(level=logging.INFO, format=LOGGING_FORMAT, datefmt=LOGGING_DATAFMT)
     main()
@@ -0,0 +1,67 @@
+import io
+import sys
+import zlib
+import pickle
+
+
+# A checkpoint is the state of a simulation between two time stamps (sim.py
+# --checkpoint FILE --checkpoint-at TIME), from which it can be resumed (sim.py
+# --resume FILE), with the rest of its event file or with another tail.
+#
+# It holds the event queue and the clock, the graph, the nodes with all their
+# routing state, the routing messages in flight (and the pending batches) and
+# the counters, pickled in one go, so that what is shared stays shared (a
+# message sent to every neighbor is one object, in the queue and in
+# Topology.last_message).  The nodes' Simulation_Context is not saved: it is
+# a persistent reference, which comes back as the context of the simulation
+# that restores it.  Caches (ground truth, next hop forests, layouts) and
+# files (the script, the report, the renderer) are not saved either.
+#
+# The file is CHECKPOINT_MAGIC followed by the zlib-compressed pickle.
+CHECKPOINT_MAGIC = b'ROUTESIM-CHECKPOINT-1\n'
+COMPRESSION_LEVEL = 6
+CONTEXT = 'context'
+
+
+class Checkpoint_Pickler(pickle.Pickler):
+
+    def __init__(self, file, context):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self.context = context
+
+    def persistent_id(self, obj):
+        return CONTEXT if obj is self.context else None
+
+
+class Checkpoint_Unpickler(pickle.Unpickler):
+
+    def __init__(self, file, context):
+        super().__init__(file)
+        self.context = context
+
+    def persistent_load(self, pid):
+        if pid != CONTEXT:
+            raise pickle.UnpicklingError("unknown persistent id %r" % pid)
+        return self.context
+
+
+def save_checkpoint(file, state, context):
+    buffer = io.BytesIO()
+    Checkpoint_Pickler(buffer, context).dump(state)
+    with open(file, 'wb') as f:
+        f.write(CHECKPOINT_MAGIC)
+        f.write(zlib.compress(buffer.getbuffer(), COMPRESSION_LEVEL))
+
+
+def load_checkpoint(file, context):
+    try:
+        with open(file, 'rb') as f:
+            data = f.read()
+    except IOError as e:
+        print("Can not open checkpoint " + file)
+        print(e)
+        sys.exit(-1)
+    if not data.startswith(CHECKPOINT_MAGIC):
+        sys.stderr.write("%s is not a checkpoint\n" % file)
+        sys.exit(-1)
+    return Checkpoint_Unpickler(io.BytesIO(zlib.decompress(data[len(CHECKPOINT_MAGIC):])), context).load()
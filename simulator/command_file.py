@@ -0,0 +1,155 @@
+import sys
+import heapq
+import tempfile
+import traceback
+from operator import itemgetter
+
+from simulator.config import *
+from simulator.event import Event
+
+
+# A command file is streamed instead of loaded: the simulator pulls the next
+# scripted command only when the clock reaches it, so memory is proportional
+# to the routing messages in flight and not to the length of the script.
+#
+# Commands must come out in time order, and commands of the same time in file
+# order.  A first pass over the file splits it into sorted runs:
+#   - one run (a time-sorted file): the file is simply read line by line
+#   - a few runs (a chunk-sorted file): the runs are merged straight out of
+#     the file, with one file handle per run
+#   - many runs (an unsorted file): external sort.  The file is cut into
+#     chunks of SORT_CHUNK_LINES commands, each chunk is sorted in memory and
+#     spilled to a temporary file, and the spilled chunks are merged.
+MAX_MERGE_RUNS = 64
+SORT_CHUNK_LINES = 1 << 20
+
+
+def parse_command(line):
+    # returns an Event for one line of a command file, or None for blank
+    # lines, comments and unknown commands
+    line = line.strip()
+    if line == "" or line[0] == '#':
+        return None
+
+    items = line.split(' ')
+    time_stamp = int(items[0])
+    event_type = EVENT_CODE.get(items[1])
+    if event_type is None or event_type in INTERNAL_EVENTS:
+        return None
+
+    num_args = len(items) - 2
+    if event_type == EVENT_TYPE.PRINT:
+        return Event(time_stamp, event_type, "".join(items[2:]))
+    elif num_args < 0 or num_args > 3:
+        sys.stderr.write(line)
+        raise BufferError
+    elif num_args == 0:
+        return Event(time_stamp, event_type)
+    elif num_args == 1:
+        return Event(time_stamp, event_type, int(items[2]))
+    elif num_args == 2:
+        return Event(time_stamp, event_type, int(items[2]), int(items[3]))
+    else:
+        return Event(time_stamp, event_type, int(items[2]), int(items[3]), int(items[4]))
+
+
+def command_time(line):
+    # returns the time stamp of a line, or None if the line is not a command
+    line = line.strip()
+    if line == b"" or line[:1] == b'#':
+        return None
+    return int(line.split(b' ', 1)[0])
+
+
+def wrong_format(file, e):
+    if isinstance(e, BufferError):
+        print("File with wrong format " + file)
+    else:
+        print("File with wrong format " + file)
+        print(e)
+        traceback.print_exc()
+    sys.exit(-1)
+
+
+class Command_File:
+
+    def __init__(self, file, max_merge_runs=MAX_MERGE_RUNS, sort_chunk_lines=SORT_CHUNK_LINES):
+        self.file = file
+        self.sort_chunk_lines = sort_chunk_lines
+        # byte offsets (start, end) of the sorted runs of the file
+        self.runs = []
+        self.scan()
+        self.merge_runs = len(self.runs) <= max_merge_runs
+
+    def scan(self):
+        start, offset, last_time = 0, 0, None
+        with open(self.file, 'rb') as f:
+            for line in f:
+                time_stamp = command_time(line)
+                if time_stamp is not None:
+                    if last_time is not None and time_stamp < last_time:
+                        self.runs.append((start, offset))
+                        start = offset
+                    last_time = time_stamp
+                offset += len(line)
+        self.runs.append((start, offset))
+
+    def is_sorted(self):
+        return len(self.runs) == 1
+
+    def __iter__(self):
+        try:
+            if self.is_sorted():
+                lines = self.read_run(*self.runs[0])
+            elif self.merge_runs:
+                lines = (line for _, line in heapq.merge(*[self.timed_lines(self.read_run(*run)) for run in self.runs], key=itemgetter(0)))
+            else:
+                lines = (line for _, line in heapq.merge(*self.sorted_chunks(), key=itemgetter(0)))
+            for line in lines:
+                e = parse_command(line.decode())
+                if e is not None:
+                    yield e
+        except (BufferError, ValueError, IndexError) as e:
+            wrong_format(self.file, e)
+
+    def read_run(self, start, end):
+        with open(self.file, 'rb') as f:
+            f.seek(start)
+            offset = start
+            while offset < end:
+                line = f.readline()
+                offset += len(line)
+                yield line
+
+    def timed_lines(self, lines):
+        for line in lines:
+            time_stamp = command_time(line)
+            if time_stamp is not None:
+                yield time_stamp, line
+
+    def sorted_chunks(self):
+        # spills the file as sorted chunks, returns an iterator over each
+        chunks = []
+        chunk = []
+        for timed_line in self.timed_lines(self.read_run(0, self.runs[-1][1])):
+            chunk.append(timed_line)
+            if len(chunk) == self.sort_chunk_lines:
+                chunks.append(self.spill(chunk))
+                chunk = []
+        if chunk:
+            chunks.append(self.spill(chunk))
+        return [self.read_chunk(f) for f in chunks]
+
+    def spill(self, chunk):
+        # list.sort is stable, so commands of the same time keep file order
+        chunk.sort(key=itemgetter(0))
+        f = tempfile.TemporaryFile()
+        for _, line in chunk:
+            f.write(line.rstrip(b'\r\n') + b'\n')
+        f.seek(0)
+        return f
+
+    def read_chunk(self, f):
+        with f:
+            for line in self.timed_lines(f):
+                yield line
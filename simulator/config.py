@@ -14,39 +14,107 @@ STEP_COMMAND = [
     "NO_STOP"
 ]
 
+EVENT_QUEUE = [
+    "BUCKET",
+    "TUPLE_HEAP",
+    "HEAP",
+    "KEYED"
+]
+
+DEFAULT_EVENT_QUEUE = "BUCKET"
+
 ROUTE_ALGORITHM_NODE = {
     "GENERIC" : Generic_Node,
     "DISTANCE_VECTOR" : Distance_Vector_Node,
     "LINK_STATE" : Link_State_Node
 }
 
+# Event types are small integer codes, so that an event can be dispatched by
+# indexing a table instead of comparing strings.
 class EVENT_TYPE:
-    ADD_NODE = "ADD_NODE"
-    ADD_LINK = "ADD_LINK"
+    # Not for user
+    ROUTING_MESSAGE_ARRIVAL = 0
+    SEND_LINK = 1
+
+    ADD_NODE = 2
+    ADD_LINK = 3
 
-    DELETE_NODE = "DELETE_NODE"
-    DELETE_LINK = "DELETE_LINK"
+    DELETE_NODE = 4
+    DELETE_LINK = 5
 
-    CHANGE_LINK = "CHANGE_LINK"
+    CHANGE_LINK = 6
 
-    PRINT = "PRINT"
-    DRAW_TOPOLOGY = "DRAW_TOPOLOGY"
-    DRAW_PATH = "DRAW_PATH"
-    DRAW_TREE = "DRAW_TREE"
-    DUMP_NODE = "DUMP_NODE"
-    DUMP_SIM = "DUMP_SIM"
+    PRINT = 7
+    DRAW_TOPOLOGY = 8
+    DRAW_PATH = 9
+    DRAW_TREE = 10
+    DUMP_NODE = 11
+    DUMP_SIM = 12
 
     # Not for user
-    ROUTING_MESSAGE_ARRIVAL = "ROUTING_MESSAGE_ARRIVAL"
-    SEND_LINK = "SEND_LINK"
+    DELIVER_BATCH = 13
+
+
+# EVENT_NAME[code] is the name of the event type as written in an event file
+EVENT_NAME = [
+    "ROUTING_MESSAGE_ARRIVAL",
+    "SEND_LINK",
+    "ADD_NODE",
+    "ADD_LINK",
+    "DELETE_NODE",
+    "DELETE_LINK",
+    "CHANGE_LINK",
+    "PRINT",
+    "DRAW_TOPOLOGY",
+    "DRAW_PATH",
+    "DRAW_TREE",
+    "DUMP_NODE",
+    "DUMP_SIM",
+    "DELIVER_BATCH"
+]
+
+EVENT_CODE = {name : code for code, name in enumerate(EVENT_NAME)}
+
+# The events of one time stamp run phase by phase: first everything else,
+# then DELIVER_BATCH (once all the routing messages of that second have
+# arrived), and SEND_LINK runs lastest at that second.
+NUM_PHASES = 3
+EVENT_PHASE = [0] * len(EVENT_NAME)
+EVENT_PHASE[EVENT_TYPE.DELIVER_BATCH] = 1
+EVENT_PHASE[EVENT_TYPE.SEND_LINK] = 2
+
+# the event types only the simulator posts, unknown commands in an event file
+INTERNAL_EVENTS = {EVENT_TYPE.DELIVER_BATCH}
 
 
 OUTPUT_PATH = "output/"
 
-USAGE_STR = "usage: sim.py route_algorithm event [step=NORMAL]\n" \
+USAGE_STR = "usage: sim.py route_algorithm event [step=NORMAL] [--queue=BUCKET] [--strict] [--no-batch] [--headless] [--report=file]\n" \
+            "\t\t[--format=png] [--render-workers=n] [--profile=prefix]\n" \
+            "\t\t[--convergence=file] [--check-convergence]\n" \
+            "\t\t[--max-time=t] [--max-messages=n] [--max-messages-per-tick=n] [--max-wall-time=s]\n" \
+            "\t\t[--checkpoint=file --checkpoint-at=t] [--workers=n]\n" \
             "\troute_algorithm\t- {GENERIC DISTANCE_VECTOR LINK_STATE}\n" \
             "\tevent\t\t\t- a file\n" \
-            "\tstep\t\t\t- {NORMAL SINGLE_STEP NO_STOP}"
+            "\tstep\t\t\t- {NORMAL SINGLE_STEP NO_STOP}\n" \
+            "\t--queue\t\t\t- {BUCKET TUPLE_HEAP HEAP KEYED}\n" \
+            "\t--strict\t\t- check that routing messages are not changed after they are sent\n" \
+            "\t--no-batch\t\t- one process_incoming_routing_message call per message, even for nodes that take batches\n" \
+            "\t--headless\t\t- check the routes of DRAW_* events without drawing anything\n" \
+            "\t--report\t\t- write the outcome of every DRAW_* event to a file, as JSON lines\n" \
+            "\t--format\t\t- {png svg} the format of the pictures\n" \
+            "\t--render-workers\t- processes rendering the pictures in the background (default: one per cpu, 0: none)\n" \
+            "\t--profile\t\t- time every event type and node handler, write prefix.json, prefix.csv and prefix.collapsed\n" \
+            "\t--convergence\t\t- write the messages and the time to convergence of every topology command to a file, as JSON lines\n" \
+            "\t--check-convergence\t- also check every route whenever no routing message is in flight\n" \
+            "\t--max-*\t\t\t- abort when a routing message arrives after time t, after n messages in all or n at one time,\n" \
+            "\t\t\t\t  or after s seconds, and show the nodes and links that sent the most\n" \
+            "\t--checkpoint\t\t- save the whole simulation to a file once every event up to time t has run\n" \
+            "\t--workers\t\t- split the nodes between n processes, same run as --queue=KEYED (link latencies of at least 1)\n" \
+            "   or: sim.py route_algorithm --resume=checkpoint [event] [step] [options]\n" \
+            "\tgo on from a checkpoint, with the rest of its event file or with the commands of event after its time\n" \
+            "   or: sim.py compile event trace\n" \
+            "\tcompile an event file into a binary trace, which sim.py replays like an event file"
 
 
 LOGGING_FORMAT = "[%(asctime)s][%(levelname)s] %(name)s: %(message)s"
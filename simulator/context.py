@@ -0,0 +1,43 @@
+import threading
+
+
+# Everything one simulation owns: its event queue and clock, its nodes and its
+# graph.  A node reaches its simulation through the context it was created in
+# (Node.context), so several simulations can live in one process, one after
+# the other or on different threads, without sharing anything.
+#
+# A node class is instantiated while its context is the current context of
+# the thread (with context: ...), and Node.__init__ keeps it.
+current = threading.local()
+
+
+def current_context():
+    return getattr(current, 'context', None)
+
+
+class Simulation_Context:
+
+    def __init__(self, topology, queue, graph):
+        self.topology = topology
+        self.queue = queue
+        self.graph = graph
+        # maps a node id to its node object
+        self.nodes = {}
+
+    def __enter__(self):
+        self.previous = current_context()
+        current.context = self
+        return self
+
+    def __exit__(self, *exc_info):
+        current.context = self.previous
+        self.previous = None
+
+    def get_time(self):
+        return self.queue.Current_Time
+
+    def send_to_neighbors(self, node, m):
+        self.topology.send_to_neighbors(node, m)
+
+    def send_to_neighbor(self, node, neighbor, m):
+        self.topology.send_to_neighbor(node, neighbor, m)
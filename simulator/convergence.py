@@ -0,0 +1,217 @@
+import json
+import collections
+
+from simulator.config import *
+
+
+# Time to convergence of every topology command (sim.py --convergence FILE).
+#
+# Every command (ADD_NODE, ADD_LINK, CHANGE_LINK, DELETE_LINK, DELETE_NODE)
+# gets a cause id.  While a command runs, and while a node handles what it
+# caused (its SEND_LINKs, a routing message, a batch), Topology.cause is that
+# id, and every routing message sent carries it to its arrival.  A batch of
+# messages of several causes is handled as a consequence of the latest of
+# them.  So for every command we know the routing messages it cost, their
+# bytes, and when the last of them arrived: the time it converged.
+#
+# The simulation is quiescent when no routing message is in flight, no batch
+# waits to be delivered and no SEND_LINK is queued.  With check, the routes of
+# every pair of nodes are checked against the ground truth at every quiescence
+# point, which shows how long the routes stay wrong (checking is O(n^2)).
+#
+# Nothing of it runs without --convergence: the methods watched are wrapped on
+# the Sim instance.  The file gets one JSON line per command and per
+# quiescence point, in time order.
+TRACKED_COMMANDS = ('add_node', 'add_link', 'change_link', 'delete_link', 'delete_node')
+QUIESCENCE = 'QUIESCENCE'
+
+
+class Cause:
+
+    def __init__(self, time, command, args):
+        self.time = time
+        self.command = command
+        self.args = args
+        self.messages = 0
+        self.bytes = 0
+        self.in_flight = 0
+        self.last_arrival = None
+        # the first quiescence point after the command, and the routes that
+        # were wrong then (with check)
+        self.quiescent_at = None
+        self.wrong_routes = None
+
+    def converged_at(self):
+        return self.time if self.last_arrival is None else self.last_arrival
+
+    def record(self):
+        ans = dict(time=self.time, event=self.command.upper(), args=list(self.args), messages=self.messages, bytes=self.bytes,
+                   converged=self.in_flight == 0, converged_at=self.converged_at(),
+                   convergence_time=self.converged_at() - self.time, quiescent_at=self.quiescent_at)
+        if self.wrong_routes is not None:
+            ans['wrong_routes'] = self.wrong_routes
+        return ans
+
+
+class Convergence:
+
+    def __init__(self, sim, check=False):
+        self.sim = sim
+        self.check = check
+        # cause id -> Cause. The ids are given out by Topology.cause_count,
+        # so the causes of a restored checkpoint are not mixed up with new ones
+        self.causes = {}
+        # the causes since the last quiescence point
+        self.unsettled = []
+        # (time, wrong routes or None) of every quiescence point
+        self.quiescence = []
+        self.in_flight = 0
+        self.pending_links = 0
+        # the causes of the queued SEND_LINKs of a link, in the order they run
+        # (those of a link run first in, first out), and the cause of the
+        # batch of a node
+        self.link_causes = collections.defaultdict(collections.deque)
+        self.batch_causes = {}
+        self.running_command = False
+        # what is already under way in a restored checkpoint
+        for e in sim.queue.q.events():
+            if e.event_type == EVENT_TYPE.ROUTING_MESSAGE_ARRIVAL:
+                self.in_flight += 1
+            elif e.event_type == EVENT_TYPE.SEND_LINK:
+                self.pending_links += 1
+                self.link_causes[(e.arg1, e.arg2)].append(-1)
+
+        graph = sim.context.graph
+        for name in TRACKED_COMMANDS:
+            setattr(sim, name, self.command(name, getattr(sim, name)))
+
+        post_send_link = sim.post_send_link
+        send_link = sim.send_link
+        send_to_neighbor = sim.send_to_neighbor
+        routing_message_arrival = sim.routing_message_arrival
+        deliver_batch = sim.deliver_batch
+
+        def tracked_post_send_link(node, neighbor, latency):
+            post_send_link(node, neighbor, latency)
+            self.pending_links += 1
+            self.link_causes[(node, neighbor)].append(sim.cause)
+
+        def tracked_send_link(node, neighbor, latency):
+            self.pending_links -= 1
+            causes = self.link_causes.get((node, neighbor))
+            sim.cause = causes.popleft() if causes else -1
+            if not causes:
+                self.link_causes.pop((node, neighbor), None)
+            send_link(node, neighbor, latency)
+            sim.cause = -1
+            self.settle()
+
+        def tracked_send_to_neighbor(node, neighbor, m):
+            send_to_neighbor(node, neighbor, m)
+            if graph.has_edge(node, neighbor):
+                self.in_flight += 1
+                cause = self.causes.get(sim.cause)
+                if cause is not None:
+                    cause.messages += 1
+                    cause.bytes += sim.last_message_size
+                    cause.in_flight += 1
+
+        def tracked_routing_message_arrival(neighbor, m, cause=-1):
+            self.in_flight -= 1
+            if cause in self.causes:
+                self.causes[cause].in_flight -= 1
+                self.causes[cause].last_arrival = sim.get_time()
+            if sim.batch:
+                if neighbor in graph:
+                    self.batch_causes[neighbor] = max(cause, self.batch_causes.get(neighbor, -1))
+                routing_message_arrival(neighbor, m, cause)
+            else:
+                sim.cause = cause
+                routing_message_arrival(neighbor, m, cause)
+                sim.cause = -1
+            self.settle()
+
+        def tracked_deliver_batch(node):
+            sim.cause = self.batch_causes.pop(node, -1)
+            deliver_batch(node)
+            sim.cause = -1
+            self.settle()
+
+        sim.post_send_link = tracked_post_send_link
+        sim.send_link = tracked_send_link
+        sim.send_to_neighbor = tracked_send_to_neighbor
+        sim.routing_message_arrival = tracked_routing_message_arrival
+        sim.deliver_batch = tracked_deliver_batch
+
+    # a topology command, made a cause. the commands it calls (change_link
+    # calls add_link, delete_node calls delete_link) are part of it
+    def command(self, name, method):
+        def tracked_command(*args):
+            if self.running_command:
+                return method(*args)
+            self.running_command = True
+            cause = Cause(self.sim.get_time(), name, args)
+            self.sim.cause = self.sim.cause_count
+            self.sim.cause_count += 1
+            self.causes[self.sim.cause] = cause
+            self.unsettled.append(cause)
+            try:
+                return method(*args)
+            finally:
+                self.sim.cause = -1
+                self.running_command = False
+        return tracked_command
+
+    def settle(self):
+        if self.in_flight or self.pending_links or self.sim.pending_batches:
+            return
+        now = self.sim.get_time()
+        if self.quiescence and self.quiescence[-1][0] == now:
+            return
+        wrong = self.wrong_routes() if self.check else None
+        self.quiescence.append((now, wrong))
+        for cause in self.unsettled:
+            cause.quiescent_at = now
+            cause.wrong_routes = wrong
+        self.unsettled = []
+
+    # the (source, destination) pairs whose route is not a shortest path
+    def wrong_routes(self):
+        sim = self.sim
+        graph = sim.context.graph
+        wrong = 0
+        for destination in graph.nodes:
+            forest = sim.get_next_hop_forest(destination)
+            lengths = sim.get_correct_tree(destination).lengths
+            for source in graph.nodes:
+                if source != destination and forest.length(source) != lengths.get(source):
+                    wrong += 1
+        return wrong
+
+    def write(self, file):
+        records = [cause.record() for cause in self.causes.values()]
+        for time, wrong in self.quiescence:
+            record = dict(time=time, event=QUIESCENCE)
+            if wrong is not None:
+                record['wrong_routes'] = wrong
+            records.append(record)
+        # stable: at one time, the commands come before the quiescence point
+        records.sort(key=lambda record: record['time'])
+        with open(file, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    def log_summary(self, logging):
+        by_command = {}
+        for cause in self.causes.values():
+            by_command.setdefault(cause.command.upper(), []).append(cause)
+        for command, causes in sorted(by_command.items()):
+            times = [cause.converged_at() - cause.time for cause in causes]
+            logging.info("%-12s %6d commands, convergence time mean %.1f max %d, messages mean %.1f max %d" % (
+                command, len(causes), sum(times) / len(times), max(times),
+                sum(cause.messages for cause in causes) / len(causes), max(cause.messages for cause in causes)))
+        if self.check:
+            wrong = [time for time, wrong_routes in self.quiescence if wrong_routes]
+            logging.info("%d quiescence points, routes wrong at %d of them" % (len(self.quiescence), len(wrong)))
+        else:
+            logging.info("%d quiescence points" % len(self.quiescence))
@@ -1,14 +1,14 @@
-import sys
-
 from simulator.config import *
 
 
 class Event:
+    # Events are the most allocated objects of a simulation (one per routing
+    # message), so they carry no __dict__ and no reference to the simulator.
+    __slots__ = ('time_stamp', 'event_type', 'arg1', 'arg2', 'arg3')
 
-    def __init__(self, time_stamp, event_type, sim, arg1 = -1, arg2 = -1, arg3 = -1):
+    def __init__(self, time_stamp, event_type, arg1 = -1, arg2 = -1, arg3 = -1):
         self.time_stamp = time_stamp
         self.event_type = event_type
-        self.sim = sim
 
         self.arg1 = arg1
         self.arg2 = arg2
@@ -16,8 +16,7 @@ class Event:
 
     def __lt__(self, other):
         if self.time_stamp == other.time_stamp:
-            if self.event_type != EVENT_TYPE.SEND_LINK and other.event_type == EVENT_TYPE.SEND_LINK:
-                return True
+            return EVENT_PHASE[self.event_type] < EVENT_PHASE[other.event_type]
         return self.time_stamp < other.time_stamp
 
     def __str__(self):
@@ -29,36 +28,68 @@ class Event:
         if self.arg3 != -1:
             args += " " + str(self.arg3)
 
-        return "Time_Stamp: " + str(self.time_stamp) + " Event_Type: " + self.event_type + args
-
-    def dispatch(self):
-        if self.event_type == EVENT_TYPE.ADD_NODE:
-            self.sim.add_node(self.arg1)
-        elif self.event_type == EVENT_TYPE.ADD_LINK:
-            self.sim.add_link(self.arg1, self.arg2, self.arg3)
-        elif self.event_type == EVENT_TYPE.CHANGE_LINK:
-            self.sim.change_link(self.arg1, self.arg2, self. arg3)
-        elif self.event_type == EVENT_TYPE.DELETE_LINK:
-            self.sim.delete_link(self.arg1, self.arg2)
-        elif self.event_type == EVENT_TYPE.DELETE_NODE:
-            self.sim.delete_node(self.arg1)
-        elif self.event_type == EVENT_TYPE.PRINT:
-            self.sim.print_comment(self.arg1)
-        elif self.event_type == EVENT_TYPE.DUMP_NODE:
-            self.sim.dump_node(self.arg1)
-        elif self.event_type == EVENT_TYPE.DRAW_TOPOLOGY:
-            self.sim.draw_topology()
-        elif self.event_type == EVENT_TYPE.ROUTING_MESSAGE_ARRIVAL:
-            self.sim.routing_message_arrival(self.arg1, self.arg2)
-        elif self.event_type == EVENT_TYPE.DUMP_SIM:
-            self.sim.dump_sim()
-        elif self.event_type == EVENT_TYPE.DRAW_PATH:
-            self.sim.draw_path(self.arg1, self.arg2)
-        elif self.event_type == EVENT_TYPE.DRAW_TREE:
-            self.sim.draw_tree(self.arg1)
-        elif self.event_type == EVENT_TYPE.SEND_LINK:
-            self.sim.send_link(self.arg1, self.arg2, self.arg3)
-        else:
-            pass
-            # sys.stderr.write("Unknown event type %s" % self.event_type)
-            # sys.exit(-1)
+        return "Time_Stamp: " + str(self.time_stamp) + " Event_Type: " + EVENT_NAME[self.event_type] + args
+
+    def dispatch(self, sim):
+        DISPATCH_TABLE[self.event_type](sim, self)
+
+
+def routing_message_arrival(sim, e):
+    sim.routing_message_arrival(e.arg1, e.arg2, e.arg3)
+
+def send_link(sim, e):
+    sim.send_link(e.arg1, e.arg2, e.arg3)
+
+def add_node(sim, e):
+    sim.add_node(e.arg1)
+
+def add_link(sim, e):
+    sim.add_link(e.arg1, e.arg2, e.arg3)
+
+def delete_node(sim, e):
+    sim.delete_node(e.arg1)
+
+def delete_link(sim, e):
+    sim.delete_link(e.arg1, e.arg2)
+
+def change_link(sim, e):
+    sim.change_link(e.arg1, e.arg2, e.arg3)
+
+def print_comment(sim, e):
+    sim.print_comment(e.arg1)
+
+def draw_topology(sim, e):
+    sim.draw_topology()
+
+def draw_path(sim, e):
+    sim.draw_path(e.arg1, e.arg2)
+
+def draw_tree(sim, e):
+    sim.draw_tree(e.arg1)
+
+def dump_node(sim, e):
+    sim.dump_node(e.arg1)
+
+def dump_sim(sim, e):
+    sim.dump_sim()
+
+def deliver_batch(sim, e):
+    sim.deliver_batch(e.arg1)
+
+
+# DISPATCH_TABLE[code](sim, e) runs event e on the simulator sim
+DISPATCH_TABLE = [None] * len(EVENT_NAME)
+DISPATCH_TABLE[EVENT_TYPE.ROUTING_MESSAGE_ARRIVAL] = routing_message_arrival
+DISPATCH_TABLE[EVENT_TYPE.SEND_LINK] = send_link
+DISPATCH_TABLE[EVENT_TYPE.ADD_NODE] = add_node
+DISPATCH_TABLE[EVENT_TYPE.ADD_LINK] = add_link
+DISPATCH_TABLE[EVENT_TYPE.DELETE_NODE] = delete_node
+DISPATCH_TABLE[EVENT_TYPE.DELETE_LINK] = delete_link
+DISPATCH_TABLE[EVENT_TYPE.CHANGE_LINK] = change_link
+DISPATCH_TABLE[EVENT_TYPE.PRINT] = print_comment
+DISPATCH_TABLE[EVENT_TYPE.DRAW_TOPOLOGY] = draw_topology
+DISPATCH_TABLE[EVENT_TYPE.DRAW_PATH] = draw_path
+DISPATCH_TABLE[EVENT_TYPE.DRAW_TREE] = draw_tree
+DISPATCH_TABLE[EVENT_TYPE.DUMP_NODE] = dump_node
+DISPATCH_TABLE[EVENT_TYPE.DUMP_SIM] = dump_sim
+DISPATCH_TABLE[EVENT_TYPE.DELIVER_BATCH] = deliver_batch
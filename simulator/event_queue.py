@@ -1,30 +1,258 @@
 import heapq
+import itertools
+from collections import deque
+
+from simulator.config import *
+
+
+class Heap_Backend:
+    # The original scheduler: one heap of Event objects ordered by Event.__lt__.
+    # Ties inside a phase come out in no particular order.
+
+    def __init__(self):
+        self.q = []
+
+    def __len__(self):
+        return len(self.q)
+
+    def push(self, e):
+        heapq.heappush(self.q, e)
+
+    def pop(self):
+        return heapq.heappop(self.q)
+
+    def peek_time(self):
+        return self.q[0].time_stamp
+
+    def events(self):
+        return sorted(self.q)
+
+
+class Tuple_Heap_Backend:
+    # A heap of precomputed (time, phase, seq, event) tuples.  The comparison
+    # is done by the C tuple compare and never reaches Event.__lt__; seq gives
+    # FIFO order between events of the same time and phase.
+
+    def __init__(self):
+        self.q = []
+        self.seq = itertools.count()
+
+    def __len__(self):
+        return len(self.q)
+
+    def push(self, e):
+        heapq.heappush(self.q, (e.time_stamp, EVENT_PHASE[e.event_type], next(self.seq), e))
+
+    def pop(self):
+        return heapq.heappop(self.q)[3]
+
+    def peek_time(self):
+        return self.q[0][0]
+
+    def events(self):
+        return [entry[3] for entry in sorted(self.q)]
+
+    # a checkpoint keeps the next seq, not the counter
+    def __getstate__(self):
+        return dict(q=self.q, seq=next(self.seq))
+
+    def __setstate__(self, state):
+        self.q = state['q']
+        self.seq = itertools.count(state['seq'])
+
+
+class Bucket_Backend:
+    # A calendar queue keyed by integer time.  Each time stamp owns one FIFO
+    # deque per phase, and only the distinct time stamps go through the heap,
+    # so the thousands of events of a link-state flood that share a tick cost
+    # one heap operation between them.
+
+    def __init__(self):
+        self.buckets = {}
+        self.times = []
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, e):
+        bucket = self.buckets.get(e.time_stamp)
+        if bucket is None:
+            bucket = self.buckets[e.time_stamp] = [deque() for _ in range(NUM_PHASES)]
+            heapq.heappush(self.times, e.time_stamp)
+        bucket[EVENT_PHASE[e.event_type]].append(e)
+        self.size += 1
+
+    def pop(self):
+        time_stamp = self.times[0]
+        bucket = self.buckets[time_stamp]
+        for phase in bucket:
+            if phase:
+                e = phase.popleft()
+                break
+        self.size -= 1
+        if not any(bucket):
+            del self.buckets[time_stamp]
+            heapq.heappop(self.times)
+        return e
+
+    def peek_time(self):
+        return self.times[0]
+
+    def events(self):
+        ans = []
+        for time_stamp in sorted(self.times):
+            for phase in self.buckets[time_stamp]:
+                ans.extend(phase)
+        return ans
+
+
+class Keyed_Backend(Tuple_Heap_Backend):
+    # A heap of (time, phase, key, seq, event) tuples, where the events of one
+    # time and phase come out in the order of keys that do not depend on what
+    # else is in the queue, so that a simulation split between processes
+    # (simulator/parallel.py) runs its events in the same order as one
+    # process.  A routing message is keyed by (send time, sender, number of
+    # the messages the sender sent before it), the sender being the node of
+    # the event popped last; a SEND_LINK by the number of SEND_LINKs posted
+    # before it; a DELIVER_BATCH by its node.
+
+    def __init__(self):
+        super().__init__()
+        self.links_posted = 0
+        self.messages_sent = {}
+        self.now = 0
+        self.node = -1
+
+    def push(self, e):
+        if e.event_type == EVENT_TYPE.ROUTING_MESSAGE_ARRIVAL:
+            key = self.message_key()
+        elif e.event_type == EVENT_TYPE.SEND_LINK:
+            key = self.link_key()
+        else:
+            key = e.arg1
+        heapq.heappush(self.q, (e.time_stamp, EVENT_PHASE[e.event_type], key, next(self.seq), e))
+
+    def push_keyed(self, e, key):
+        heapq.heappush(self.q, (e.time_stamp, EVENT_PHASE[e.event_type], key, next(self.seq), e))
+
+    def pop(self):
+        e = heapq.heappop(self.q)[4]
+        self.now = e.time_stamp
+        self.node = e.arg1
+        return e
+
+    def message_key(self):
+        sent = self.messages_sent.get(self.node, 0)
+        self.messages_sent[self.node] = sent + 1
+        return (self.now, self.node, sent)
+
+    def link_key(self):
+        self.links_posted += 1
+        return self.links_posted
+
+    def events(self):
+        return [entry[4] for entry in sorted(self.q)]
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['seq'] = next(self.seq)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.seq = itertools.count(state['seq'])
+
+
+EVENT_QUEUE_BACKEND = {
+    "BUCKET": Bucket_Backend,
+    "TUPLE_HEAP": Tuple_Heap_Backend,
+    "HEAP": Heap_Backend,
+    "KEYED": Keyed_Backend
+}
 
 
 class Event_Queue:
-    q = []
-    Current_Time = 0
+    # The events and the clock of one simulation.  It can be pickled (see
+    # simulator/checkpoint.py) without its script, which is set again when the
+    # checkpoint is restored: Script_Position is the number of commands taken
+    # from it so far.
 
-    @staticmethod
-    def Post(e):
-        heapq.heappush(Event_Queue.q, e)
+    def __init__(self, backend=DEFAULT_EVENT_QUEUE):
+        self.q = EVENT_QUEUE_BACKEND[backend]()
+        self.Current_Time = 0
+        # Get_Earliest returns None rather than an event after Horizon, see
+        # Set_Horizon
+        self.Horizon = None
+        # Scripted commands are not posted.  They come from an iterator in
+        # time order and are merged with the posted events as the clock
+        # reaches them; Next_Scripted is the first command not yet taken from
+        # Script.
+        self.Set_Script(())
 
-    @staticmethod
-    def Get_Earliest():
-        if Event_Queue.q == []:
+    # Takes the commands from events, leaving out the first skip of them and
+    # those up to time after
+    def Set_Script(self, events, skip=0, after=None):
+        self.Script = iter(events)
+        self.Script_Position = 0
+        while True:
+            self.Next_Scripted = next(self.Script, None)
+            self.Script_Position += 1
+            if self.Next_Scripted is None:
+                break
+            if self.Script_Position > skip and (after is None or self.Next_Scripted.time_stamp > after):
+                break
+
+    # From now on Get_Earliest returns None rather than an event after time
+    # horizon, until the horizon is set to None
+    def Set_Horizon(self, horizon):
+        self.Horizon = horizon
+
+    # the time of the next event, posted or scripted, None if there is none
+    def Next_Time(self):
+        times = [self.q.peek_time()] if len(self.q) else []
+        if self.Next_Scripted is not None:
+            times.append(self.Next_Scripted.time_stamp)
+        return min(times) if times else None
+
+    def Post(self, e):
+        self.q.push(e)
+
+    def Get_Earliest(self):
+        if self.Horizon is not None:
+            next_time = self.Next_Time()
+            if next_time is None or next_time > self.Horizon:
+                return None
+        # a scripted command runs before the posted events of its time, just
+        # as if it had been posted when the file was loaded
+        e = self.Next_Scripted
+        if e is not None and (len(self.q) == 0 or e.time_stamp <= self.q.peek_time()):
+            self.Next_Scripted = next(self.Script, None)
+            self.Script_Position += 1
+        elif len(self.q) == 0:
             return None
-        e = heapq.heappop(Event_Queue.q)
-        Event_Queue.Current_Time = e.time_stamp
+        else:
+            e = self.q.pop()
+        self.Current_Time = e.time_stamp
         return e
 
-    @staticmethod
-    def Str():
+    def Str(self):
         ans = ""
-        for i in Event_Queue.q:
+        if self.Next_Scripted is not None:
+            ans += "Next scripted: " + str(self.Next_Scripted) + "\n"
+        for i in self.q.events():
             ans += str(i)
             ans += "\n"
         return ans
 
-    @staticmethod
-    def Get_Current_Time():
-        return Event_Queue.Current_Time
+    def Get_Current_Time(self):
+        return self.Current_Time
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['Script']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.Script = iter(())
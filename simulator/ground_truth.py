@@ -0,0 +1,145 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import networkx as nx
+
+# scipy is optional. with it, a bulk of sources is one vectorized Dijkstra
+# over a CSR matrix of the topology
+try:
+    import numpy as np
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra
+except ImportError:
+    dijkstra = None
+
+
+# The correct shortest paths the nodes are checked against.
+#
+# They are cached for one version of the topology: Topology bumps its version
+# whenever a link or a node goes away or a link is added or changed, and every
+# DRAW_PATH/DRAW_TREE at the same version is answered from the cache.
+#
+# The first source asked for at a version gets a single Dijkstra. From the
+# second one on, the sources are computed in bulks of BULK_SOURCES (the next
+# sources of the topology, in node order, as event files draw the trees of
+# every node in a row): with scipy in one vectorized call, otherwise one
+# networkx Dijkstra each, spread over a process pool from POOL_MIN_NODES
+# nodes on.  At most MAX_TREES trees are kept, oldest first out.
+BULK_SOURCES = 256
+POOL_MIN_NODES = 2000
+MAX_TREES = 2 * BULK_SOURCES
+
+
+class Path_Tree:
+    # the shortest paths from source: length and parent of every node it
+    # reaches
+
+    def __init__(self, source, lengths, parents):
+        self.source = source
+        self.lengths = lengths
+        self.parents = parents
+
+    def path(self, destination):
+        path = [destination]
+        while path[-1] != self.source:
+            path.append(self.parents[path[-1]])
+        path.reverse()
+        return path
+
+    def edges(self):
+        return {(parent, node) for node, parent in self.parents.items()}
+
+
+def single_source(graph, source):
+    parents, lengths = nx.dijkstra_predecessor_and_distance(graph, source, weight='latency')
+    return Path_Tree(source, lengths, {node: preds[0] for node, preds in parents.items() if preds})
+
+
+def csgraph_sources(graph, sources):
+    nodes = list(graph.nodes)
+    index = {node: i for i, node in enumerate(nodes)}
+    rows, cols, latencies = [], [], []
+    for node1, node2, latency in graph.edges(data='latency'):
+        rows += [index[node1], index[node2]]
+        cols += [index[node2], index[node1]]
+        latencies += [latency, latency]
+    # explicit zeros of a sparse matrix are links of latency 0, not missing links
+    matrix = csr_matrix((latencies, (rows, cols)), shape=(len(nodes), len(nodes)))
+    distances, predecessors = dijkstra(matrix, directed=True, indices=[index[s] for s in sources], return_predecessors=True)
+
+    trees = []
+    for source, distance_row, predecessor_row in zip(sources, distances, predecessors):
+        reached = np.flatnonzero(np.isfinite(distance_row))
+        lengths = {nodes[i]: int(d) if d.is_integer() else d for i, d in zip(reached.tolist(), distance_row[reached].tolist())}
+        parents = {nodes[i]: nodes[p] for i, p in zip(reached.tolist(), predecessor_row[reached].tolist()) if p >= 0}
+        trees.append(Path_Tree(source, lengths, parents))
+    return trees
+
+
+# the graph of the pool workers, sent once when the pool starts
+pool_graph = None
+
+
+def init_pool_worker(graph):
+    global pool_graph
+    pool_graph = graph
+
+
+def pool_sources(sources):
+    return [single_source(pool_graph, source) for source in sources]
+
+
+class Ground_Truth:
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.version = None
+        # maps a source to its Path_Tree, at self.version. dicts keep insertion
+        # order, so the first one is the oldest
+        self.trees = {}
+        self.pool = None
+
+    def tree(self, source, version):
+        if version != self.version:
+            self.version = version
+            self.trees = {}
+            self.close_pool()
+        if source not in self.trees:
+            if self.trees:
+                self.compute_bulk(source)
+            else:
+                self.trees[source] = single_source(self.graph, source)
+            while len(self.trees) > MAX_TREES:
+                del self.trees[next(iter(self.trees))]
+        return self.trees[source]
+
+    def compute_bulk(self, source):
+        # source and the sources after it, in node order, that are not cached
+        nodes = list(self.graph.nodes)
+        start = nodes.index(source)
+        sources = [node for node in nodes[start:] + nodes[:start] if node not in self.trees][:BULK_SOURCES]
+
+        if dijkstra is not None:
+            trees = csgraph_sources(self.graph, sources)
+        elif len(nodes) >= POOL_MIN_NODES and (os.cpu_count() or 1) > 1:
+            trees = self.pool_sources(sources)
+        else:
+            trees = [single_source(self.graph, s) for s in sources]
+        for tree in trees:
+            self.trees[tree.source] = tree
+
+    def pool_sources(self, sources):
+        workers = os.cpu_count()
+        if self.pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+            self.pool = ProcessPoolExecutor(workers, mp_context=context, initializer=init_pool_worker, initargs=(self.graph,))
+        chunk = -(-len(sources) // workers)
+        chunks = [sources[i:i + chunk] for i in range(0, len(sources), chunk)]
+        return [tree for trees in self.pool.map(pool_sources, chunks) for tree in trees]
+
+    def close_pool(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
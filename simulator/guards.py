@@ -0,0 +1,102 @@
+import time
+from collections import namedtuple
+
+
+# Limits that stop a simulation that runs away, e.g. the message storm of a
+# routing bug counting to infinity (sim.py --max-time, --max-messages,
+# --max-messages-per-tick, --max-wall-time).  None is no limit.
+#
+#   time               no routing message may arrive after this simulated
+#                      time. Scripted commands after it (the DRAW_TREEs of
+#                      generated scenarios) still run once nothing is in flight
+#   messages           routing messages delivered in all
+#   messages_per_tick  routing messages delivered at one time stamp
+#   wall_time          seconds of the run, checked every WALL_TIME_EVERY
+#                      messages
+#
+# They are checked as routing messages arrive, so nothing of it runs without
+# a limit.  A simulation over a limit raises Simulation_Aborted out of the
+# dispatch loop; Sim logs a snapshot of the hottest nodes and links (the ones
+# that sent the most messages) and writes it to the report as an ABORTED
+# line, which counts as a failed check.
+#
+# There is nothing to fast-forward: the event queue already moves the clock
+# straight to the next event, so a quiet stretch of simulated time costs
+# nothing, however long.
+Limits = namedtuple('Limits', ['time', 'messages', 'messages_per_tick', 'wall_time'], defaults=(None, None, None, None))
+
+WALL_TIME_EVERY = 1024
+HOTTEST = 10
+
+
+class Simulation_Aborted(Exception):
+
+    def __init__(self, limit, value, bound):
+        super().__init__("%s %s over the limit of %s" % (limit, value, bound))
+        self.limit = limit
+        self.value = value
+        self.bound = bound
+
+
+class Guards:
+
+    def __init__(self, sim, limits):
+        self.sim = sim
+        self.limits = limits
+        self.start = time.perf_counter()
+        # messages sent over every (node, neighbor) link
+        self.link_messages = {}
+        self.tick = None
+        self.tick_messages = 0
+
+        graph = sim.context.graph
+        send_to_neighbor = sim.send_to_neighbor
+        routing_message_arrival = sim.routing_message_arrival
+
+        def guarded_send_to_neighbor(node, neighbor, m):
+            send_to_neighbor(node, neighbor, m)
+            if graph.has_edge(node, neighbor):
+                link = (node, neighbor)
+                self.link_messages[link] = self.link_messages.get(link, 0) + 1
+
+        def guarded_routing_message_arrival(neighbor, m, cause=-1):
+            routing_message_arrival(neighbor, m, cause)
+            self.check()
+
+        sim.send_to_neighbor = guarded_send_to_neighbor
+        sim.routing_message_arrival = guarded_routing_message_arrival
+
+    def check(self):
+        limits, sim = self.limits, self.sim
+        now = sim.get_time()
+        if limits.time is not None and now > limits.time:
+            raise Simulation_Aborted('time', now, limits.time)
+        if limits.messages is not None and sim.message_count > limits.messages:
+            raise Simulation_Aborted('messages', sim.message_count, limits.messages)
+        if now != self.tick:
+            self.tick = now
+            self.tick_messages = 0
+        self.tick_messages += 1
+        if limits.messages_per_tick is not None and self.tick_messages > limits.messages_per_tick:
+            raise Simulation_Aborted('messages_per_tick', self.tick_messages, limits.messages_per_tick)
+        if limits.wall_time is not None and sim.message_count % WALL_TIME_EVERY == 0:
+            elapsed = time.perf_counter() - self.start
+            if elapsed > limits.wall_time:
+                raise Simulation_Aborted('wall_time', round(elapsed, 1), limits.wall_time)
+
+    # what the simulation was busy with when it was aborted
+    def snapshot(self, aborted):
+        node_messages = {}
+        for (node, _), count in self.link_messages.items():
+            node_messages[node] = node_messages.get(node, 0) + count
+        nodes = sorted(node_messages.items(), key=lambda item: -item[1])[:HOTTEST]
+        links = sorted(self.link_messages.items(), key=lambda item: -item[1])[:HOTTEST]
+        return dict(
+            limit=aborted.limit,
+            value=aborted.value,
+            bound=aborted.bound,
+            messages=self.sim.message_count,
+            queued=len(self.sim.queue.q),
+            hottest_nodes=[dict(node=node, sent=count) for node, count in nodes],
+            hottest_links=[dict(node=node, neighbor=neighbor, sent=count) for (node, neighbor), count in links],
+        )
@@ -0,0 +1,118 @@
+import os
+import json
+import random
+import hashlib
+
+import networkx as nx
+
+
+# Node positions for the pictures, kept from one picture to the next.
+#
+# The layout is only recomputed when nodes come or go, and then it starts from
+# the previous positions: a new node starts next to its neighbors, and only the
+# nodes within RELAX_HOPS hops of the nodes that came or went move, for at most
+# RELAX_ITERATIONS iterations of the force layout.  The first layout gets
+# LAYOUT_ITERATIONS.
+#
+# Every layout is also saved to disk, in LAYOUT_CACHE_PATH, under the event
+# file and a hash of the topology, so a rerun of the same event file finds its
+# layouts there and computes none.  Layouts use a fixed random seed, so they
+# do not depend on the run either.
+LAYOUT_CACHE_PATH = "output/layouts/"
+LAYOUT_ITERATIONS = 50
+RELAX_ITERATIONS = 15
+RELAX_HOPS = 2
+LAYOUT_SEED = 340
+
+
+def topology_hash(g):
+    nodes = sorted(g.nodes)
+    links = sorted((min(node1, node2), max(node1, node2), latency) for node1, node2, latency in g.edges(data='latency'))
+    return hashlib.sha1(repr((nodes, links)).encode()).hexdigest()
+
+
+class Layout_Cache:
+
+    def __init__(self, cache_path=LAYOUT_CACHE_PATH):
+        self.cache_path = cache_path
+        self.file = None
+        # maps a topology hash to its positions: {node: (x, y)}
+        self.layouts = {}
+        self.modified = False
+        # the positions of the latest picture, None until there is one
+        self.positions = None
+        # nodes that came or went since, and the neighbors of those that went
+        self.changed = set()
+
+    # Sets the event file the layouts belong to, and loads the ones saved for it
+    def set_scenario(self, event_file):
+        if self.cache_path is None:
+            return
+        name = os.path.splitext(os.path.basename(event_file))[0]
+        key = hashlib.sha1(os.path.abspath(event_file).encode()).hexdigest()[:8]
+        self.file = os.path.join(self.cache_path, "%s-%s.json" % (name, key))
+        try:
+            with open(self.file) as f:
+                saved = json.load(f)
+        except (IOError, ValueError):
+            return
+        self.layouts = {h: {node: (x, y) for node, x, y in positions} for h, positions in saved.items()}
+
+    def save(self):
+        if self.file is None or not self.modified:
+            return
+        os.makedirs(self.cache_path, exist_ok=True)
+        saved = {h: [[node, x, y] for node, (x, y) in positions.items()] for h, positions in self.layouts.items()}
+        with open(self.file, 'w') as f:
+            json.dump(saved, f)
+        self.modified = False
+
+    def node_added(self, node):
+        self.changed.add(node)
+
+    def node_deleted(self, node, neighbors):
+        self.changed.add(node)
+        self.changed.update(neighbors)
+
+    # Returns the positions of every node of g
+    def layout(self, g):
+        if self.positions is not None and not self.changed:
+            return self.positions
+        h = topology_hash(g)
+        if h not in self.layouts:
+            self.layouts[h] = self.compute(g)
+            self.modified = True
+        self.positions = self.layouts[h]
+        self.changed = set()
+        return self.positions
+
+    def compute(self, g):
+        rng = random.Random(LAYOUT_SEED)
+        if not self.positions:
+            positions = nx.spring_layout(g, iterations=LAYOUT_ITERATIONS, seed=LAYOUT_SEED)
+            return {node: (float(x), float(y)) for node, (x, y) in positions.items()}
+
+        # new nodes start next to their placed neighbors
+        seed = {node: self.positions[node] for node in g.nodes if node in self.positions}
+        for node in g.nodes:
+            if node in seed:
+                continue
+            placed = [seed[neighbor] for neighbor in g[node] if neighbor in seed]
+            if placed:
+                x = sum(p[0] for p in placed) / len(placed)
+                y = sum(p[1] for p in placed) / len(placed)
+                seed[node] = (x + rng.uniform(-0.1, 0.1), y + rng.uniform(-0.1, 0.1))
+            else:
+                seed[node] = (rng.uniform(-1, 1), rng.uniform(-1, 1))
+
+        # only the nodes around the change move
+        free = {node for node in self.changed if node in g}
+        frontier = set(free)
+        for _ in range(RELAX_HOPS):
+            frontier = {neighbor for node in frontier for neighbor in g[node]} - free
+            free |= frontier
+        fixed = [node for node in g.nodes if node not in free]
+        if not free:
+            return seed
+        positions = nx.spring_layout(g, pos=seed, fixed=fixed or None, iterations=RELAX_ITERATIONS, seed=LAYOUT_SEED)
+        return {node: (float(x), float(y)) for node, (x, y) in positions.items()}
@@ -0,0 +1,62 @@
+import json
+import pickle
+import dataclasses
+from collections import namedtuple
+
+
+# Routing messages are delivered by reference: the object a node sends is the
+# object its neighbors receive.  So a message must never change after it has
+# been sent; use str, tuples (or namedtuples), frozen dataclasses, frozensets
+# and Frozen_Dict.
+#
+# In strict mode every message is pickled when it is sent.  On arrival the
+# snapshot is compared with the message, which catches a sender that changed
+# it afterwards, and the receiver gets its own unpickled copy.
+
+
+class Frozen_Dict(dict):
+    # a dict that cannot be changed once built. lookups are plain dict lookups
+
+    def read_only(self, *args, **kwargs):
+        raise TypeError("Frozen_Dict cannot be changed")
+
+    __setitem__ = __delitem__ = __ior__ = read_only
+    clear = pop = popitem = setdefault = update = read_only
+
+    def __reduce__(self):
+        return Frozen_Dict, (dict(self),)
+
+
+Sealed_Message = namedtuple('Sealed_Message', ['payload', 'snapshot'])
+
+
+def seal(m):
+    return Sealed_Message(m, pickle.dumps(m, pickle.HIGHEST_PROTOCOL))
+
+
+# returns the private copy of a sealed message, or None if the message was
+# changed after it was sent
+def unseal(sealed):
+    copy = pickle.loads(sealed.snapshot)
+    if copy != sealed.payload:
+        return None
+    return copy
+
+
+def json_default(o):
+    if isinstance(o, (set, frozenset)):
+        return list(o)
+    if dataclasses.is_dataclass(o):
+        return dataclasses.asdict(o)
+    return repr(o)
+
+
+# The default message size estimator: the length of the message as JSON,
+# which is what the bundled nodes used to put on the wire
+def estimate_size(m):
+    if isinstance(m, (str, bytes)):
+        return len(m)
+    try:
+        return len(json.dumps(m, default=json_default))
+    except (TypeError, ValueError):
+        return len(repr(m))
@@ -0,0 +1,77 @@
+# The routes the nodes would use to reach one destination.
+#
+# The next hops of all nodes towards a destination form a forest (a tree
+# rooted at the destination, plus the nodes whose routes fail or loop).  Each
+# node is asked for its next hop only once, and the length of the route from
+# every source is resolved once and memoized, so checking the routes of all
+# sources costs one get_next_hop call per node instead of one per hop of
+# every route.
+
+# why a route fails
+NO_PATH = 'no path'
+NO_LINK = 'no link'
+
+
+class Next_Hop_Forest:
+
+    def __init__(self, destination, graph, nodes):
+        self.destination = destination
+        self.graph = graph
+        # maps a node id to its node object
+        self.nodes = nodes
+        self.next_hops = {}
+        # length of the route of every resolved node that reaches destination.
+        # failed holds the resolved nodes whose routes do not
+        self.lengths = {destination: 0}
+        self.failed = set()
+
+    def next_hop(self, node):
+        if node not in self.next_hops:
+            self.next_hops[node] = self.nodes[node].get_next_hop(self.destination)
+        return self.next_hops[node]
+
+    # Returns the length of the route from source, or None if it fails
+    def length(self, source):
+        lengths, failed = self.lengths, self.failed
+        chain, on_chain = [], set()
+        node = source
+        while True:
+            if node in lengths:
+                length = lengths[node]
+                break
+            if node in failed or node in on_chain:
+                length = None
+                break
+            chain.append(node)
+            on_chain.add(node)
+            next = self.next_hop(node)
+            if next == None or next == -1 or next not in self.graph.nodes or (node, next) not in self.graph.edges:
+                length = None
+                break
+            node = next
+
+        for node in reversed(chain):
+            if length is None:
+                failed.add(node)
+            else:
+                length += self.graph[node][self.next_hops[node]]['latency']
+                lengths[node] = length
+        return lengths.get(source)
+
+    # Follows the route from source hop by hop. Returns the route and None, or
+    # the route up to the hop that fails and NO_PATH or NO_LINK
+    def walk(self, source):
+        path, on_path = [source], {source}
+        while self.destination not in on_path:
+            next = self.next_hop(path[-1])
+            if next == None:
+                return path, NO_PATH
+            elif next == -1 or next not in self.graph.nodes or next in on_path:
+                path.append(next)
+                return path, NO_PATH
+            elif (path[-1], next) not in self.graph.edges:
+                path.append(next)
+                return path, NO_LINK
+            path.append(next)
+            on_path.add(next)
+        return path, None
@@ -1,10 +1,14 @@
 import logging
 
+from simulator.context import current_context
+
 class Node:
     def __init__(self, id):
         self.id = id
         self.neighbors = []
         self.logging = logging.getLogger('Node %d' % self.id)
+        # the simulation this node belongs to, see simulator/context.py
+        self.context = current_context()
 
     def __str__(self):
         pass
@@ -12,26 +16,31 @@ class Node:
     def link_has_been_updated(self, neighbor, latency):
         pass
 
-    def process_incoming_routing_message(self, m: str):
+    # m is whatever the neighbor sent: a str, or any immutable structure
+    # (tuples, namedtuples, frozen dataclasses, frozensets, Frozen_Dict).
+    # It is the neighbor's own object, so it must not be changed
+    def process_incoming_routing_message(self, m):
         pass
 
+    # Optional. A node class that defines process_incoming_routing_messages(ms)
+    # gets, once per second, the list of every message that arrived at it in
+    # that second, instead of one process_incoming_routing_message call each
+    process_incoming_routing_messages = None
+
     def get_next_hop(self, destination):
         pass
 
     def get_routing_table(self):
         pass
 
-    def send_to_neighbors(self, message: str):
-        from simulator.topology import Send_To_Neighbors
-        Send_To_Neighbors(self, message)
+    def send_to_neighbors(self, message):
+        self.context.send_to_neighbors(self.id, message)
 
-    def send_to_neighbor(self, neighbor, message: str):
-        from simulator.topology import Send_To_Neighbor
-        Send_To_Neighbor(self, neighbor, message)
+    def send_to_neighbor(self, neighbor, message):
+        self.context.send_to_neighbor(self.id, neighbor, message)
 
     def get_time(self):
-        from simulator.topology import Get_Time
-        return Get_Time()
+        return self.context.get_time()
 
 
 class Link:
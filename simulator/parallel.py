@@ -0,0 +1,333 @@
+import io
+import sys
+import logging
+import multiprocessing
+
+from simulator.config import *
+from simulator.event import Event, DISPATCH_TABLE
+from simulator.topology import Topology
+from simulator.command_file import Command_File
+from simulator.trace import Trace_File, is_trace
+from simulator.message import estimate_size, seal
+from simulator.checkpoint import Checkpoint_Pickler, Checkpoint_Unpickler
+
+
+# Conservative parallel simulation across processes (sim.py --workers N).
+#
+# The nodes are split between N worker processes in blocks of consecutive ids
+# (the generated topologies mostly link nodes of close ids).  Every worker
+# reads the whole event file and keeps the whole graph, but only creates its
+# own nodes and only runs their events.  A routing message to a node of
+# another worker goes through the coordinator, this process, over a pipe.
+#
+# Every link latency is at least the lookahead L, the smallest latency of the
+# event file, so a message sent at time t arrives at t + L or later.  The
+# workers run in time windows [t0, t0 + L), t0 being the time of the next
+# event anywhere: no message sent in a window arrives in it, so the workers
+# run it on their own and the messages between them are handed over at the
+# end of it.  A window ends early before a DRAW_PATH, DRAW_TREE or DUMP_NODE,
+# which needs the nodes: the workers send the ones that changed (pickled, the
+# context as a persistent reference, as in a checkpoint) and the coordinator
+# runs the command, on its own copy of the graph.
+#
+# The events of one time and phase run in the order of Keyed_Backend
+# (simulator/event_queue.py), whose keys do not depend on the worker of a
+# node: a run gives the same routes, reports and counters with any number of
+# workers as sim.py --queue KEYED in one process (python3 -m
+# benchmarks.parallel checks it).  The other backends only differ from it in
+# the order of the events of one tick.
+#
+# Not with a profile, convergence tracking, limits, checkpoints or SINGLE_STEP.
+
+# the scripted commands the workers run too
+WORKER_COMMANDS = {EVENT_TYPE.ADD_NODE, EVENT_TYPE.ADD_LINK, EVENT_TYPE.DELETE_NODE, EVENT_TYPE.DELETE_LINK, EVENT_TYPE.CHANGE_LINK}
+# the scripted commands that need the nodes
+NODE_COMMANDS = {EVENT_TYPE.DRAW_PATH, EVENT_TYPE.DRAW_TREE, EVENT_TYPE.DUMP_NODE}
+
+# what the coordinator asks a worker
+RUN = 'run'
+NODES = 'nodes'
+FINISH = 'finish'
+
+# the counters of the workers, summed
+COUNTERS = ('event_count', 'message_count', 'message_bytes', 'processing_time')
+
+NO_LIMIT = float('inf')
+
+
+def open_script(file):
+    try:
+        return Trace_File(file) if is_trace(file) else Command_File(file)
+    except IOError as e:
+        print("Can not open file " + file)
+        print(e)
+        sys.exit(-1)
+
+
+# The nodes of an event file and the smallest latency of its links, None if
+# it has no link
+def scan(file):
+    nodes, lookahead = set(), None
+    for e in open_script(file):
+        if e.event_type in (EVENT_TYPE.ADD_NODE, EVENT_TYPE.DELETE_NODE):
+            nodes.add(e.arg1)
+        elif e.event_type in (EVENT_TYPE.ADD_LINK, EVENT_TYPE.CHANGE_LINK):
+            nodes.update((e.arg1, e.arg2))
+            lookahead = e.arg3 if lookahead is None else min(lookahead, e.arg3)
+    return nodes, lookahead
+
+
+# maps every node to its worker, blocks of consecutive ids
+def partition(nodes, workers):
+    ordered = sorted(nodes)
+    return {node: i * workers // len(ordered) for i, node in enumerate(ordered)}
+
+
+class Partition(Topology):
+    # What a worker simulates: the events of its own nodes
+
+    def __init__(self, algorithm, event_file, index, owner, strict=False, size_estimator=estimate_size, batch=True):
+        super().__init__(algorithm, 'NO_STOP', 'KEYED', strict, size_estimator, batch, headless=True)
+        self.index = index
+        self.owner = owner
+        self.event_count = 0
+        # the routing messages for the other workers, lists of (time, key,
+        # receiver, message, cause) by worker
+        self.outbox = {}
+        # (version, node_updates) of the nodes last sent to the coordinator
+        self.nodes_sent = None
+        self.load_command_file(event_file)
+
+    def add_node(self, node):
+        if self.owner[node] == self.index:
+            super().add_node(node)
+        elif node not in self.context.graph:
+            self.context.graph.add_node(node)
+            self.version += 1
+
+    # every worker counts the SEND_LINKs of all the nodes, for their keys
+    def post_send_link(self, node, neighbor, latency):
+        key = self.queue.q.link_key()
+        if self.owner[node] == self.index:
+            self.queue.q.push_keyed(Event(self.get_time(), EVENT_TYPE.SEND_LINK, node, neighbor, latency), key)
+
+    def send_to_neighbor(self, node, neighbor, m):
+        graph = self.context.graph
+        if (node, neighbor) not in graph.edges:
+            return
+        if m is not self.last_message:
+            self.last_message_size = self.size_estimator(m) if self.size_estimator else 0
+            self.last_posted = seal(m) if self.strict else m
+        self.message_bytes += self.last_message_size
+        arrival = self.queue.Current_Time + int(graph[node][neighbor]['latency'])
+        worker = self.owner[neighbor]
+        if worker == self.index:
+            self.queue.Post(Event(arrival, EVENT_TYPE.ROUTING_MESSAGE_ARRIVAL, neighbor, self.last_posted, self.cause))
+        elif worker in self.outbox:
+            self.outbox[worker].append((arrival, self.queue.q.message_key(), neighbor, self.last_posted, self.cause))
+        else:
+            self.outbox[worker] = [(arrival, self.queue.q.message_key(), neighbor, self.last_posted, self.cause)]
+
+    def receive(self, messages):
+        for arrival, key, receiver, m, cause in messages:
+            self.queue.q.push_keyed(Event(arrival, EVENT_TYPE.ROUTING_MESSAGE_ARRIVAL, receiver, m, cause), key)
+
+    # Runs the posted events before time horizon and the scripted commands
+    # before the script_horizon-th
+    def run(self, horizon, script_horizon):
+        queue = self.queue
+        while True:
+            scripted = queue.Next_Scripted
+            if scripted is not None and queue.Script_Position - 1 >= script_horizon:
+                scripted = None
+            if scripted is None and (len(queue.q) == 0 or queue.q.peek_time() >= horizon):
+                return
+            e = queue.Get_Earliest()
+            if e is not scripted:
+                self.event_count += 1
+                DISPATCH_TABLE[e.event_type](self, e)
+            elif e.event_type in WORKER_COMMANDS:
+                DISPATCH_TABLE[e.event_type](self, e)
+
+    def next_time(self):
+        return self.queue.q.peek_time() if len(self.queue.q) else None
+
+    # the nodes pickled, None if they have not changed since they were last
+    # sent
+    def pickle_nodes(self):
+        stamp = (self.version, self.node_updates)
+        if stamp == self.nodes_sent:
+            return None
+        self.nodes_sent = stamp
+        buffer = io.BytesIO()
+        Checkpoint_Pickler(buffer, self.context).dump(self.nodes)
+        return buffer.getvalue()
+
+
+def run_worker(algorithm, event_file, index, owner, strict, batch, conn):
+    # the coordinator logs the warnings of the commands
+    logging.getLogger('Sim').disabled = True
+    p = Partition(algorithm, event_file, index, owner, strict, batch=batch)
+    while True:
+        request = conn.recv()
+        if request[0] == RUN:
+            _, horizon, script_horizon, messages = request
+            p.receive(messages)
+            p.run(horizon, script_horizon)
+            outbox, p.outbox = p.outbox, {}
+            conn.send((outbox, p.next_time()))
+        elif request[0] == NODES:
+            conn.send(p.pickle_nodes())
+        else:
+            counters = {name: getattr(p, name) for name in COUNTERS}
+            counters['last_message_time'] = p.last_message_time
+            conn.send(counters)
+            conn.close()
+            return
+
+
+class Parallel_Sim(Topology):
+    # The coordinator: runs the script on a copy of the graph, drives the
+    # windows of the workers and runs the DRAW_* and DUMP_* commands
+
+    def __init__(self, algorithm, event_file, workers, step='NO_STOP', strict=False, size_estimator=estimate_size, batch=True, headless=False, report=None, image_format='png', render_workers=None):
+        super().__init__(algorithm, step, DEFAULT_EVENT_QUEUE, strict, size_estimator, batch, headless, report, image_format, render_workers)
+        self.event_count = 0
+        nodes, lookahead = scan(event_file)
+        if lookahead is not None and lookahead < 1:
+            sys.stderr.write("The parallel engine needs link latencies of at least 1, %s has %s\n" % (event_file, lookahead))
+            sys.exit(-1)
+        self.lookahead = lookahead or 1
+        self.workers = max(1, min(workers, len(nodes)))
+        owner = partition(nodes, self.workers) if nodes else {}
+        self.load_command_file(event_file)
+
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        self.conns = []
+        self.processes = []
+        for index in range(self.workers):
+            conn, child = context.Pipe()
+            process = context.Process(target=run_worker, args=(algorithm, event_file, index, owner, strict, batch, child), daemon=True)
+            process.start()
+            child.close()
+            self.conns.append(conn)
+            self.processes.append(process)
+        # the nodes of every worker, as last received
+        self.worker_nodes = [{} for _ in range(self.workers)]
+        self.windows = 0
+
+        self.dump_sim()
+        self.run()
+        # the nodes at the end, as Sim leaves them
+        self.fetch_nodes()
+        self.finish()
+        self.logging.info("%d workers, %d windows" % (self.workers, self.windows))
+        self.logging.info("Total messages sent: %d" % self.message_count)
+        if self.last_message_time is not None:
+            self.logging.info("Last message arrived at time %d" % self.last_message_time)
+        if self.size_estimator:
+            self.logging.info("Total message bytes: %d" % self.message_bytes)
+        self.logging.info("Routing processing time: %.3f s" % self.processing_time)
+        self.close_report()
+        self.close_renderer()
+
+    def __str__(self):
+        ans = "==== Print Topology ====\n"
+        ans += super().__str__()
+        ans += "==== Print Event ====\n"
+        ans += self.queue.Str()
+        return ans
+
+    def dump_sim(self):
+        self.logging.info("DUMP_SIM at Time %d\n" % self.get_time() + str(self))
+
+    def print_comment(self, comment):
+        self.logging.info('Time: %d, Comment: %s' % (self.get_time(), comment))
+
+    # the nodes are the workers'
+    def add_node(self, node):
+        if node not in self.context.graph:
+            self.layout.node_added(node)
+            self.context.graph.add_node(node)
+            self.version += 1
+
+    def post_send_link(self, node, neighbor, latency):
+        pass
+
+    def run(self):
+        queue = self.queue
+        inbound = [[] for _ in self.conns]
+        next_times = [None] * len(self.conns)
+        while True:
+            times = [t for t in next_times if t is not None]
+            times.extend(m[0] for messages in inbound for m in messages)
+            if queue.Next_Scripted is not None:
+                times.append(queue.Next_Scripted.time_stamp)
+            if not times:
+                return
+            horizon = min(times) + self.lookahead
+            # the commands of the window, up to one that needs the nodes
+            node_command = None
+            while queue.Next_Scripted is not None and queue.Next_Scripted.time_stamp < horizon:
+                if queue.Next_Scripted.event_type in NODE_COMMANDS:
+                    node_command = queue.Next_Scripted
+                    horizon = node_command.time_stamp
+                    break
+                self.dispatch_command()
+            script_horizon = NO_LIMIT if queue.Next_Scripted is None else queue.Script_Position - 1
+
+            self.windows += 1
+            for conn, messages in zip(self.conns, inbound):
+                conn.send((RUN, horizon, script_horizon, messages))
+            inbound = [[] for _ in self.conns]
+            for index, (outbox, next_time) in enumerate(self.receive_all()):
+                next_times[index] = next_time
+                for worker, messages in outbox.items():
+                    inbound[worker].extend(messages)
+
+            if node_command is not None:
+                self.fetch_nodes()
+                self.dispatch_command()
+
+    def receive_all(self):
+        replies = []
+        for index, conn in enumerate(self.conns):
+            try:
+                replies.append(conn.recv())
+            except EOFError:
+                sys.stderr.write("Worker %d exited with code %s\n" % (index, self.processes[index].exitcode))
+                sys.exit(-1)
+        return replies
+
+    def dispatch_command(self):
+        e = self.queue.Get_Earliest()
+        self.event_count += 1
+        DISPATCH_TABLE[e.event_type](self, e)
+
+    def fetch_nodes(self):
+        for conn in self.conns:
+            conn.send((NODES,))
+        changed = False
+        for index, data in enumerate(self.receive_all()):
+            if data is not None:
+                self.worker_nodes[index] = Checkpoint_Unpickler(io.BytesIO(data), self.context).load()
+                changed = True
+        if changed:
+            self.nodes.clear()
+            for nodes in self.worker_nodes:
+                self.nodes.update(nodes)
+            # the next hop forests are cached per node_updates
+            self.node_updates += 1
+
+    def finish(self):
+        for conn in self.conns:
+            conn.send((FINISH,))
+        for counters in self.receive_all():
+            for name in COUNTERS:
+                setattr(self, name, getattr(self, name) + counters[name])
+            if counters['last_message_time'] is not None:
+                self.last_message_time = max(self.last_message_time or 0, counters['last_message_time'])
+        for conn, process in zip(self.conns, self.processes):
+            conn.close()
+            process.join()
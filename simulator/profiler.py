@@ -0,0 +1,202 @@
+import csv
+import json
+import time
+
+from simulator.config import *
+from simulator.event import DISPATCH_TABLE
+
+
+# An opt-in profile of one simulation (sim.py --profile PREFIX).  Nothing of it
+# runs unless it is asked for: Sim dispatches its events through
+# Profiler.dispatch_event instead of its own loop, and the few Topology methods
+# watched here are wrapped on the instance, not in the class.
+#
+# It records
+#   - the count and the wall time of the events of every EVENT_TYPE, and of
+#     the event queue itself
+#   - the count and the wall time of the handlers of every node
+#     (link_has_been_updated, process_incoming_routing_message(s)), taken from
+#     Topology.node_updates and Topology.processing_time around each event
+#   - the time of DRAW_* events split into the route checks, the layout and
+#     the rendering
+#   - the depth of the event queue and the routing messages in flight, every
+#     interval seconds of simulated time
+#   - the sizes of the routing messages sent, from the simulation's
+#     size_estimator (none without one)
+#
+# and writes them to PREFIX.json, PREFIX.csv (one row per event type and per
+# node handler) and PREFIX.collapsed, collapsed stacks in microseconds for
+# flamegraph.pl or speedscope.
+
+# the node handler an event runs, if any
+HANDLER = {
+    EVENT_TYPE.SEND_LINK: 'link_has_been_updated',
+    EVENT_TYPE.ROUTING_MESSAGE_ARRIVAL: 'process_incoming_routing_message',
+    EVENT_TYPE.DELIVER_BATCH: 'process_incoming_routing_messages',
+}
+DRAW_EVENTS = (EVENT_TYPE.DRAW_TOPOLOGY, EVENT_TYPE.DRAW_PATH, EVENT_TYPE.DRAW_TREE)
+ROOT = 'sim'
+QUEUE = 'event_queue'
+
+
+class Profiler:
+
+    def __init__(self, sim, interval=1):
+        self.sim = sim
+        self.interval = interval
+        # EVENT_TYPE code -> [count, seconds]
+        self.events = [[0, 0.0] for _ in EVENT_NAME]
+        self.queue_time = 0.0
+        # (node, handler) -> [count, seconds]
+        self.handlers = {}
+        # collapsed stack -> seconds
+        self.stacks = {}
+        # (time, queued events, messages in flight)
+        self.samples = []
+        self.sent = 0
+        self.arrived = 0
+        # routing message sizes: count, bytes, largest, and a histogram of
+        # power-of-two buckets (bucket b holds the sizes under 2^b)
+        self.payload_count = 0
+        self.payload_bytes = 0
+        self.payload_max = 0
+        self.payload_buckets = {}
+        # the DRAW_* event running, and the time of its layout and rendering
+        self.drawing_event = None
+        self.drawing_time = 0.0
+
+        send_to_neighbor = sim.send_to_neighbor
+        graph = sim.context.graph
+
+        def profiled_send_to_neighbor(node, neighbor, m):
+            send_to_neighbor(node, neighbor, m)
+            if graph.has_edge(node, neighbor):
+                self.message_sent(sim.last_message_size)
+
+        sim.send_to_neighbor = profiled_send_to_neighbor
+        sim.drawing = self.timed(sim.drawing, 'layout')
+        sim.draw = self.timed(sim.draw, 'render')
+
+    def timed(self, method, frame):
+        def timed_method(*args):
+            start = time.perf_counter()
+            ans = method(*args)
+            elapsed = time.perf_counter() - start
+            self.drawing_time += elapsed
+            self.add_stack((EVENT_NAME[self.drawing_event], frame), elapsed)
+            return ans
+        return timed_method
+
+    def message_sent(self, size):
+        self.sent += 1
+        if not self.sim.size_estimator:
+            return
+        self.payload_count += 1
+        self.payload_bytes += size
+        self.payload_max = max(self.payload_max, size)
+        bucket = size.bit_length()
+        self.payload_buckets[bucket] = self.payload_buckets.get(bucket, 0) + 1
+
+    def add_stack(self, frames, seconds):
+        self.stacks[frames] = self.stacks.get(frames, 0.0) + seconds
+
+    def sample(self, time_stamp):
+        self.samples.append((time_stamp, len(self.sim.queue.q), self.sent - self.arrived))
+
+    # Sim.dispatch_event, timing every event
+    def dispatch_event(self, step='NORMAL'):
+        sim = self.sim
+        queue = sim.queue
+        node_name = sim.node_cls.__name__
+        next_sample = 0
+        clock = time.perf_counter
+
+        start = clock()
+        e = queue.Get_Earliest()
+        self.queue_time += clock() - start
+        while e:
+            if e.time_stamp >= next_sample:
+                self.sample(e.time_stamp)
+                next_sample = e.time_stamp + self.interval
+            sim.event_count += 1
+            event_type = e.event_type
+            if event_type == EVENT_TYPE.ROUTING_MESSAGE_ARRIVAL:
+                self.arrived += 1
+            if event_type in DRAW_EVENTS:
+                self.drawing_event = event_type
+                self.drawing_time = 0.0
+            updates, processing_time = sim.node_updates, sim.processing_time
+
+            start = clock()
+            DISPATCH_TABLE[event_type](sim, e)
+            elapsed = clock() - start
+
+            stats = self.events[event_type]
+            stats[0] += 1
+            stats[1] += elapsed
+            name = EVENT_NAME[event_type]
+            if sim.node_updates != updates:
+                handler_time = sim.processing_time - processing_time
+                handler = HANDLER[event_type]
+                stats = self.handlers.get((e.arg1, handler))
+                if stats is None:
+                    stats = self.handlers[(e.arg1, handler)] = [0, 0.0]
+                stats[0] += 1
+                stats[1] += handler_time
+                self.add_stack((name, node_name + '.' + handler), handler_time)
+                elapsed -= handler_time
+            elif event_type in DRAW_EVENTS:
+                self.add_stack((name, 'check'), elapsed - self.drawing_time)
+                elapsed = 0.0
+            self.add_stack((name,), elapsed)
+
+            if step == 'SINGLE_STEP':
+                sim.logging.info(str(e))
+                sim.wait()
+            start = clock()
+            e = queue.Get_Earliest()
+            self.queue_time += clock() - start
+        self.add_stack((QUEUE,), self.queue_time)
+
+    def event_stats(self):
+        return {EVENT_NAME[code]: dict(count=count, seconds=round(seconds, 6))
+                for code, (count, seconds) in enumerate(self.events) if count}
+
+    def handler_stats(self):
+        return [dict(node=node, handler=handler, count=count, seconds=round(seconds, 6))
+                for (node, handler), (count, seconds) in sorted(self.handlers.items(), key=lambda item: -item[1][1])]
+
+    def write(self, prefix):
+        profile = dict(
+            events=self.event_stats(),
+            event_queue_seconds=round(self.queue_time, 6),
+            handlers=self.handler_stats(),
+            samples=[dict(time=t, queued=queued, in_flight=in_flight) for t, queued, in_flight in self.samples],
+            messages=dict(sent=self.sent, arrived=self.arrived),
+            payload=dict(count=self.payload_count, bytes=self.payload_bytes, max=self.payload_max,
+                         mean=self.payload_bytes / self.payload_count if self.payload_count else None,
+                         under=[{'bytes': 2 ** bucket, 'count': self.payload_buckets[bucket]} for bucket in sorted(self.payload_buckets)]),
+        )
+        with open(prefix + '.json', 'w') as f:
+            json.dump(profile, f, indent=1)
+            f.write("\n")
+
+        with open(prefix + '.csv', 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['kind', 'name', 'node', 'count', 'seconds', 'mean_us'])
+            for name, stats in profile['events'].items():
+                writer.writerow(['event', name, '', stats['count'], stats['seconds'], round(1e6 * stats['seconds'] / stats['count'], 2)])
+            for stats in profile['handlers']:
+                writer.writerow(['handler', stats['handler'], stats['node'], stats['count'], stats['seconds'], round(1e6 * stats['seconds'] / stats['count'], 2)])
+
+        with open(prefix + '.collapsed', 'w') as f:
+            for frames, seconds in sorted(self.stacks.items()):
+                microseconds = round(1e6 * seconds)
+                if microseconds > 0:
+                    f.write("%s %d\n" % (';'.join((ROOT,) + frames), microseconds))
+
+    def log_summary(self, logging):
+        total = sum(seconds for _, seconds in self.events) + self.queue_time
+        for name, stats in sorted(self.event_stats().items(), key=lambda item: -item[1]['seconds']):
+            logging.info("%-24s %9d events %9.3f s (%4.1f%%)" % (name, stats['count'], stats['seconds'], 100 * stats['seconds'] / (total or 1)))
+        logging.info("%-24s %16s %9.3f s (%4.1f%%)" % (QUEUE, "", self.queue_time, 100 * self.queue_time / (total or 1)))
@@ -0,0 +1,90 @@
+import os
+import collections
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import networkx as nx
+
+
+# A DRAW_* event does not draw anything itself: it takes a Drawing, an
+# immutable snapshot of what is to be drawn (the graph, the node positions and
+# the highlighted nodes and edges), and hands it to a renderer.
+#
+#   - Renderer renders the drawings in a pool of processes while the
+#     simulation goes on.  At most max_pending drawings wait to be rendered; a
+#     DRAW_* event past that waits for the oldest one.  flush() waits for all
+#   - without a pool (or when each picture has to be shown and waited for),
+#     render_drawing runs in the simulator itself
+#
+# The file name of a drawing is given when the event runs, so the pictures
+# and their names are the same either way.
+Drawing = collections.namedtuple('Drawing', [
+    'file',           # the image file to write
+    'positions',      # ((node, (x, y)), ...)
+    'links',          # ((node1, node2, latency), ...)
+    'red_nodes',      # highlighted nodes
+    'blue_nodes',     # the other nodes
+    'correct_edges',  # edges drawn green, None for none
+    'user_edges',     # edges drawn red, None for none
+])
+
+IMAGE_FORMATS = ['png', 'svg']
+
+
+def render_drawing(drawing, show=False):
+    import matplotlib.pyplot as plt
+
+    g = nx.Graph()
+    g.add_nodes_from(node for node, _ in drawing.positions)
+    for node1, node2, latency in drawing.links:
+        g.add_edge(node1, node2, latency=latency)
+    position = dict(drawing.positions)
+
+    plt.figure()
+    nx.draw_networkx_nodes(g, position, nodelist=list(drawing.blue_nodes), node_size=600, node_color='b', alpha=0.7)
+    nx.draw_networkx_nodes(g, position, nodelist=list(drawing.red_nodes), node_size=700, node_color='r', alpha=0.6)
+    nx.draw_networkx_labels(g, position, labels={node: str(node) for node in g.nodes}, font_size=14, font_color='w')
+
+    nx.draw_networkx_edges(g, position, width=2, alpha=0.5)
+    if drawing.user_edges != None:
+        nx.draw_networkx_edges(g, position, edgelist=list(drawing.user_edges), width=6, edge_color='r', alpha=0.4)
+    if drawing.correct_edges != None:
+        nx.draw_networkx_edges(g, position, edgelist=list(drawing.correct_edges), width=3, edge_color='g', alpha=0.8)
+    edge_labels = {(node1, node2): latency for node1, node2, latency in drawing.links}
+    nx.draw_networkx_edge_labels(g, position, edge_labels=edge_labels, font_size=14)
+    plt.axis('off')
+
+    plt.savefig(drawing.file)  # call savefig before show
+    if show:
+        plt.show()
+    plt.close()
+
+
+def init_render_worker():
+    # the workers only write files
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+class Renderer:
+
+    def __init__(self, workers=None, max_pending=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 4 * self.workers
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        self.pool = ProcessPoolExecutor(self.workers, mp_context=context, initializer=init_render_worker)
+        self.pending = collections.deque()
+
+    def render(self, drawing):
+        while len(self.pending) >= self.max_pending:
+            self.pending.popleft().result()
+        self.pending.append(self.pool.submit(render_drawing, drawing))
+
+    def flush(self):
+        while self.pending:
+            self.pending.popleft().result()
+
+    def close(self):
+        self.flush()
+        self.pool.shutdown()
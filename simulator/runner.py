@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import traceback
+import collections
+import multiprocessing
+from multiprocessing.connection import wait
+
+from simulator.config import ROUTE_ALGORITHM
+from simulator.guards import Limits
+
+
+# Runs many event files, or many generated ones, over a pool of processes.
+#
+#   python -m simulator.runner DISTANCE_VECTOR testing_suite
+#   python -m simulator.runner GENERIC,DISTANCE_VECTOR,LINK_STATE --generate 1000
+#
+# Every case runs headless in a process of its own, so it can be killed after
+# --timeout seconds, at most --jobs at a time.  A case passes if no DRAW_*
+# check of its report is incorrect.
+#
+# One JSON object per case is appended to the summary as soon as the case
+# ends: algorithm, event, status, checks, failed_checks, messages, events,
+# wall_time (and seed for generated cases, report for kept reports, error,
+# aborted: the limit of simulator/guards.py an aborted case went over).
+# The event files and reports of failing generated cases are kept in --out,
+# the others are removed.  The exit status is 1 if any case did not pass.
+PASSED = 'passed'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+ERROR = 'error'
+
+DEFAULT_OUT = "output/runner/"
+DEFAULT_TIMEOUT = 600
+
+Case = collections.namedtuple('Case', [
+    'algorithm',
+    'event',       # the event file to run
+    'seed',        # the seed it is generated with, None if it is not generated
+    'report',      # the report file to write
+])
+
+# the scenarios of --generate, same defaults as generate_simulation.py
+Generation = collections.namedtuple('Generation', ['nodes', 'degree', 'time', 'topology', 'churn'])
+
+
+def run_case(case, generation, limits, conn):
+    # the cases only talk through their reports and the summary
+    sys.stdout = open(os.devnull, 'w')
+    logging.disable(logging.CRITICAL)
+    try:
+        if case.seed is not None:
+            from generate_simulation import generate_scenario
+            generate_scenario(generation.topology, generation.churn, generation.nodes, generation.degree, generation.time,
+                              os.path.splitext(case.event)[0], seed=case.seed)
+
+        from sim import Sim
+        start = time.perf_counter()
+        s = Sim(case.algorithm, case.event, 'NO_STOP', headless=True, report=case.report, limits=limits)
+        wall_time = time.perf_counter() - start
+
+        checks = failed_checks = 0
+        with open(case.report) as f:
+            for line in f:
+                # DRAW_TOPOLOGY records carry no verdict
+                record = json.loads(line)
+                if 'correct' not in record:
+                    continue
+                checks += 1
+                if record['correct'] is False:
+                    failed_checks += 1
+        outcome = dict(status=FAILED if failed_checks else PASSED, checks=checks, failed_checks=failed_checks,
+                       messages=s.message_count, events=s.event_count, wall_time=round(wall_time, 3))
+        if s.aborted:
+            outcome['aborted'] = s.aborted['limit']
+        conn.send(outcome)
+    except Exception:
+        conn.send(dict(status=ERROR, error=traceback.format_exc(limit=-1).strip().splitlines()[-1]))
+    conn.close()
+
+
+# Runs the cases, at most jobs at a time. Yields every case with its outcome,
+# as they end
+def run_cases(cases, jobs, timeout, generation=None, limits=None):
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+    pending = collections.deque(cases)
+    # maps the sentinel of a process to its case, process, pipe and start time
+    running = {}
+
+    while pending or running:
+        while pending and len(running) < jobs:
+            case = pending.popleft()
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=run_case, args=(case, generation, limits, sender), daemon=True)
+            process.start()
+            sender.close()
+            running[process.sentinel] = (case, process, receiver, time.perf_counter())
+
+        deadline = None
+        if timeout:
+            deadline = max(0, min(started for _, _, _, started in running.values()) + timeout - time.perf_counter())
+        for sentinel in wait(list(running), deadline):
+            case, process, receiver, started = running.pop(sentinel)
+            outcome = receiver.recv() if receiver.poll() else None
+            process.join()
+            receiver.close()
+            if outcome is None:
+                outcome = dict(status=ERROR, error="exit code %s" % process.exitcode)
+            yield case, outcome
+
+        if timeout:
+            now = time.perf_counter()
+            for sentinel, (case, process, receiver, started) in list(running.items()):
+                if now - started >= timeout:
+                    del running[sentinel]
+                    process.terminate()
+                    process.join()
+                    receiver.close()
+                    yield case, dict(status=TIMEOUT, wall_time=round(now - started, 3))
+
+
+def report_file(out, algorithm, name):
+    return os.path.join(out, algorithm, name + ".report.jsonl")
+
+
+def folder_cases(algorithms, folder, out):
+    events = []
+    for root, _, files in os.walk(folder):
+        events += [os.path.join(root, file) for file in files if file.endswith(".event")]
+    events.sort()
+    cases = []
+    for algorithm in algorithms:
+        for event in events:
+            name = os.path.splitext(os.path.relpath(event, folder))[0].replace(os.sep, '_')
+            cases.append(Case(algorithm, event, None, report_file(out, algorithm, name)))
+    return cases
+
+
+# Case i of every algorithm runs the same scenario, generated with seed + i
+def generated_cases(algorithms, count, seed, out):
+    cases = []
+    for algorithm in algorithms:
+        for i in range(1, count + 1):
+            name = "gen_test-%d" % i
+            cases.append(Case(algorithm, os.path.join(out, algorithm, name + ".event"), seed + i, report_file(out, algorithm, name)))
+    return cases
+
+
+def algorithm_list(value):
+    algorithms = value.split(',')
+    for algorithm in algorithms:
+        if algorithm not in ROUTE_ALGORITHM:
+            raise argparse.ArgumentTypeError("unknown algorithm %s (choose from %s)" % (algorithm, ', '.join(ROUTE_ALGORITHM)))
+    return algorithms
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m simulator.runner",
+                                     description="Run event files, or generated ones, in parallel and check the routes.")
+    parser.add_argument('algorithms', type=algorithm_list, help="ALGO or ALGO,ALGO,...")
+    parser.add_argument('folder', nargs='?', help="run every .event file under this folder")
+    parser.add_argument('--generate', type=int, metavar='N', help="run N generated event files instead")
+    parser.add_argument('--seed', type=int, help="seed of the generated event files (random by default)")
+    parser.add_argument('--nodes', type=int, default=20)
+    parser.add_argument('--degree', type=int, default=3)
+    parser.add_argument('--time', type=int, default=1000)
+    parser.add_argument('--topology', default='offsets', help="topology family of the generated event files")
+    parser.add_argument('--churn', help="churn profile of the generated event files (as in generate_simulation.py)")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="seconds per case, 0 for none")
+    parser.add_argument('--max-messages', type=int, help="abort a case after this many routing messages")
+    parser.add_argument('--max-messages-per-tick', type=int, help="abort a case after this many routing messages at one time")
+    parser.add_argument('--out', default=DEFAULT_OUT, help="where reports and failing generated cases are kept")
+    parser.add_argument('--summary', help="the JSONL summary (OUT/summary.jsonl by default)")
+    args = parser.parse_args()
+    if (args.folder is None) == (args.generate is None):
+        parser.error("give either a folder or --generate N")
+    if args.churn == 'classic' and args.topology != 'offsets':
+        parser.error("the classic churn only goes with the offsets topology")
+
+    generation = None
+    if args.generate is not None:
+        if args.seed is None:
+            args.seed = random.randrange(2 ** 31)
+        print("generating %d cases with seed %d" % (args.generate, args.seed))
+        cases = generated_cases(args.algorithms, args.generate, args.seed, args.out)
+        generation = Generation(args.nodes, args.degree, args.time, args.topology, args.churn)
+    else:
+        cases = folder_cases(args.algorithms, args.folder, args.out)
+    for algorithm in args.algorithms:
+        os.makedirs(os.path.join(args.out, algorithm), exist_ok=True)
+
+    summary_file = args.summary or os.path.join(args.out, "summary.jsonl")
+    failed = 0
+    with open(summary_file, 'w') as summary:
+        for case, outcome in run_cases(cases, max(1, args.jobs), args.timeout, generation,
+                                            Limits(messages=args.max_messages, messages_per_tick=args.max_messages_per_tick)):
+            record = dict(algorithm=case.algorithm, event=case.event)
+            if case.seed is not None:
+                record['seed'] = case.seed
+            record.update(outcome)
+
+            if outcome['status'] == PASSED:
+                if case.seed is not None and os.path.exists(case.event):
+                    os.remove(case.event)
+                if os.path.exists(case.report):
+                    os.remove(case.report)
+            else:
+                failed += 1
+                if os.path.exists(case.report):
+                    record['report'] = case.report
+            summary.write(json.dumps(record) + "\n")
+            summary.flush()
+
+            details = outcome.get('error', "%s/%s checks failed" % (outcome.get('failed_checks'), outcome.get('checks')))
+            if 'aborted' in outcome:
+                details += ", aborted over --max-%s" % outcome['aborted'].replace('_', '-')
+            if outcome['status'] == TIMEOUT:
+                details = "killed after %.0f s" % outcome['wall_time']
+            print("%-7s %s %s%s" % (outcome['status'].upper(), case.algorithm, case.event,
+                                    "" if outcome['status'] == PASSED else " (%s)" % details))
+
+    print("summary written to %s" % summary_file)
+    if failed == 0:
+        print("\nALL %d TESTS PASSED!! :)" % len(cases))
+    else:
+        print("\n%d out of %d TESTS FAILED!! :(" % (failed, len(cases)))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
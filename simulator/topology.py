@@ -1,30 +1,108 @@
+import os
 import sys
+import json
 import logging
-import traceback
 import time
 import networkx as nx
-import matplotlib.pyplot as plt
 
 from simulator.config import *
 from simulator.event import Event
 from simulator.event_queue import Event_Queue
+from simulator.context import Simulation_Context
+from simulator.command_file import Command_File, wrong_format
+from simulator.trace import Trace_File, is_trace
+from simulator.message import estimate_size, seal, unseal
+from simulator.ground_truth import Ground_Truth
+from simulator.next_hop_forest import Next_Hop_Forest, NO_PATH
+from simulator.render import Drawing, Renderer, render_drawing
+from simulator.layout import Layout_Cache
+from simulator.checkpoint import save_checkpoint, load_checkpoint
+
+# why a DRAW_PATH/DRAW_TREE check fails in the report, besides the NO_PATH and
+# NO_LINK of a route that does not reach the destination
+LONGER_PATH = 'longer path'
+NO_CORRECT_PATH = 'no correct path'
+ILLEGAL_PARAMETERS = 'illegal parameters'
+
+
+# lengths in the report: JSON has no infinity
+def report_length(length):
+    return None if length == float("inf") else length
 
 
 class Topology:
 
-    Nodes = {}
-    this = None
+    # what a checkpoint keeps besides the queue, the graph and the nodes. The
+    # run options (strict, batch) are those of the command line that resumes
+    CHECKPOINT_ATTRIBUTES = ('version', 'node_updates', 'message_count', 'message_bytes', 'processing_time', 'print_count',
+                             'last_message', 'last_message_size', 'last_posted', 'pending_batches', 'last_message_time',
+                             'cause_count')
 
-    def __init__(self, algorithm, step='NORMAL'):
+    def __init__(self, algorithm, step='NORMAL', queue=DEFAULT_EVENT_QUEUE, strict=False, size_estimator=estimate_size, batch=True, headless=False, report=None, image_format='png', render_workers=None):
+        self.queue = Event_Queue(queue)
         self.__g = nx.Graph()
+        # what the nodes reach the simulation through. self.nodes maps a node
+        # id to its node object
+        self.context = Simulation_Context(self, self.queue, self.__g)
+        self.nodes = self.context.nodes
+        # bumped whenever a shortest path may change. the correct paths are
+        # cached per version
+        self.version = 0
+        self.ground_truth = Ground_Truth(self.__g)
+        # bumped whenever a node handles a link update or routing messages,
+        # i.e. whenever a next hop may change. the next hop forests of the
+        # nodes are cached for one (version, node_updates)
+        self.node_updates = 0
+        self.next_hop_forests = {}
+        self.next_hop_forests_key = None
         self.node_cls = ROUTE_ALGORITHM_NODE[algorithm]
         self.step = step
         self.logging = logging.getLogger('Sim')
-        self.position = None
+        # the node positions of the pictures
+        self.layout = Layout_Cache()
         self.message_count = 0
+        self.message_bytes = 0
+        # wall time spent in the nodes' link and routing message handlers
+        self.processing_time = 0.0
         self.print_count = 0
-        Topology.Nodes = {}
-        Topology.this = self
+        # strict mode seals every routing message, see simulator/message.py
+        self.strict = strict
+        # size_estimator(m) is the size in bytes of routing message m. None
+        # turns off the accounting of message_bytes
+        self.size_estimator = size_estimator
+        # the message send_to_neighbors is sending, its size and what was
+        # posted for it: one message to every neighbor is measured and sealed
+        # only once. None between calls, as a node may change a message it
+        # sent before and send it again
+        self.last_message = None
+        self.last_message_size = 0
+        self.last_posted = None
+        # when the node class has process_incoming_routing_messages, the
+        # messages arriving at a node in one second are collected here and
+        # handed over together by a DELIVER_BATCH event
+        self.batch = batch and self.node_cls.process_incoming_routing_messages is not None
+        self.pending_batches = {}
+        self.last_message_time = None
+        # the command the running node handler is a consequence of. routing
+        # messages carry it (arg3 of their ROUTING_MESSAGE_ARRIVAL), see
+        # simulator/convergence.py. -1 when nothing tracks it. cause_count is
+        # the number of ids given out
+        self.cause = -1
+        self.cause_count = 0
+        # the event file the commands are taken from
+        self.script_file = None
+        # headless runs check the routes of DRAW_* events but skip the layout
+        # and the rendering
+        self.headless = headless
+        # the file the outcome of every DRAW_* event is written to, one JSON
+        # object per line
+        self.report = open(report, 'w') if report else None
+        # pictures are rendered by a pool of render_workers processes (all the
+        # cpus for None) while the simulation goes on, unless render_workers
+        # is 0 or each picture is shown and waited for
+        self.image_format = image_format
+        self.render_workers = render_workers
+        self.renderer = None
 
     def __str__(self):
         ans = ""
@@ -35,10 +113,14 @@ class Topology:
         return ans
 
     def add_node(self, node):
-        if node not in Topology.Nodes.keys():
-            self.position = None
-            Topology.Nodes[node] = self.node_cls(node)
-        self.__g.add_node(node)
+        if node not in self.nodes.keys():
+            self.layout.node_added(node)
+            with self.context:
+                self.nodes[node] = self.node_cls(node)
+        if node not in self.__g:
+            # a new source or destination for the ground truth
+            self.__g.add_node(node)
+            self.version += 1
 
     def add_link(self, node1, node2, latency):
         if latency < 0:
@@ -47,6 +129,7 @@ class Topology:
         self.add_node(node1)
         self.add_node(node2)
         self.__g.add_edge(node1, node2, latency = latency)
+        self.version += 1
         self.post_send_link(node1, node2, latency)
         self.post_send_link(node2, node1, latency)
 
@@ -54,16 +137,18 @@ class Topology:
         self.add_link(node1, node2, latency)
 
     def send_link(self, node, neighbor, latency):
-        if node not in Topology.Nodes:
+        if node not in self.nodes:
             return
-        Topology.Nodes[node].link_has_been_updated(neighbor, latency)
+        self.node_updates += 1
+        start = time.perf_counter()
+        self.nodes[node].link_has_been_updated(neighbor, latency)
+        self.processing_time += time.perf_counter() - start
 
     def post_send_link(self, node, neighbor, latency):
-        Event_Queue.Post(
+        self.queue.Post(
             Event(
-                Get_Time(),
+                self.get_time(),
                 EVENT_TYPE.SEND_LINK,
-                self,
                 node,
                 neighbor,
                 latency
@@ -73,6 +158,7 @@ class Topology:
     def delete_link(self, node1, node2):
         if (node1, node2) in self.__g.edges:
             self.__g.remove_edge(node1, node2)
+            self.version += 1
             self.post_send_link(node1, node2, -1)
             self.post_send_link(node2, node1, -1)
         else:
@@ -80,115 +166,159 @@ class Topology:
 
     def delete_node(self, node):
         if node in self.__g.nodes:
-            for neighbor in list(self.__g[node].keys()):
+            neighbors = list(self.__g[node].keys())
+            for neighbor in neighbors:
                 self.delete_link(node, neighbor)
             self.__g.remove_node(node)
-            Topology.Nodes.pop(node)
-            self.position = None
-            self.logging.debug("node %d deleted at time %d" % (node, Get_Time()))
+            self.version += 1
+            self.nodes.pop(node, None)
+            self.layout.node_deleted(node, neighbors)
+            self.logging.debug("node %d deleted at time %d" % (node, self.get_time()))
         else:
             self.logging.warning("remove node %d does not exit" % node)
 
     def dump_node(self, node):
-        if (node in self.__g.nodes) and (node in Topology.Nodes.keys()):
-            self.logging.info('DUMP_NODE: ' + str(Topology.Nodes[node]))
+        if (node in self.__g.nodes) and (node in self.nodes.keys()):
+            self.logging.info('DUMP_NODE: ' + str(self.nodes[node]))
         else:
             self.logging.warning("node %d does not exit" % node)
 
     def send_to_neighbors(self, node, m):
+        self.last_message = None
         for neighbor in list(self.__g[node].keys()):
             self.send_to_neighbor(node, neighbor, m)
+            self.last_message = m
+        self.last_message = None
 
     def send_to_neighbor(self, node, neighbor, m):
         if (node, neighbor) not in self.__g.edges:
             return
-        Event_Queue.Post(
+        if m is not self.last_message:
+            self.last_message_size = self.size_estimator(m) if self.size_estimator else 0
+            self.last_posted = seal(m) if self.strict else m
+        self.message_bytes += self.last_message_size
+        self.queue.Post(
             Event(
-                Get_Time() + int(self.__g[node][neighbor]['latency']),
+                self.queue.Current_Time + int(self.__g[node][neighbor]['latency']),
                 EVENT_TYPE.ROUTING_MESSAGE_ARRIVAL,
-                self,
                 neighbor,
-                m
+                self.last_posted,
+                self.cause
             )
         )
 
-    def routing_message_arrival(self, neighbor, m):
+    def routing_message_arrival(self, neighbor, m, cause=-1):
         self.message_count += 1
-        if neighbor in self.__g.nodes:
-            Topology.Nodes[neighbor].process_incoming_routing_message(m)
+        self.last_message_time = self.queue.Current_Time
+        if self.strict:
+            m = self.unseal_message(m)
+        if neighbor not in self.__g.nodes:
+            return
+        if not self.batch:
+            self.node_updates += 1
+            start = time.perf_counter()
+            self.nodes[neighbor].process_incoming_routing_message(m)
+            self.processing_time += time.perf_counter() - start
+        elif neighbor in self.pending_batches:
+            self.pending_batches[neighbor].append(m)
+        else:
+            self.pending_batches[neighbor] = [m]
+            self.queue.Post(Event(self.get_time(), EVENT_TYPE.DELIVER_BATCH, neighbor))
 
-    def node_labels(self):
-        return {node : str(node) for node in self.__g.nodes}
+    def deliver_batch(self, node):
+        batch = self.pending_batches.pop(node)
+        if node in self.__g.nodes:
+            self.node_updates += 1
+            start = time.perf_counter()
+            self.nodes[node].process_incoming_routing_messages(batch)
+            self.processing_time += time.perf_counter() - start
+
+    def unseal_message(self, sealed):
+        m = unseal(sealed)
+        if m is None:
+            sys.stderr.write("A routing message was changed after it was sent: %s\n" % str(sealed.payload))
+            sys.exit(-1)
+        return m
+
+    def write_report(self, event, **outcome):
+        if self.report:
+            self.report.write(json.dumps(dict(time=self.get_time(), event=event, **outcome)) + "\n")
 
-    def edge_labels(self):
-        return {(node1, node2) : self.__g[node1][node2]['latency'] for node1, node2 in self.__g.edges}
+    def close_report(self):
+        if self.report:
+            self.report.close()
+            self.report = None
+
+    # why the route of a node from source to destination is wrong
+    def user_path_failure(self, source, destination, user_length):
+        if user_length == float("inf"):
+            return self.get_next_hop_forest(destination).walk(source)[1]
+        return LONGER_PATH
 
     def draw_topology(self):
-        if self.position == None:
-            self.position = nx.spring_layout(self.__g)
-        nx.draw_networkx_nodes(self.__g, self.position, node_size=600, node_color='b', alpha=0.7)
-        nx.draw_networkx_labels(self.__g, self.position, labels=self.node_labels(), font_size=14, font_color='w')
-        nx.draw_networkx_edges(self.__g, self.position, width=2, alpha=0.5)
-        nx.draw_networkx_edge_labels(self.__g, self.position, edge_labels=self.edge_labels(), font_size=14)
-        plt.axis('off')
-
-        filename = 'Topo_' + time.strftime("%H_%M_%S", time.localtime()) + '_Count_' + str(self.print_count) + '_Time_' + str(Get_Time()) + '.png'
-        self.print_count += 1
-        plt.savefig(OUTPUT_PATH + filename) # call savefig before show
-        plt.show()
-        plt.close(OUTPUT_PATH + filename)
-        self.wait()
+        self.write_report("DRAW_TOPOLOGY", nodes=self.__g.number_of_nodes(), links=self.__g.number_of_edges())
+        if self.headless:
+            return
+        self.draw(self.drawing([], list(self.__g.nodes), None, None))
 
     def get_correct_path(self, source, destination):
-        try:
-            shortest_path = nx.algorithms.shortest_path(self.__g, source=source, target=destination, weight='latency')
-            shortest_length = nx.algorithms.shortest_path_length(self.__g, source=source, target=destination, weight='latency')
-        except:
+        tree = self.get_correct_tree(source)
+        if tree is None or destination not in tree.lengths:
             self.logging.warning("No path from %d to %d, please correct event/topo file" % (source, destination))
             return None, float("inf")
-        return shortest_path, shortest_length
+        return tree.path(destination), tree.lengths[destination]
 
+    # the Path_Tree of the shortest paths from source, None if source is not a
+    # node
+    def get_correct_tree(self, source):
+        if source not in self.__g.nodes:
+            return None
+        return self.ground_truth.tree(source, self.version)
 
     def get_correct_path_dict(self, source):
-        try:
-            shortest_paths = nx.algorithms.shortest_path(self.__g, source=source, weight='latency')
-            shortest_lengths = nx.algorithms.shortest_path_length(self.__g, source=source, weight='latency')
-        except:
+        tree = self.get_correct_tree(source)
+        if tree is None:
             self.logging.warning("No Tree from %d, please correct event/topo file" % source)
             return None, float("inf")
-        shortest_path_dict = {(source, k):v for (k,v) in shortest_paths.items() if source != k}
-        shortest_length_dict = {(source, k):v for (k,v) in shortest_lengths.items() if source != k}
+        shortest_path_dict = {(source, k):tree.path(k) for k in tree.lengths if source != k}
+        shortest_length_dict = {(source, k):v for (k,v) in tree.lengths.items() if source != k}
         return shortest_path_dict, shortest_length_dict
 
 
-    def get_user_path(self, source, destination):
-        path = [source]
-        length = 0
-
-        while destination not in path:
-            next = Topology.Nodes[path[-1]].get_next_hop(destination)
-            if next == None:
-                self.logging.warning("Your algorithm cannot find a path from %d to %d. Output: %s." % (source, destination, str(path)))
-                return [], float("inf")
-            elif next == -1 or next not in self.__g.nodes or next in path:
-                path.append(next)
-                self.logging.warning(
-                    "Your algorithm cannot find a path from %d to %d. Output: %s." % (source, destination, str(path)))
-                return [], float("inf")
-            elif (path[-1], next) not in self.__g.edges:
-                self.logging.warning("Link from %d to %d does not exist, you cannot use it" % (path[-1], next))
-                path.append(next)
-                return [], float("inf")
-            length += self.__g[path[-1]][next]['latency']
-            path.append(next)
-        return path, length
-
+    # the Next_Hop_Forest of destination, shared by every check until a link
+    # or a node changes
+    def get_next_hop_forest(self, destination):
+        key = (self.version, self.node_updates)
+        if key != self.next_hop_forests_key:
+            self.next_hop_forests = {}
+            self.next_hop_forests_key = key
+        if destination not in self.next_hop_forests:
+            self.next_hop_forests[destination] = Next_Hop_Forest(destination, self.__g, self.nodes)
+        return self.next_hop_forests[destination]
 
+    def get_user_path(self, source, destination):
+        forest = self.get_next_hop_forest(destination)
+        path, failure = forest.walk(source)
+        if failure == NO_PATH:
+            self.logging.warning("Your algorithm cannot find a path from %d to %d. Output: %s." % (source, destination, str(path)))
+            return [], float("inf")
+        elif failure:
+            self.logging.warning("Link from %d to %d does not exist, you cannot use it" % (path[-2], path[-1]))
+            return [], float("inf")
+        return path, forest.length(source)
+
+    # the lengths of the routes from source are resolved first, the routes are
+    # only followed hop by hop to report them
     def get_user_path_dict(self, source):
         path_dict, length_dict = {}, {}
         for d in self.__g.nodes:
             if d == source: continue
-            path_dict[(source, d)], length_dict[(source, d)] = self.get_user_path(source, d)
+            forest = self.get_next_hop_forest(d)
+            length = forest.length(source)
+            if length is None:
+                path_dict[(source, d)], length_dict[(source, d)] = self.get_user_path(source, d)
+            else:
+                path_dict[(source, d)], length_dict[(source, d)] = forest.walk(source)[0], length
         return path_dict, length_dict
 
 
@@ -196,10 +326,12 @@ class Topology:
     def draw_path(self, source, destination):
         if (source not in self.__g.nodes) or  (destination not in self.__g.nodes) or (source == destination):
             self.logging.warning("Parameters in DRAW_PATH are illegal.")
+            self.write_report("DRAW_PATH", source=source, destination=destination, correct=None, reason=ILLEGAL_PARAMETERS)
             return
 
         correct_path, correct_length = self.get_correct_path(source, destination)
         if correct_path == None:
+            self.write_report("DRAW_PATH", source=source, destination=destination, correct=None, reason=NO_CORRECT_PATH)
             return
 
         user_path, user_length = self.get_user_path(source, destination)
@@ -208,6 +340,13 @@ class Topology:
         print("student_path: (length=%s) %s" % (user_length, user_path))
         print("student's solution is %s!\n" % ("correct" if correct_length == user_length else "incorrect"))
 
+        correct = correct_length == user_length
+        self.write_report("DRAW_PATH", source=source, destination=destination, correct=correct,
+                          correct_length=correct_length, student_length=report_length(user_length),
+                          reason=None if correct else self.user_path_failure(source, destination, user_length))
+        if self.headless:
+            return
+
         red_nodes = [source, destination]
         blue_nodes = list(self.__g.nodes)
         for node in red_nodes:
@@ -223,11 +362,11 @@ class Topology:
     def draw_tree(self, source):
         if source not in self.__g.nodes:
             self.logging.warning("Parameter in DRAW_TREE is illegal.")
+            self.write_report("DRAW_TREE", source=source, correct=None, reason=ILLEGAL_PARAMETERS)
             return
 
-        correct_path_dict, correct_length_dict = self.get_correct_path_dict(source)
-        if correct_path_dict == None:
-            return
+        correct_tree = self.get_correct_tree(source)
+        correct_length_dict = {(source, k):v for (k,v) in correct_tree.lengths.items() if source != k}
 
         user_path_dict, user_length_dict = self.get_user_path_dict(source)
 
@@ -235,98 +374,138 @@ class Topology:
         for (k,v) in correct_length_dict.items():
             if v == user_length_dict[k]: continue
             print("from %s to %s:" % (k[0], k[1]))
-            print("correct_path: (length=%s) %s" % (correct_length_dict[k], correct_path_dict[k]))
+            print("correct_path: (length=%s) %s" % (correct_length_dict[k], correct_tree.path(k[1])))
             print("student_path: (length=%s) %s" % (user_length_dict[k], user_path_dict[k]))
         print("student's solution is %s!\n" % ("correct" if correct_length_dict == user_length_dict else "incorrect"))
 
+        if self.report:
+            failures = []
+            for k in sorted(correct_length_dict.keys() | user_length_dict.keys()):
+                correct_length, user_length = correct_length_dict.get(k), user_length_dict.get(k)
+                if correct_length == user_length:
+                    continue
+                if correct_length is None:
+                    reason = NO_CORRECT_PATH
+                else:
+                    reason = self.user_path_failure(source, k[1], user_length)
+                failures.append(dict(destination=k[1], correct_length=correct_length,
+                                     student_length=report_length(user_length), reason=reason))
+            self.write_report("DRAW_TREE", source=source, correct=correct_length_dict == user_length_dict,
+                              destinations=len(user_length_dict), failures=failures)
+        if self.headless:
+            return
+
         red_nodes = [source]
         blue_nodes = list(self.__g.nodes)
         blue_nodes.remove(source)
 
-        correct_edges, user_edges = set(), set()
-        for (k,v) in correct_path_dict.items():
-            correct_edges |= set([(v[i], v[i+1]) for i in range(len(v)-1)])
+        correct_edges, user_edges = correct_tree.edges(), set()
         for (k,v) in user_path_dict.items():
             user_edges |= set([(v[i], v[i+1]) for i in range(len(v)-1)])
 
         self.draw_in_networkx(red_nodes, blue_nodes, correct_edges, user_edges)
 
     def draw_in_networkx(self, red_nodes, blue_nodes, correct_path, user_path):
-        if self.position == None:
-            self.position = nx.spring_layout(self.__g)
-            
-        nx.draw_networkx_nodes(self.__g, self.position, nodelist=blue_nodes, node_size=600, node_color='b', alpha=0.7)
-        nx.draw_networkx_nodes(self.__g, self.position, nodelist=red_nodes, node_size=700, node_color='r', alpha=0.6)
-        nx.draw_networkx_labels(self.__g, self.position, labels=self.node_labels(), font_size=14, font_color='w')
-
-        nx.draw_networkx_edges(self.__g, self.position, width=2, alpha=0.5)
-        if user_path != None:
-            nx.draw_networkx_edges(self.__g, self.position, edgelist=user_path, width=6, edge_color='r', alpha=0.4)
-        nx.draw_networkx_edges(self.__g, self.position, edgelist=correct_path, width=3, edge_color='g', alpha=0.8)
-        nx.draw_networkx_edge_labels(self.__g, self.position, edge_labels=self.edge_labels(), font_size=14)
-        plt.axis('off')
-
-        filename = 'Topo_' + time.strftime("%H_%M_%S", time.localtime()) + '_Count_' + str(self.print_count) + '_Time_' + str(Get_Time()) + '.png'
+        self.draw(self.drawing(red_nodes, blue_nodes, correct_path, user_path))
+
+    # a snapshot of the topology to draw, with its file name
+    def drawing(self, red_nodes, blue_nodes, correct_edges, user_edges):
+        position = self.layout.layout(self.__g)
+        filename = 'Topo_' + time.strftime("%H_%M_%S", time.localtime()) + '_Count_' + str(self.print_count) + '_Time_' + str(self.get_time()) + '.' + self.image_format
         self.print_count += 1
-        plt.savefig(OUTPUT_PATH + filename)  # call savefig before show
-        plt.show()
-        plt.close(OUTPUT_PATH + filename)
-        self.wait()
+        return Drawing(
+            OUTPUT_PATH + filename,
+            tuple((node, position[node]) for node in self.__g.nodes),
+            tuple((node1, node2, latency) for node1, node2, latency in self.__g.edges(data='latency')),
+            tuple(red_nodes),
+            tuple(blue_nodes),
+            None if correct_edges == None else tuple(correct_edges),
+            None if user_edges == None else tuple(user_edges)
+        )
+
+    def draw(self, drawing):
+        if self.step != 'NO_STOP' or self.render_workers == 0:
+            render_drawing(drawing, show=True)
+            self.wait()
+            return
+        if self.renderer == None:
+            self.renderer = Renderer(self.render_workers)
+        self.renderer.render(drawing)
+
+    def close_renderer(self):
+        if self.renderer:
+            self.renderer.close()
+            self.renderer = None
+        self.layout.save()
 
     def wait(self):
         if self.step == 'NO_STOP':
             return
         input('Press Enter to Continue...')
 
-    def load_command_file(self, file):
-        try:
-            f = open(file)
-            for line in f.readlines():
-                line = line.strip()
-                if line == "" or line[0] == '#':
-                    continue
+    def get_time(self):
+        return self.queue.Current_Time
 
-                items = line.split(' ')
-                time_stamp = int(items[0])
-                event_type = items[1]
-
-                num_args = len(items) - 2
-                if event_type == EVENT_TYPE.PRINT:
-                    Event_Queue.Post(Event(time_stamp, event_type, self, "".join(items[2:])))
-                elif num_args < 0 or num_args > 3:
-                    sys.stderr.write(line)
-                    raise BufferError
-                elif num_args == 0:
-                    Event_Queue.Post(Event(time_stamp, event_type, self))
-                elif num_args == 1:
-                    Event_Queue.Post(Event(time_stamp, event_type, self, int(items[2])))
-                elif num_args == 2:
-                    Event_Queue.Post(Event(time_stamp, event_type, self, int(items[2]), int(items[3])))
-                elif num_args == 3:
-                    Event_Queue.Post(Event(time_stamp, event_type, self, int(items[2]), int(items[3]), int(items[4])))
-            f.close()
+    # skip and after are those of Event_Queue.Set_Script
+    def load_command_file(self, file, skip=0, after=None):
+        try:
+            self.layout.set_scenario(file)
+            self.script_file = os.path.abspath(file)
+            if is_trace(file):
+                self.queue.Set_Script(Trace_File(file), skip, after)
+            else:
+                self.queue.Set_Script(Command_File(file), skip, after)
 
         except IOError as e:
             print("Can not open file " + file)
             print(e)
             sys.exit(-1)
 
-        except BufferError:
-            print("File with wrong format " + file)
-            sys.exit(-1)
-
         except Exception as e:
-            print("File with wrong format " + file)
-            print(e)
-            traceback.print_exc()
+            wrong_format(file, e)
+
+    # see simulator/checkpoint.py. time is the time the checkpoint is taken
+    # at: every event up to it has run, none after it
+    def save_checkpoint(self, file, time):
+        state = {name: getattr(self, name) for name in self.CHECKPOINT_ATTRIBUTES}
+        state.update(time=time, node_cls=self.node_cls, script_file=self.script_file, queue=self.queue, graph=self.__g, nodes=self.nodes,
+                     strict=self.strict)
+        save_checkpoint(file, state, self.context)
+
+    # Seals the routing messages in flight, or unseals them, after a
+    # checkpoint taken with the other --strict. A pending batch holds
+    # unsealed messages either way, and --no-batch still delivers it
+    def reseal_messages(self):
+        resealed = {}
+        for e in self.queue.q.events():
+            if e.event_type == EVENT_TYPE.ROUTING_MESSAGE_ARRIVAL:
+                m = e.arg2
+                if id(m) not in resealed:
+                    resealed[id(m)] = seal(m) if self.strict else self.unseal_message(m)
+                e.arg2 = resealed[id(m)]
+        self.last_message = self.last_posted = None
+
+    # Restores a checkpoint into a simulation that has not started. The
+    # commands come from the rest of the event file of the checkpoint, or from
+    # event_file after the time of the checkpoint
+    def restore_checkpoint(self, file, event_file=None):
+        state = load_checkpoint(file, self.context)
+        if state['node_cls'] is not self.node_cls:
+            sys.stderr.write("The checkpoint %s was taken with %s nodes\n" % (file, state['node_cls'].__name__))
             sys.exit(-1)
-
-
-def Send_To_Neighbors(node, m):
-    Topology.this.send_to_neighbors(node.id, m)
-
-def Send_To_Neighbor(node, neighbor, m):
-    Topology.this.send_to_neighbor(node.id, neighbor, m)
-
-def Get_Time():
-    return Event_Queue.Current_Time
+        for name in self.CHECKPOINT_ATTRIBUTES:
+            setattr(self, name, state[name])
+        self.queue = self.context.queue = state['queue']
+        self.__g = self.context.graph = state['graph']
+        self.nodes.clear()
+        self.nodes.update(state['nodes'])
+        if state['strict'] != self.strict:
+            self.reseal_messages()
+        self.ground_truth = Ground_Truth(self.__g)
+        self.next_hop_forests = {}
+        self.next_hop_forests_key = None
+        if event_file is None:
+            self.load_command_file(state['script_file'], skip=self.queue.Script_Position - 1)
+        else:
+            self.load_command_file(event_file, after=state['time'])
+        return state['time']
@@ -0,0 +1,85 @@
+import mmap
+import struct
+
+from simulator.config import *
+from simulator.event import Event
+from simulator.command_file import Command_File
+
+
+# A compiled trace is a command file turned into fixed-width binary records,
+# so replaying it needs no per-line parsing at all:
+#
+#   header   magic, number of records, offset of the string table
+#   records  one per command, in time order: opcode (the event code), time
+#            stamp and three int args (-1 when absent).  PRINT keeps the index
+#            of its text in the string table as arg1
+#   strings  number of strings, then each one as a length and utf-8 bytes.
+#            identical PRINT texts share one entry
+TRACE_MAGIC = b'RSIMTRC1'
+HEADER = struct.Struct('<8sQQ')
+RECORD = struct.Struct('<Hxxxxxxqqqq')
+STRING_LENGTH = struct.Struct('<I')
+
+
+def is_trace(file):
+    with open(file, 'rb') as f:
+        return f.read(len(TRACE_MAGIC)) == TRACE_MAGIC
+
+
+def compile_command_file(source, destination):
+    # returns the number of commands written
+    strings = {}
+    count = 0
+    with open(destination, 'wb') as f:
+        f.write(HEADER.pack(TRACE_MAGIC, 0, 0))
+        for e in Command_File(source):
+            arg1 = e.arg1
+            if e.event_type == EVENT_TYPE.PRINT:
+                arg1 = strings.setdefault(arg1, len(strings))
+            f.write(RECORD.pack(e.event_type, e.time_stamp, arg1, e.arg2, e.arg3))
+            count += 1
+
+        strings_offset = f.tell()
+        f.write(STRING_LENGTH.pack(len(strings)))
+        for text in strings:
+            data = text.encode()
+            f.write(STRING_LENGTH.pack(len(data)))
+            f.write(data)
+
+        f.seek(0)
+        f.write(HEADER.pack(TRACE_MAGIC, count, strings_offset))
+    return count
+
+
+class Trace_File:
+
+    def __init__(self, file):
+        self.file = file
+        with open(file, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.strings_offset = HEADER.unpack_from(self.map, 0)
+        if magic != TRACE_MAGIC:
+            raise ValueError("not a compiled trace: " + file)
+        self.strings = self.read_strings()
+
+    def read_strings(self):
+        offset = self.strings_offset
+        (n,) = STRING_LENGTH.unpack_from(self.map, offset)
+        offset += STRING_LENGTH.size
+        strings = []
+        for _ in range(n):
+            (length,) = STRING_LENGTH.unpack_from(self.map, offset)
+            offset += STRING_LENGTH.size
+            strings.append(self.map[offset:offset + length].decode())
+            offset += length
+        return strings
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        records = memoryview(self.map)[HEADER.size:HEADER.size + self.count * RECORD.size]
+        for event_type, time_stamp, arg1, arg2, arg3 in RECORD.iter_unpack(records):
+            if event_type == EVENT_TYPE.PRINT:
+                arg1 = self.strings[arg1]
+            yield Event(time_stamp, event_type, arg1, arg2, arg3)